@@ -400,11 +400,35 @@ Redis = _Redis()
 class _CleanMessages(EnvConfig, env_prefix="clean_"):
 
     message_limit: int = 10_000
+    history_concurrency: int = 5
 
 
 CleanMessages = _CleanMessages()
 
 
+class _FilteringSettings(EnvConfig, env_prefix="filtering_"):
+
+    concurrent_lists: bool = False
+    list_timeout: float = 10.0
+    attachment_max_bytes: int = 16_384
+    attachment_timeout: float = 5.0
+    filter_latency_budget: float = 0.05
+    slow_filter_strikes: int = 5
+    slow_filter_cooldown: float = 60 * 60
+    filter_timing_sample_rate: float = 0.01
+    token_timeout: float = 0.25
+    token_benchmark_budget: float = 0.1
+    process_pool: bool = False
+    process_pool_workers: int = 2
+    process_pool_timeout: float = 1.0
+    process_pool_max_pending: int = 20
+    alert_coalesce_window: float = 2.0
+    compact_message_cache: bool = False
+
+
+FilteringSettings = _FilteringSettings()
+
+
 class _Stats(EnvConfig, env_prefix="stats_"):
 
     presence_update_timeout: int = 30
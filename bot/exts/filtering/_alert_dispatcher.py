@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Hashable, Iterable
+from dataclasses import dataclass, field
+
+import discord
+from discord import Embed, HTTPException
+from pydis_core.utils import scheduling
+
+from bot.bot import Bot
+from bot.constants import FilteringSettings
+from bot.log import get_logger
+
+log = get_logger(__name__)
+
+# The limits Discord sets on a single message.
+MAX_EMBEDS = 10
+MAX_EMBEDS_LENGTH = 6_000
+MAX_CONTENT_LENGTH = 2_000
+
+
+@dataclass
+class QueuedAlert:
+    """An alert waiting to be sent through the filtering webhook."""
+
+    key: Hashable  # Alerts with the same key are merged into the first one.
+    username: str
+    content: str
+    embeds: list[Embed]
+    view: discord.ui.View | None
+    author_id: int | None
+    queued_at: float = field(default_factory=time.monotonic)
+    count: int = 1
+
+    def merged_embeds(self) -> list[Embed]:
+        """Return the embeds of the alert, noting on the first one how many alerts were merged into it."""
+        if self.count == 1 or not self.embeds:
+            return self.embeds
+        first, *rest = self.embeds
+        note = f"Triggered {self.count} times within {FilteringSettings.alert_coalesce_window:g}s."
+        footer = f"{first.footer.text}\n{note}" if first.footer.text else note
+        first.set_footer(text=footer)
+        return [first, *rest]
+
+
+def coalesce(alerts: Iterable[QueuedAlert]) -> list[QueuedAlert]:
+    """Merge alerts with the same key into the first of them, keeping the order of the first alert of each key."""
+    merged: dict[Hashable, QueuedAlert] = {}
+    for alert in alerts:
+        if existing := merged.get(alert.key):
+            existing.count += alert.count
+        else:
+            merged[alert.key] = alert
+    return list(merged.values())
+
+
+def pack(alerts: Iterable[QueuedAlert]) -> list[list[QueuedAlert]]:
+    """
+    Group consecutive alerts which can be sent in a single webhook message.
+
+    Alerts can share a message if they have the same username and author, as the message can have a single username and
+    view. Only the view of the first alert is sent, which is fine because the views of alerts about the same author are
+    equivalent, but alerts with different kinds of views aren't packed together. The embeds of a message must also fit
+    in Discord's limits.
+    """
+    batches = []
+    batch, embeds_count, embeds_length = [], 0, 0
+    for alert in alerts:
+        alert_count = len(alert.embeds)
+        alert_length = sum(len(embed) for embed in alert.embeds)
+        if batch and (
+            (alert.username, alert.author_id, type(alert.view))
+            != (batch[0].username, batch[0].author_id, type(batch[0].view))
+            or embeds_count + alert_count > MAX_EMBEDS
+            or embeds_length + alert_length > MAX_EMBEDS_LENGTH
+        ):
+            batches.append(batch)
+            batch, embeds_count, embeds_length = [], 0, 0
+        batch.append(alert)
+        embeds_count += alert_count
+        embeds_length += alert_length
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class AlertDispatcher:
+    """
+    Deliver the filtering alerts through the webhook from a queue, so that the event handlers don't wait on them.
+
+    Alerts are collected for a short window after the first one arrives. Within it, alerts with the same key (such as
+    the same author triggering the same filters) are merged into one with a count, and alerts which can share a webhook
+    message are packed together. The messages are sent one at a time, so the webhook's rate limit bucket is never
+    contended, and any waiting on it is left to discord.py's rate limit handling.
+    """
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.webhook: discord.Webhook | None = None
+        self._queue: asyncio.Queue[QueuedAlert] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    def start(self, webhook: discord.Webhook) -> None:
+        """Start delivering the queued alerts through the webhook."""
+        self.webhook = webhook
+        if self._task is None or self._task.done():
+            self._task = scheduling.create_task(self._deliver_forever(), event_loop=self.bot.loop)
+
+    def stop(self) -> None:
+        """Stop delivering alerts. Any alerts still queued are dropped."""
+        if self._task:
+            self._task.cancel()
+        if dropped := self._queue.qsize():
+            log.warning(f"Dropping {dropped} queued filtering alerts.")
+
+    def enqueue(
+        self,
+        key: Hashable,
+        *,
+        username: str,
+        content: str,
+        embeds: list[Embed],
+        view: discord.ui.View | None,
+        author_id: int | None,
+    ) -> None:
+        """Queue an alert to be sent through the webhook."""
+        self._queue.put_nowait(QueuedAlert(key, username, content, embeds, view, author_id))
+        self.bot.stats.gauge("filters.alerts.queue_depth", self._queue.qsize())
+
+    async def _deliver_forever(self) -> None:
+        """Collect the alerts arriving within each coalescing window, and send them."""
+        while True:
+            alerts = [await self._queue.get()]
+            try:
+                await asyncio.sleep(FilteringSettings.alert_coalesce_window)
+                while not self._queue.empty():
+                    alerts.append(self._queue.get_nowait())
+                self.bot.stats.gauge("filters.alerts.queue_depth", self._queue.qsize())
+
+                for batch in pack(coalesce(alerts)):
+                    await self._send(batch)
+            except Exception:
+                # Losing some alerts is better than stopping the delivery of all of them.
+                log.exception(f"Failed to deliver {len(alerts)} filtering alerts.")
+
+    async def _send(self, batch: list[QueuedAlert]) -> None:
+        """Send a batch of alerts in a single webhook message."""
+        if self.webhook is None:
+            log.error(f"Dropping {len(batch)} filtering alerts, as there's no webhook to send them through.")
+            return
+        first = batch[0]
+        contents = dict.fromkeys(alert.content for alert in batch if alert.content)
+        embeds = [embed for alert in batch for embed in alert.merged_embeds()]
+        try:
+            await self.webhook.send(
+                username=first.username,
+                content="\n".join(contents)[:MAX_CONTENT_LENGTH],
+                embeds=embeds,
+                view=first.view or discord.utils.MISSING,
+            )
+        except HTTPException as e:
+            log.error(f"Failed to send {len(batch)} filtering alerts through the webhook: {e}")
+            return
+
+        now = time.monotonic()
+        for alert in batch:
+            self.bot.stats.timing("filters.alerts.delivery_lag", (now - alert.queued_at) * 1000)
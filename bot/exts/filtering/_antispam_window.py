@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+import re
+from bisect import bisect_right
+from collections import Counter, deque
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, replace
+from datetime import datetime
+from operator import attrgetter
+from typing import NamedTuple
+
+import arrow
+from discord import DeletedReferencedMessage, Message, MessageReference, MessageType
+from emoji import demojize
+
+from bot.utils.message_cache import CachedMessage, MessageCache, resolve_messages
+
+DISCORD_EMOJI_RE = re.compile(r"<:\w+:\d+>|:\w+:")
+CODE_BLOCK_RE = re.compile(r"```.*?```", flags=re.DOTALL)
+LINK_RE = re.compile(r"(https?://\S+)")
+NEWLINES = re.compile(r"(\n+)")
+
+# The number of evicted records after which an author's window is compacted.
+COMPACT_THRESHOLD = 64
+
+
+class MessageCounts(NamedTuple):
+    """Countable properties of a message, or the totals across several messages."""
+
+    messages: int = 0
+    chars: int = 0
+    attachments: int = 0
+    emojis: int = 0
+    links: int = 0
+    messages_with_links: int = 0
+    newlines: int = 0
+    role_mentions: int = 0
+    mentions: int = 0
+
+    def __add__(self, other: MessageCounts) -> MessageCounts:
+        return MessageCounts(*(a + b for a, b in zip(self, other, strict=True)))
+
+    def __sub__(self, other: MessageCounts) -> MessageCounts:
+        return MessageCounts(*(a - b for a, b in zip(self, other, strict=True)))
+
+
+@dataclass(slots=True)
+class MessageRecord:
+    """
+    A message in an author's window, along with its properties which are measured once when it's recorded.
+
+    The message is stored the way the message cache stores it, which is a `CachedMessage` in compact mode.
+    """
+
+    message: Message | CachedMessage
+    created_at: datetime
+    counts: MessageCounts
+    max_newline_group: int
+    content_hash: int
+    # The IDs of the mentioned users which count, unless they're the author of the message replied to.
+    mention_ids: tuple[int, ...] = ()
+    reply_to: int | None = None  # The ID of the message replied to, if it's a reply.
+    # The reference of a reply whose author is still unknown, which is needed to tell which of its mentions count.
+    pending_reply: MessageReference | None = None
+
+    @classmethod
+    def from_message(
+        cls,
+        message: Message,
+        reply_author_id: int | None = None,
+        pending_reply: MessageReference | None = None,
+        *,
+        entry: Message | CachedMessage | None = None,
+    ) -> MessageRecord:
+        """
+        Measure the message's properties and create a record for it, storing `entry` in place of the message if given.
+
+        Mentions of bots, of the author, and of the author of the message replied to aren't counted.
+        """
+        content = message.content
+        newline_groups = [len(group) for group in NEWLINES.findall(content)]
+        links = len(LINK_RE.findall(content))
+        # Get rid of code blocks in the message before searching for emojis.
+        # Convert Unicode emojis to :emoji: format to get their count.
+        emojis = len(DISCORD_EMOJI_RE.findall(demojize(CODE_BLOCK_RE.sub("", content))))
+        counts = MessageCounts(
+            messages=1,
+            chars=len(content),
+            attachments=len(message.attachments),
+            emojis=emojis,
+            links=links,
+            messages_with_links=int(links > 0),
+            newlines=sum(newline_groups),
+            role_mentions=len(message.role_mentions),
+        )
+        # `message.mentions` is supplied by the API, and includes the user replied to even if the mention doesn't occur
+        # in the content. Parsing the content instead is very prone to breaking, as any discrepancy with Discord's
+        # Markdown parser (code blocks, escaped markdown) would cause false positives or negatives.
+        mention_ids = tuple(user.id for user in message.mentions if not user.bot and user.id != message.author.id)
+        reference = reply_reference(message)
+        return cls(
+            entry if entry is not None else message,
+            message.created_at,
+            counts,
+            max(newline_groups, default=0),
+            hash(content),
+            mention_ids,
+            reference.message_id if reference is not None else None,
+        )._with_reply_author(reply_author_id, pending_reply)
+
+    def _with_reply_author(self, reply_author_id: int | None, pending_reply: MessageReference | None) -> MessageRecord:
+        """Return a copy of the record counting its mentions, knowing who the author of the message replied to is."""
+        mentions = sum(1 for user_id in self.mention_ids if user_id != reply_author_id)
+        return replace(self, counts=self.counts._replace(mentions=mentions), pending_reply=pending_reply)
+
+    def resolve_reply(self, reply_author_id: int | None) -> MessageRecord:
+        """Return a copy of the record, after the author of the message replied to was resolved."""
+        return self._with_reply_author(reply_author_id, None)
+
+    def resolve(self) -> Message | None:
+        """Return the full message, or None if it's a compact record which can no longer be resolved."""
+        if isinstance(self.message, CachedMessage):
+            return self.message.resolve()
+        return self.message
+
+
+def resolve_records(records: Iterable[MessageRecord]) -> list[Message]:
+    """
+    Return the full messages of the records, in their order.
+
+    Compact records are resolved together, and the ones which can no longer be resolved are left out.
+    """
+    records = list(records)
+    resolved = resolve_messages(
+        record.message.id for record in records if isinstance(record.message, CachedMessage)
+    )
+    messages = []
+    for record in records:
+        if not isinstance(record.message, CachedMessage):
+            messages.append(record.message)
+        elif (message := resolved.get(record.message.id)) is not None:
+            messages.append(message)
+    return messages
+
+
+def reply_reference(message: Message) -> MessageReference | None:
+    """Return the reference to the message replied to, if the message is a reply."""
+    if message.type != MessageType.reply or message.reference is None or message.reference.message_id is None:
+        return None
+    return message.reference
+
+
+class ReplyAuthors:
+    """
+    The authors of the messages replied to by recorded messages, by the IDs of the messages replied to.
+
+    An author is kept for as long as any recorded message replies to its message, so that it's resolved at most once
+    while the replies are in the window. The author of a message which was deleted or couldn't be fetched is recorded
+    as None.
+    """
+
+    def __init__(self):
+        self._authors: dict[int, int | None] = {}
+        self._references: Counter[int] = Counter()
+
+    def acquire(self, message: Message) -> tuple[int | None, MessageReference | None]:
+        """
+        Reference the message replied to by the given message while it's recorded.
+
+        Return the ID of the author of the message replied to, or the reference to it if its author isn't known yet.
+        """
+        if (reference := reply_reference(message)) is None:
+            return None, None
+        self._references[reference.message_id] += 1
+        return self.lookup(reference)
+
+    def lookup(self, reference: MessageReference) -> tuple[int | None, MessageReference | None]:
+        """Return the ID of the author of the message replied to, or the reference to it if its author isn't known."""
+        if reference.message_id in self._authors:
+            return self._authors[reference.message_id], None
+        resolved = reference.resolved
+        if resolved is None:
+            return None, reference
+        author_id = None if isinstance(resolved, DeletedReferencedMessage) else resolved.author.id
+        self.resolve(reference.message_id, author_id)
+        return author_id, None
+
+    def release(self, record: MessageRecord) -> None:
+        """Stop referencing the message replied to by a message which is no longer recorded."""
+        if (reference := record.reply_to) is None:
+            return
+        self._references[reference] -= 1
+        if self._references[reference] <= 0:
+            del self._references[reference]
+            self._authors.pop(reference, None)
+
+    def resolve(self, message_id: int, author_id: int | None) -> None:
+        """Record the author of a message replied to, as long as any recorded message still replies to it."""
+        if message_id in self._references:
+            self._authors[message_id] = author_id
+
+
+class WindowSlice(NamedTuple):
+    """The records of an author's messages since some point in time, and the totals of their counts."""
+
+    records: list[MessageRecord]
+    totals: MessageCounts
+
+    @property
+    def messages(self) -> set[Message]:
+        """The messages in the slice. Compact records which can no longer be resolved to their messages are left out."""
+        return set(resolve_records(self.records))
+
+
+class AuthorWindow:
+    """
+    The messages of a single author in the message cache, in the order they were cached.
+
+    Running totals of the message counts are kept, so that the totals since any point in time are found with a binary
+    search and a subtraction, rather than by going over the messages.
+    """
+
+    def __init__(self, reply_authors: ReplyAuthors | None = None):
+        self.reply_authors = reply_authors if reply_authors is not None else ReplyAuthors()
+        self._records: list[MessageRecord] = []
+        # The running totals, where `_totals[i]` is the sum of the counts of the records before index `i`.
+        self._totals: list[MessageCounts] = [MessageCounts()]
+        # The records before this index were evicted, and are only kept until the lists are compacted.
+        self._head = 0
+
+    def append(self, record: MessageRecord) -> None:
+        """Add a new record to the end of the window."""
+        self._records.append(record)
+        self._totals.append(self._totals[-1] + record.counts)
+
+    def popleft(self) -> MessageRecord:
+        """Evict the oldest record of the window and return it."""
+        if not self:
+            raise IndexError("pop from an empty window")
+
+        record = self._records[self._head]
+        self._head += 1
+        if self._head >= COMPACT_THRESHOLD and self._head * 2 >= len(self._records):
+            # The totals only matter relative to each other, so they don't need to be recalculated.
+            self._records = self._records[self._head:]
+            self._totals = self._totals[self._head:]
+            self._head = 0
+        return record
+
+    def update(self, message: Message, entry: Message | CachedMessage | None = None) -> bool:
+        """
+        Re-measure the record of an edited message, storing `entry` in place of the message if given.
+
+        Return True if the window had a record for the message.
+        """
+        for index in range(len(self._records) - 1, self._head - 1, -1):
+            if self._records[index].message.id == message.id:
+                reply_author_id = pending_reply = None
+                if (reference := reply_reference(message)) is not None:
+                    reply_author_id, pending_reply = self.reply_authors.lookup(reference)
+                self._replace(index, MessageRecord.from_message(message, reply_author_id, pending_reply, entry=entry))
+                return True
+        return False
+
+    def resolve_reply(self, reference: MessageReference, author_id: int | None) -> None:
+        """Record the author of a message replied to, and count the mentions of the replies which were pending it."""
+        self.reply_authors.resolve(reference.message_id, author_id)
+        for index in range(self._head, len(self._records)):
+            record = self._records[index]
+            if record.pending_reply is not None and record.reply_to == reference.message_id:
+                self._replace(index, record.resolve_reply(author_id))
+
+    def _replace(self, index: int, new_record: MessageRecord) -> None:
+        """Replace the record at the given index, and update the totals after it."""
+        difference = new_record.counts - self._records[index].counts
+        self._records[index] = new_record
+        for total_index in range(index + 1, len(self._totals)):
+            self._totals[total_index] += difference
+
+    def since(self, earliest: datetime | arrow.Arrow) -> WindowSlice:
+        """Return the records of messages created after `earliest`, and their totals."""
+        start = bisect_right(self._records, earliest, lo=self._head, key=attrgetter("created_at"))
+        return WindowSlice(self._records[start:], self._totals[-1] - self._totals[start])
+
+    @property
+    def oldest(self) -> MessageRecord:
+        """The oldest record in the window."""
+        if not self:
+            raise IndexError("empty window")
+        return self._records[self._head]
+
+    def __iter__(self) -> Iterator[MessageRecord]:
+        return iter(self._records[self._head:])
+
+    def __len__(self):
+        return len(self._records) - self._head
+
+
+class AntispamWindow:
+    """
+    Per-author windows over the messages in a message cache, used by the antispam rules.
+
+    Messages should be added after they're added to the cache, and updated after they're updated in it. A message
+    evicted from the cache is evicted from its author's window the next time a message is added. The records keep
+    whatever the cache stores for their messages, so the window doesn't hold on to full messages a compact cache
+    doesn't.
+    """
+
+    def __init__(self, cache: MessageCache):
+        self.cache = cache
+        self._windows: dict[int, AuthorWindow] = {}
+        self.reply_authors = ReplyAuthors()
+        # The IDs of the recorded messages and their authors, in the order they were added.
+        self._order: deque[tuple[int, int]] = deque()
+
+    def add(self, message: Message) -> None:
+        """Record a new message in its author's window."""
+        self._evict()
+        record = MessageRecord.from_message(
+            message, *self.reply_authors.acquire(message), entry=self.cache.get_message(message.id)
+        )
+        window = self._windows.setdefault(message.author.id, AuthorWindow(self.reply_authors))
+        window.append(record)
+        self._order.append((message.id, message.author.id))
+
+    def update(self, message: Message) -> bool:
+        """
+        Re-measure a recorded message after it was edited.
+
+        Return True if the message was recorded.
+        """
+        window = self._windows.get(message.author.id)
+        return window is not None and window.update(message, self.cache.get_message(message.id))
+
+    def for_author(self, author_id: int) -> AuthorWindow:
+        """Return the window of the author with the given ID."""
+        return self._windows.get(author_id) or AuthorWindow(self.reply_authors)
+
+    def _evict(self) -> None:
+        """Evict the records of messages which are no longer in the cache."""
+        while self._order and self._order[0][0] not in self.cache:
+            message_id, author_id = self._order.popleft()
+            window = self._windows.get(author_id)
+            if window and window.oldest.message.id == message_id:
+                self.reply_authors.release(window.popleft())
+                if not window:
+                    del self._windows[author_id]
@@ -8,14 +8,28 @@ from enum import Enum, auto
 import discord
 from discord import DMChannel, Embed, Member, Message, StageChannel, TextChannel, Thread, User, VoiceChannel
 
+from bot.exts.filtering._utils import NormalizedContent, normalized_content
 from bot.utils.message_cache import MessageCache
 
 if typing.TYPE_CHECKING:
     from bot.exts.filtering._filter_lists import FilterList
     from bot.exts.filtering._filters.filter import Filter
+    from bot.exts.filtering._process_pool import ContentAnalysis
     from bot.exts.utils.snekbox._io import FileAttachment
 
 
+# Output fields holding collections which filter lists add to.
+OUTPUT_COLLECTIONS = (
+    "alert_embeds", "action_descriptions", "matches", "filter_info", "blocked_exts", "potential_phish",
+    "additional_actions", "related_messages", "related_channels", "uploaded_attachments"
+)
+# Fields which filter lists may overwrite. The content can be censored by filters for the lists following them.
+OUTPUT_VALUES = (
+    "content", "dm_content", "dm_embed", "send_alert", "alert_content", "notification_domain", "messages_deletion",
+    "upload_deletion_logs"
+)
+
+
 class Event(Enum):
     """Types of events that can trigger filtering. Note this does not have to align with gateway event types."""
 
@@ -40,6 +54,7 @@ class FilterContext:
     attachments: list[discord.Attachment | FileAttachment] = field(default_factory=list)  # Any attachments sent.
     before_message: Message | None = None
     message_cache: MessageCache | None = None
+    analysis: ContentAnalysis | None = None  # The results of matching the content in the process pool, if enabled.
     # Output context
     dm_content: str = ""  # The content to DM the invoker
     dm_embed: str = ""  # The embed description to DM the invoker
@@ -64,6 +79,34 @@ class FilterContext:
         # If it's in the context of a DM channel, self.channel won't be None, but self.channel.guild will.
         self.in_guild = self.channel is None or self.channel.guild is not None
 
+    @property
+    def normalized(self) -> NormalizedContent:
+        """
+        The normalized views of the content, which must be a string.
+
+        Each view is computed at most once for the same content, and shared by all the lists and contexts using it.
+        """
+        return normalized_content(self.content)
+
+    @property
+    def previously_filtered_content(self) -> str | None:
+        """
+        The content of the message before it was edited, if that version was already filtered.
+
+        The filtered version is known by the triggers the cache holds for the message, even if there weren't any.
+        """
+        if self.event != Event.MESSAGE_EDIT or not self.before_message or not self.message or not self.message_cache:
+            return None
+        if self.message_cache.get_message_metadata(self.message.id) is None:
+            return None
+        return self.before_message.content
+
+    def content_analysis(self) -> ContentAnalysis | None:
+        """The results of matching the content in the process pool, unless the content was changed since."""
+        if self.analysis is not None and self.analysis.content == self.content:
+            return self.analysis
+        return None
+
     @classmethod
     def from_message(
         cls, event: Event, message: Message, before: Message | None = None, cache: MessageCache | None = None
@@ -84,3 +127,28 @@ class FilterContext:
     def replace(self, **changes) -> FilterContext:
         """Return a new context object assigning new values to the specified fields."""
         return replace(self, **changes)
+
+    def isolated_copy(self) -> FilterContext:
+        """
+        Return a copy of the context with its own empty output collections.
+
+        Filling the outputs of the copy doesn't affect this context. They can be applied back with `merge`.
+        """
+        return replace(self, **{name: type(getattr(self, name))() for name in OUTPUT_COLLECTIONS})
+
+    def merge(self, other: FilterContext, base: FilterContext) -> None:
+        """
+        Apply the outputs of `other`, a copy created with `isolated_copy` when this context was equal to `base`.
+
+        Output collections are extended with whatever was added to the copy, and any other output field is overwritten
+        if the copy changed it.
+        """
+        for name in OUTPUT_COLLECTIONS:
+            collection = getattr(self, name)
+            if isinstance(collection, list):
+                collection.extend(getattr(other, name))
+            else:
+                collection.update(getattr(other, name))
+        for name in OUTPUT_VALUES:
+            if getattr(other, name) != getattr(base, name):
+                setattr(self, name, getattr(other, name))
@@ -3,12 +3,9 @@ import typing
 from collections import Counter
 from collections.abc import Callable, Coroutine
 from dataclasses import dataclass, field
-from datetime import timedelta
 from functools import reduce
-from itertools import takewhile
 from operator import add, or_
 
-import arrow
 from discord import Member
 from pydis_core.utils import scheduling
 from pydis_core.utils.logging import get_logger
@@ -33,7 +30,8 @@ class AntispamList(UniquesListBase):
     """
     A list of anti-spam rules.
 
-    Messages from the last X seconds are passed to each rule, which decides whether it triggers across those messages.
+    The author's cached messages are passed to each rule, which decides whether it triggers across the messages from
+    the last X seconds.
 
     The infraction reason is set dynamically.
     """
@@ -62,14 +60,8 @@ class AntispamList(UniquesListBase):
             return None, [], {}
 
         sublist: SubscribingAtomicList = self[ListType.DENY]
-        potential_filters = [sublist.filters[id_] for id_ in sublist.subscriptions[ctx.event]]
-        max_interval = max(filter_.extra_fields.interval for filter_ in potential_filters)
-
-        earliest_relevant_at = arrow.utcnow() - timedelta(seconds=max_interval)
-        relevant_messages = list(
-            takewhile(lambda msg: msg.created_at > earliest_relevant_at, ctx.message_cache)
-        )
-        new_ctx = ctx.replace(content=relevant_messages)
+        # Each rule only looks at the author's messages, and finds the ones it cares about in the author's window.
+        new_ctx = ctx.replace(content=self.filtering_cog.antispam_window.for_author(ctx.author.id))
         triggers = await sublist.filter_list_result(new_ctx)
         if not triggers:
             return None, [], {}
@@ -149,12 +141,11 @@ class DeletionContext:
         self.rules.update(rules)
 
     async def send_alert(self, antispam_list: AntispamList) -> None:
-        """Post the mod alert."""
+        """Queue the mod alert."""
         if not self.contexts or not self.rules:
             return
 
-        webhook = antispam_list.filtering_cog.webhook
-        if not webhook:
+        if not antispam_list.filtering_cog.webhook:
             return
 
         ctx, *other_contexts = self.contexts
@@ -194,4 +185,11 @@ class DeletionContext:
             embed.set_footer(
                 text="The list of actions taken includes actions from additional contexts after deletion began."
             )
-        await webhook.send(username="Anti-Spam", content=ctx.alert_content, embeds=[embed], view=AlertView(new_ctx))
+        antispam_list.filtering_cog.alert_dispatcher.enqueue(
+            ("Anti-Spam", ctx.author.id, tuple(messages)),
+            username="Anti-Spam",
+            content=ctx.alert_content,
+            embeds=[embed],
+            view=AlertView(new_ctx),
+            author_id=ctx.author.id,
+        )
@@ -2,13 +2,17 @@ from __future__ import annotations
 
 import re
 import typing
+from collections import defaultdict
+from operator import itemgetter
+
+import tldextract
+from tldextract.tldextract import ExtractResult
 
 from bot.exts.filtering._filter_context import Event, FilterContext
 from bot.exts.filtering._filter_lists.filter_list import FilterList, ListType
 from bot.exts.filtering._filters.domain import DomainFilter
 from bot.exts.filtering._filters.filter import Filter
 from bot.exts.filtering._settings import ActionSettings
-from bot.exts.filtering._utils import clean_input
 
 if typing.TYPE_CHECKING:
     from bot.exts.filtering.filtering import Filtering
@@ -30,9 +34,12 @@ class DomainsList(FilterList[DomainFilter]):
     """
 
     name = "domain"
+    content_only = True
 
     def __init__(self, filtering_cog: Filtering):
         super().__init__()
+        # Per list type, a mapping of registered domains to the filters for that domain and their position in the list.
+        self._domain_index: dict[ListType, dict[str, list[tuple[int, DomainFilter]]]] = {}
         filtering_cog.subscribe(self, Event.MESSAGE, Event.MESSAGE_EDIT, Event.SNEKBOX)
 
     def get_filter_type(self, content: str) -> type[Filter]:
@@ -44,19 +51,40 @@ class DomainsList(FilterList[DomainFilter]):
         """Return the types of filters used by this list."""
         return {DomainFilter}
 
+    def _on_filters_changed(self, list_type: ListType) -> None:
+        """Index the filters of the list of the specified type by their registered domain."""
+        super()._on_filters_changed(list_type)
+        index = defaultdict(list)
+        for position, filter_ in enumerate(self[list_type].filters.values()):
+            index[filter_.registered_domain].append((position, filter_))
+        self._domain_index[list_type] = dict(index)
+
+    def _candidate_filters(self, list_type: ListType, extracted_urls: dict[str, ExtractResult]) -> list[DomainFilter]:
+        """Return the filters sharing a registered domain with any of the URLs, in the order they appear in the list."""
+        index = self._domain_index[list_type]
+        registered_domains = {extract.registered_domain for extract in extracted_urls.values()}
+        candidates = [entry for domain in registered_domains for entry in index.get(domain, ())]
+        return [filter_ for _, filter_ in sorted(candidates, key=itemgetter(0))]
+
     async def actions_for(
         self, ctx: FilterContext
     ) -> tuple[ActionSettings | None, list[str], dict[ListType, list[Filter]]]:
         """Dispatch the given event to the list's filters, and return actions to take and messages to relay to mods."""
-        text = ctx.content
-        if not text:
+        if not ctx.content:
             return None, [], {}
 
-        text = clean_input(text)
-        urls = {match.group(1).lower().rstrip("/") for match in URL_RE.finditer(text)}
-        new_ctx = ctx.replace(content=urls)
-
-        triggers = await self[ListType.DENY].filter_list_result(new_ctx)
+        if analysis := ctx.content_analysis():
+            extracted_urls = analysis.extracted_urls
+        else:
+            text = ctx.normalized.cleaned
+            urls = {match.group(1).lower().rstrip("/") for match in URL_RE.finditer(text)}
+            # Extract each URL once, instead of once per filter.
+            extracted_urls = {url: tldextract.extract(url) for url in urls}
+        urls = extracted_urls.keys()
+        new_ctx = ctx.replace(content=extracted_urls)
+
+        candidates = self._candidate_filters(ListType.DENY, extracted_urls)
+        triggers = await self[ListType.DENY].filter_list_result(new_ctx, candidates)
         ctx.notification_domain = new_ctx.notification_domain
         unknown_urls = urls - {filter_.content.lower() for filter_ in triggers}
         if unknown_urls:
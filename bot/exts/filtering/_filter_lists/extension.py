@@ -69,7 +69,7 @@ class ExtensionsList(FilterList[ExtensionFilter]):
         if not ctx.message or not ctx.attachments:
             return None, [], {}
 
-        _, failed = self[ListType.ALLOW].defaults.validations.evaluate(ctx)
+        _, failed = self[ListType.ALLOW].default_validations(ctx)
         if failed:  # There's no extension filtering in this context.
             return None, [], {}
 
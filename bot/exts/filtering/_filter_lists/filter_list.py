@@ -1,7 +1,8 @@
 import dataclasses
+import time
 import typing
 from abc import ABC, abstractmethod
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from collections.abc import Iterable
 from dataclasses import dataclass
 from enum import Enum
@@ -9,12 +10,15 @@ from functools import reduce
 from typing import Any
 
 import arrow
+from discord import Member
 from discord.ext.commands import BadArgument, Context, Converter
 
 from bot.exts.filtering._filter_context import Event, FilterContext
 from bot.exts.filtering._filters.filter import Filter, UniqueFilter
+from bot.exts.filtering._latency import latency_tracker
+from bot.exts.filtering._search_index import FilterSearchIndex
 from bot.exts.filtering._settings import ActionSettings, Defaults, create_settings
-from bot.exts.filtering._utils import FieldRequiring, past_tense
+from bot.exts.filtering._utils import FieldRequiring, past_tense, repr_equals
 from bot.log import get_logger
 
 if typing.TYPE_CHECKING:
@@ -22,6 +26,9 @@ if typing.TYPE_CHECKING:
 
 log = get_logger(__name__)
 
+# The maximum number of validation verdicts to cache per atomic list, counting both default and filter verdicts.
+VALIDATION_CACHE_SIZE = 10_000
+
 
 class ListType(Enum):
     """An enumeration of list types."""
@@ -48,6 +55,75 @@ class ListTypeConverter(Converter):
         raise BadArgument(f"No matching list type found for {argument!r}.")
 
 
+def validation_key(ctx: FilterContext) -> tuple[int | None, frozenset[int] | None, bool]:
+    """
+    Return the parts of the context which validation settings depend on: the channel, the author's roles, and the guild.
+
+    Names of channels, categories, and roles are also used, and are expected to be handled by invalidating the caches.
+    """
+    channel_id = ctx.channel.id if ctx.channel else None
+    role_ids = frozenset(role.id for role in ctx.author.roles) if isinstance(ctx.author, Member) else None
+    return channel_id, role_ids, ctx.in_guild
+
+
+class ValidationCache:
+    """
+    A cache of validation verdicts per validation key, evicting the least recently used keys.
+
+    The size is bounded by the total number of verdicts, so that a key with many filter verdicts weighs accordingly.
+    """
+
+    def __init__(self, maxsize: int = VALIDATION_CACHE_SIZE):
+        self.maxsize = maxsize
+        # A mapping of validation keys to the default validation results, and whether each evaluated filter applies.
+        self._entries: OrderedDict[tuple, tuple[tuple[set[str], set[str]], dict[Filter, bool]]] = OrderedDict()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get(self, key: tuple) -> tuple[tuple[set[str], set[str]], dict[Filter, bool]] | None:
+        """Return the default verdict and the filter verdicts cached for the key, or None if there are none."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set_defaults(self, key: tuple, verdict: tuple[set[str], set[str]]) -> None:
+        """Cache the default verdict for the key, forgetting any filter verdicts cached for it."""
+        self.pop(key)
+        self._entries[key] = (verdict, {})
+        self._size += 1
+        self._evict()
+
+    def add_filter_verdicts(self, key: tuple, verdicts: dict[Filter, bool]) -> None:
+        """Cache whether each filter applies for the key, if the key's default verdict is still cached."""
+        entry = self._entries.get(key)
+        if entry is None or not verdicts:
+            return
+        _, filter_verdicts = entry
+        self._size += len(verdicts.keys() - filter_verdicts.keys())
+        filter_verdicts.update(verdicts)
+        self._evict()
+
+    def pop(self, key: tuple) -> None:
+        """Forget the verdicts cached for the key."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= 1 + len(entry[1])
+
+    def clear(self) -> None:
+        """Forget all cached verdicts."""
+        self._entries.clear()
+        self._size = 0
+
+    def _evict(self) -> None:
+        """Forget the least recently used keys until the cache is within its size."""
+        while self._size > self.maxsize:
+            _, (_, filter_verdicts) = self._entries.popitem(last=False)
+            self._size -= 1 + len(filter_verdicts)
+
+
 # AtomicList and its subclasses must have eq=False, otherwise the dataclass deco will replace the hash function.
 @dataclass(frozen=True, eq=False)
 class AtomicList:
@@ -64,16 +140,21 @@ class AtomicList:
     list_type: ListType
     defaults: Defaults
     filters: dict[int, Filter]
+    _validation_cache: ValidationCache = dataclasses.field(default_factory=ValidationCache, init=False, repr=False)
+    search_index: FilterSearchIndex = dataclasses.field(default_factory=FilterSearchIndex, init=False, repr=False)
 
     @property
     def label(self) -> str:
         """Provide a short description identifying the list with its name and type."""
         return f"{past_tense(self.list_type.name.lower())} {self.name.lower()}"
 
-    async def filter_list_result(self, ctx: FilterContext) -> list[Filter]:
+    async def filter_list_result(self, ctx: FilterContext, filters: Iterable[Filter] | None = None) -> list[Filter]:
         """
         Sift through the list of filters, and return only the ones which apply to the given context.
 
+        If `filters` is provided, only those filters are considered instead of all the filters in the list. This allows
+        the containing filter list to rule out filters it knows can't trigger in advance.
+
         The strategy is as follows:
         1. The default settings are evaluated on the given context. The default answer for whether the filter is
         relevant in the given context is whether there aren't any validation settings which returned False.
@@ -84,25 +165,40 @@ class AtomicList:
 
         If the filter is relevant in context, see if it actually triggers.
         """
-        return await self._create_filter_list_result(ctx, self.defaults, self.filters.values())
+        if filters is None:
+            filters = self.filters.values()
+        return await self._create_filter_list_result(ctx, self.defaults, filters)
 
     async def _create_filter_list_result(
         self, ctx: FilterContext, defaults: Defaults, filters: Iterable[Filter]
     ) -> list[Filter]:
         """A helper function to evaluate the result of `filter_list_result`."""
-        passed_by_default, failed_by_default = defaults.validations.evaluate(ctx)
+        start = time.perf_counter()
+        key = validation_key(ctx) if defaults is self.defaults else None
+        (_, failed_by_default), filter_verdicts = self._validation_verdicts(ctx, defaults, key)
         default_answer = not bool(failed_by_default)
 
+        new_verdicts = {}
         relevant_filters = []
         for filter_ in filters:
             if not filter_.validations:
-                if default_answer and await filter_.triggered_on(ctx):
-                    relevant_filters.append(filter_)
+                applies = default_answer
             else:
-                passed, failed = filter_.validations.evaluate(ctx)
-                if not failed and failed_by_default < passed:
-                    if await filter_.triggered_on(ctx):
-                        relevant_filters.append(filter_)
+                # Only filters with overrides need their own verdict, the rest follow the default answer.
+                applies = filter_verdicts.get(filter_)
+                if applies is None:
+                    passed, failed = filter_.validations.evaluate(ctx)
+                    applies = new_verdicts[filter_] = not failed and failed_by_default < passed
+
+            if applies:
+                filter_start = time.perf_counter()
+                triggered = await filter_.triggered_on(ctx)
+                latency_tracker.record_filter(self, filter_, ctx.event, time.perf_counter() - filter_start)
+                if triggered:
+                    relevant_filters.append(filter_)
+        if key is not None:
+            self._validation_cache.add_filter_verdicts(key, new_verdicts)
+        latency_tracker.record_atomic_list(self, ctx.event, time.perf_counter() - start)
 
         if ctx.event == Event.MESSAGE_EDIT and ctx.message and self.list_type == ListType.DENY:
             previously_triggered = ctx.message_cache.get_message_metadata(ctx.message.id)
@@ -114,6 +210,53 @@ class AtomicList:
                 relevant_filters = [filter_ for filter_ in relevant_filters if filter_ not in ignore_filters]
         return relevant_filters
 
+    def default_validations(self, ctx: FilterContext) -> tuple[set[str], set[str]]:
+        """Return the names of the default validations which passed and failed in the given context."""
+        default_verdict, _ = self._validation_verdicts(ctx, self.defaults, validation_key(ctx))
+        return default_verdict
+
+    def _validation_verdicts(
+        self, ctx: FilterContext, defaults: Defaults, key: tuple | None
+    ) -> tuple[tuple[set[str], set[str]], dict[Filter, bool]]:
+        """
+        Return the cached validation results of the defaults, and whether each filter with overrides applies.
+
+        The validations only depend on the parts of the context given by `validation_key`, so the results are evaluated
+        once for each combination of them. Filter verdicts are added by the caller. If the key is None, nothing is
+        cached, as is the case for defaults other than the list's own.
+        """
+        if key is None:
+            return defaults.validations.evaluate(ctx), {}
+
+        verdicts = self._validation_cache.get(key)
+        if verdicts is None:
+            default_verdict = defaults.validations.evaluate(ctx)
+            self._validation_cache.set_defaults(key, default_verdict)
+            verdicts = (default_verdict, {})
+        return verdicts
+
+    def search(
+        self,
+        filter_type: type[Filter] | None,
+        settings: dict[str, Any],
+        filter_settings: dict[str, Any],
+        text_query: dict[str, str],
+    ) -> list[Filter]:
+        """Find all filters in the list which match the query, building the search index the first time."""
+        # If the default answers are known, only the overrides need to be checked for each filter.
+        all_defaults = self.defaults.dict()
+        differ_by_default = {
+            setting_name for setting_name, setting_value in settings.items()
+            if not repr_equals(all_defaults[setting_name], setting_value)
+        }
+        if not self.search_index.built:
+            self.search_index.build(self.filters.values())
+        return self.search_index.search(filter_type, settings, filter_settings, differ_by_default, text_query)
+
+    def clear_validation_cache(self) -> None:
+        """Forget all cached validation results, for example after a change to the filters or to the guild."""
+        self._validation_cache.clear()
+
     def default(self, setting_name: str) -> Any:
         """Get the default value of a specific setting."""
         missing = object()
@@ -166,8 +309,17 @@ class FilterList(dict[ListType, AtomicList], typing.Generic[T], FieldRequiring):
     # Each subclass must define a name matching the filter_list name we're expecting to receive from the database.
     # Names must be unique across all filter lists.
     name = FieldRequiring.MUST_SET_UNIQUE
+    # Whether the list must receive the shared filtering context rather than an isolated copy of it, which means it
+    # can't run concurrently with other lists. This is the case if the list changes the content for the lists following
+    # it, or holds on to the context after returning.
+    requires_shared_context = False
+    # Whether the list only looks at the content of messages, so that it doesn't need to run again on edits which don't
+    # change the content.
+    content_only = False
 
     _already_warned = set()
+    # Incremented whenever the filters or the settings of any of the list types are added, edited or removed.
+    revision = 0
 
     def add_list(self, list_data: dict) -> AtomicList:
         """Add a new type of list (such as a whitelist or a blacklist) this filter list."""
@@ -190,6 +342,7 @@ class FilterList(dict[ListType, AtomicList], typing.Generic[T], FieldRequiring):
             defaults,
             filters
         )
+        self._on_filters_changed(list_type)
         return self[list_type]
 
     def add_filter(self, list_type: ListType, filter_data: dict) -> T | None:
@@ -197,8 +350,84 @@ class FilterList(dict[ListType, AtomicList], typing.Generic[T], FieldRequiring):
         new_filter = self._create_filter(filter_data, self[list_type].defaults)
         if new_filter:
             self[list_type].filters[filter_data["id"]] = new_filter
+            self[list_type].search_index.add(new_filter)
+            self._on_filters_changed(list_type)
         return new_filter
 
+    def remove_filter(self, list_type: ListType, filter_id: int) -> T | None:
+        """Remove the filter with the given ID from the list of the specified type, and return it."""
+        removed_filter = self[list_type].filters.pop(filter_id, None)
+        if removed_filter:
+            self[list_type].search_index.remove(filter_id)
+            self._on_filters_changed(list_type)
+        return removed_filter
+
+    def update_list(self, list_data: dict) -> AtomicList:
+        """
+        Apply the new data of a list type which is already loaded, and return the updated list.
+
+        Only filters which were edited, or which override a default setting that changed, are recreated. The rest are
+        carried over as they are. The updated list replaces the current one in a single step, so filtering never sees a
+        partially updated list.
+        """
+        list_type = ListType(list_data["list_type"])
+        current = self.get(list_type)
+        if current is None:
+            return self.add_list(list_data)
+
+        actions, validations = create_settings(list_data["settings"], keep_empty=True)
+        defaults = Defaults(actions, validations)
+        changed_settings = self._changed_settings(current.defaults, defaults)
+
+        filters = {}
+        for filter_data in list_data["filters"]:
+            existing = current.filters.get(filter_data["id"])
+            if existing and not self._needs_rebuild(existing, filter_data, changed_settings):
+                filters[filter_data["id"]] = existing
+                continue
+            new_filter = self._create_filter(filter_data, defaults)
+            if new_filter:
+                filters[filter_data["id"]] = new_filter
+
+        self[list_type] = dataclasses.replace(
+            current, updated_at=arrow.get(list_data["updated_at"]), defaults=defaults, filters=filters
+        )
+        if filters != current.filters:
+            self._on_filters_changed(list_type)
+        else:
+            self.revision += 1  # The settings of the list might have changed.
+        return self[list_type]
+
+    @staticmethod
+    def _changed_settings(old: Defaults, new: Defaults) -> set[str]:
+        """Return the names of the setting entries which differ between the old and new defaults."""
+        changed = set()
+        for old_settings, new_settings in zip(old, new, strict=True):
+            for name in old_settings.keys() | new_settings.keys():
+                if old_settings.get(name) != new_settings.get(name):
+                    changed.add(name)
+        return changed
+
+    @staticmethod
+    def _needs_rebuild(filter_: Filter, filter_data: dict, changed_settings: set[str]) -> bool:
+        """Return whether the filter should be recreated from its data, given the names of the changed defaults."""
+        if filter_.content != filter_data["content"] or filter_.updated_at != arrow.get(filter_data["updated_at"]):
+            return True
+        # A filter's overrides are filled in from the defaults, while settings without overrides are looked up in the
+        # list's defaults when the filter is evaluated.
+        overridden = set(filter_.actions or ()) | set(filter_.validations or ())
+        return bool(overridden & changed_settings)
+
+    def _on_filters_changed(self, list_type: ListType) -> None:
+        """
+        Update any state derived from the filters of the list of the specified type.
+
+        Subclasses which precompute structures over their filters (such as indexes) should extend this.
+        """
+        self.revision += 1
+        self[list_type].clear_validation_cache()
+        latency_tracker.prune(self[list_type])
+
     @abstractmethod
     def get_filter_type(self, content: str) -> type[T]:
         """Get a subclass of filter matching the filter list and the filter's content."""
@@ -268,6 +497,9 @@ class UniquesListBase(FilterList[UniqueFilter], ABC):
     Each unique filter subscribes to a subset of events to respond to.
     """
 
+    # Unique filters can censor the content, and antispam keeps the contexts of a spam event.
+    requires_shared_context = True
+
     def __init__(self, filtering_cog: "Filtering"):
         super().__init__()
         self.filtering_cog = filtering_cog
@@ -300,10 +532,21 @@ class UniquesListBase(FilterList[UniqueFilter], ABC):
                 events.update(new_filter.events)
 
         new_list.filters.update(filters)
+        self.revision += 1
         if hasattr(self.filtering_cog, "subscribe"):  # Subscribe the filter list to any new events found.
             self.filtering_cog.subscribe(self, *events)
         return new_list
 
+    def update_list(self, list_data: dict) -> SubscribingAtomicList:
+        """
+        Apply the new data of a list type, and return the updated list.
+
+        Lists of unique filters are small, so they're simply loaded again.
+        """
+        new_list = self.add_list(list_data)
+        latency_tracker.prune(new_list)
+        return new_list
+
     @property
     def filter_types(self) -> set[type[UniqueFilter]]:
         """Return the types of filters used by this list."""
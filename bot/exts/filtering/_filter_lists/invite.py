@@ -4,16 +4,13 @@ import re
 import typing
 
 from discord import Embed, Invite
-from discord.errors import NotFound
 from pydis_core.utils.regex import DISCORD_INVITE
 
-import bot
 from bot.exts.filtering._filter_context import Event, FilterContext
 from bot.exts.filtering._filter_lists.filter_list import FilterList, ListType
 from bot.exts.filtering._filters.filter import Filter
 from bot.exts.filtering._filters.invite import InviteFilter
 from bot.exts.filtering._settings import ActionSettings
-from bot.exts.filtering._utils import clean_input
 
 if typing.TYPE_CHECKING:
     from bot.exts.filtering.filtering import Filtering
@@ -42,9 +39,11 @@ class InviteList(FilterList[InviteFilter]):
     """
 
     name = "invite"
+    content_only = True
 
     def __init__(self, filtering_cog: Filtering):
         super().__init__()
+        self.invite_cache = filtering_cog.invite_cache
         filtering_cog.subscribe(self, Event.MESSAGE, Event.MESSAGE_EDIT, Event.SNEKBOX)
 
     def get_filter_type(self, content: str) -> type[Filter]:
@@ -60,7 +59,7 @@ class InviteList(FilterList[InviteFilter]):
         self, ctx: FilterContext
     ) -> tuple[ActionSettings | None, list[str], dict[ListType, list[Filter]]]:
         """Dispatch the given event to the list's filters, and return actions to take and messages to relay to mods."""
-        text = clean_input(ctx.content, keep_newlines=True)
+        text = ctx.normalized.cleaned_with_newlines
 
         matches = list(DISCORD_INVITE.finditer(text))
         invite_codes = {m.group("invite") for m in matches}
@@ -77,17 +76,16 @@ class InviteList(FilterList[InviteFilter]):
                 refined_invite_code = match.group("invite")
             refined_invites[invite_code] = refined_invite_code
 
-        _, failed = self[ListType.ALLOW].defaults.validations.evaluate(ctx)
+        _, failed = self[ListType.ALLOW].default_validations(ctx)
         # If the allowed list doesn't operate in the context, unknown invites are allowed.
         check_if_allowed = not failed
 
         # Sort the invites into two categories:
         invites_for_inspection = dict()  # Found guild invites requiring further inspection.
         unknown_invites = dict()  # Either don't resolve or group DMs.
-        for invite_code in refined_invites.values():
-            try:
-                invite = await bot.instance.fetch_invite(invite_code)
-            except NotFound:
+        resolved_invites = await self.invite_cache.fetch_many(refined_invites.values())
+        for invite_code, invite in resolved_invites.items():
+            if invite is None:  # The invite wasn't found.
                 if check_if_allowed:
                     unknown_invites[invite_code] = None
             else:
@@ -1,19 +1,114 @@
 from __future__ import annotations
 
+import itertools
 import re
 import typing
+from collections.abc import Iterable
 
+import regex
+
+from bot.constants import FilteringSettings
 from bot.exts.filtering._filter_context import Event, FilterContext
 from bot.exts.filtering._filter_lists.filter_list import FilterList, ListType
 from bot.exts.filtering._filters.filter import Filter
-from bot.exts.filtering._filters.token import TokenFilter
+from bot.exts.filtering._filters.token import TokenFilter, max_width
 from bot.exts.filtering._settings import ActionSettings
-from bot.exts.filtering._utils import clean_input
+from bot.exts.filtering._utils import edited_span, normalized_content
+from bot.log import get_logger
 
 if typing.TYPE_CHECKING:
     from bot.exts.filtering.filtering import Filtering
 
-SPOILER_RE = re.compile(r"(\|\|.+?\|\|)", re.DOTALL)
+log = get_logger(__name__)
+
+# Backreferences and conditional groups refer to groups by number or name, which breaks once patterns are combined.
+GROUP_REFERENCE_RE = re.compile(r"\\[1-9]|\\g<|\(\?P=|\(\?\(")
+# How much of the unchanged content around an edit to search, for patterns whose matches extend beyond the edit.
+EDIT_CONTEXT_MARGIN = 256
+# Anchors and lookarounds depend on content which might be outside the searched part around an edit, regardless of
+# how long the matches of their patterns are.
+CONTEXT_DEPENDENT_RE = re.compile(r"(?<![\[\\])\^|(?<!\\)\$|\\[AZzBG]|\(\?<?[=!]")
+# Each matcher gets a new version, which identifies the filters it was built from in snapshots sent to the process pool.
+_matcher_versions = itertools.count(1)
+
+
+class TokenMatcher:
+    """
+    A matcher precompiled from all the filters of a token filter list.
+
+    The patterns of the filters are combined into a single alternation, which rules out content matching none of the
+    filters with a single scan. The vast majority of content doesn't match any filter, so the individual filters only
+    need to be evaluated in the rare case the combined pattern matches. Evaluating them individually keeps the exact
+    filters which triggered, and the matches they found.
+
+    Patterns which can't be safely combined (such as ones referencing groups) are always evaluated individually.
+    Quarantined filters are left out, and the matcher is rebuilt whenever a filter gets quarantined.
+
+    Patterns with anchors or lookarounds, and patterns whose matches can be longer than the margin searched around an
+    edit, are also kept aside as context dependent, since searching only part of the content isn't enough to rule them
+    out.
+
+    The filters only need `id`, `content`, `pattern` and `quarantined` attributes, so that the process pool can build a
+    matcher from a snapshot of the filters.
+    """
+
+    def __init__(self, filters: Iterable[TokenFilter], version: int | None = None):
+        self.version = version if version is not None else next(_matcher_versions)
+        self.filters = [
+            filter_ for filter_ in filters if filter_.pattern is not None and not filter_.quarantined
+        ]
+        self.context_dependent = [filter_ for filter_ in self.filters if self._is_context_dependent(filter_)]
+        combinable = {filter_ for filter_ in self.filters if self._is_combinable(filter_)}
+        self.uncombinable = [filter_ for filter_ in self.filters if filter_ not in combinable]
+
+        self.combined = None
+        if combinable:
+            try:
+                self.combined = regex.compile(
+                    "|".join(f"(?:{filter_.content})" for filter_ in self.filters if filter_ in combinable),
+                    flags=regex.IGNORECASE
+                )
+            except regex.error as e:
+                log.warning(f"Could not combine the token filters, falling back to evaluating each separately: {e}")
+                self.uncombinable = self.filters
+
+    @staticmethod
+    def _is_context_dependent(filter_: TokenFilter) -> bool:
+        """Return whether the pattern might match in a way which searching only the content around an edit misses."""
+        if CONTEXT_DEPENDENT_RE.search(filter_.content):
+            return True
+        width = max_width(filter_.content)
+        return width is None or width > EDIT_CONTEXT_MARGIN
+
+    @staticmethod
+    def _is_combinable(filter_: TokenFilter) -> bool:
+        """Return whether the filter's pattern can be embedded as-is in an alternation with other patterns."""
+        if filter_.pattern.groupindex or GROUP_REFERENCE_RE.search(filter_.content):
+            return False
+        try:
+            # Patterns with global inline flags can't be wrapped in a group.
+            regex.compile(f"(?:{filter_.content})")
+        except regex.error:
+            return False
+        return True
+
+    def candidates(self, content: str) -> list[TokenFilter]:
+        """Return the filters which might trigger on the given content, in the order they appear in the list."""
+        if self.combined is None:
+            return self.uncombinable
+        try:
+            if self.combined.search(content, timeout=FilteringSettings.token_timeout):
+                return self.filters
+        except TimeoutError:
+            # Let the filters time out individually, so that only the culprit gets quarantined.
+            log.info("Searching the combined token pattern timed out, evaluating each filter separately.")
+            return self.filters
+        return self.uncombinable
+
+    @property
+    def has_quarantined(self) -> bool:
+        """Whether any of the filters was quarantined since the matcher was built."""
+        return any(filter_.quarantined for filter_ in self.filters)
 
 
 class TokensList(FilterList[TokenFilter]):
@@ -29,9 +124,11 @@ class TokensList(FilterList[TokenFilter]):
     """
 
     name = "token"
+    content_only = True
 
     def __init__(self, filtering_cog: Filtering):
         super().__init__()
+        self._matchers: dict[ListType, TokenMatcher] = {}
         filtering_cog.subscribe(
             self, Event.MESSAGE, Event.MESSAGE_EDIT, Event.NICKNAME, Event.THREAD_NAME, Event.SNEKBOX
         )
@@ -45,6 +142,15 @@ class TokensList(FilterList[TokenFilter]):
         """Return the types of filters used by this list."""
         return {TokenFilter}
 
+    def matcher(self, list_type: ListType) -> TokenMatcher | None:
+        """Return the matcher precompiled from the filters of the list of the specified type, if it's loaded."""
+        return self._matchers.get(list_type)
+
+    def _on_filters_changed(self, list_type: ListType) -> None:
+        """Precompile the filters of the list of the specified type into a single matcher."""
+        super()._on_filters_changed(list_type)
+        self._matchers[list_type] = TokenMatcher(self[list_type].filters.values())
+
     async def actions_for(
         self, ctx: FilterContext
     ) -> tuple[ActionSettings | None, list[str], dict[ListType, list[Filter]]]:
@@ -52,23 +158,41 @@ class TokensList(FilterList[TokenFilter]):
         text = ctx.content
         if not text:
             return None, [], {}
-        if SPOILER_RE.search(text):
-            text = self._expand_spoilers(text)
-        text = clean_input(text)
+        analysis = ctx.content_analysis()
+        text = ctx.normalized.spoilers_expanded
         ctx = ctx.replace(content=text)
 
-        triggers = await self[ListType.DENY].filter_list_result(ctx)
+        matcher = self._matchers[ListType.DENY]
+        if analysis and analysis.token_version == matcher.version:
+            # The patterns were already searched in the process pool. Only the triggered filters are evaluated again,
+            # for their validations and matches.
+            for filter_ in matcher.filters:
+                if filter_.id in analysis.token_timeouts and not filter_.quarantined:
+                    filter_.quarantine()
+            candidates = [filter_ for filter_ in matcher.filters if filter_.id in analysis.token_triggers]
+        elif (previous := ctx.previously_filtered_content) is not None:
+            # Filters which didn't trigger before the edit can only trigger on a match overlapping the edited part.
+            # The filters which did are evaluated again to keep them in the cached triggers, so they aren't reported
+            # again on a later edit. Context dependent filters can't be ruled out by the edited part, so they're ruled
+            # out by searching the whole content instead. The candidates are still evaluated on the whole content.
+            start, end = edited_span(normalized_content(previous).spoilers_expanded, text)
+            window = text[max(start - EDIT_CONTEXT_MARGIN, 0):end + EDIT_CONTEXT_MARGIN]
+            window_candidates = set(matcher.candidates(window))
+            if matcher.context_dependent:
+                window_candidates.update(set(matcher.candidates(text)).intersection(matcher.context_dependent))
+            previous_triggers = ctx.message_cache.get_message_metadata(ctx.message.id).get(self[ListType.DENY], [])
+            candidates = [
+                filter_ for filter_ in matcher.filters
+                if filter_ in window_candidates or filter_ in previous_triggers
+            ]
+        else:
+            candidates = matcher.candidates(text)
+        triggers = await self[ListType.DENY].filter_list_result(ctx, candidates)
+        if matcher.has_quarantined:
+            self._matchers[ListType.DENY] = TokenMatcher(self[ListType.DENY].filters.values())
         actions = None
         messages = []
         if triggers:
             actions = self[ListType.DENY].merge_actions(triggers)
             messages = self[ListType.DENY].format_messages(triggers)
         return actions, messages, {ListType.DENY: triggers}
-
-    @staticmethod
-    def _expand_spoilers(text: str) -> str:
-        """Return a string containing all interpretations of a spoilered message."""
-        split_text = SPOILER_RE.split(text)
-        return "".join(
-            split_text[0::2] + split_text[1::2] + split_text
-        )
@@ -18,6 +18,7 @@ class UniquesList(UniquesListBase):
     """
 
     name = "unique"
+    content_only = True
 
     def get_filter_type(self, content: str) -> type[UniqueFilter] | None:
         """Get a subclass of filter matching the filter list and the filter's content."""
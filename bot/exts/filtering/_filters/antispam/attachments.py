@@ -1,10 +1,10 @@
 from datetime import timedelta
-from itertools import takewhile
 from typing import ClassVar
 
 import arrow
 from pydantic import BaseModel
 
+from bot.exts.filtering._antispam_window import resolve_records
 from bot.exts.filtering._filter_context import Event, FilterContext
 from bot.exts.filtering._filters.filter import UniqueFilter
 
@@ -30,14 +30,13 @@ class AttachmentsFilter(UniqueFilter):
 
     async def triggered_on(self, ctx: FilterContext) -> bool:
         """Search for the filter's content within a given context."""
-        earliest_relevant_at = arrow.utcnow() - timedelta(seconds=self.extra_fields.interval)
-        relevant_messages = list(takewhile(lambda msg: msg.created_at > earliest_relevant_at, ctx.content))
-
-        detected_messages = {msg for msg in relevant_messages if msg.author == ctx.author and len(msg.attachments) > 0}
-        total_recent_attachments = sum(len(msg.attachments) for msg in detected_messages)
+        recent = ctx.content.since(arrow.utcnow() - timedelta(seconds=self.extra_fields.interval))
+        total_recent_attachments = recent.totals.attachments
 
         if total_recent_attachments > self.extra_fields.threshold:
-            ctx.related_messages |= detected_messages
+            ctx.related_messages |= set(
+                resolve_records(record for record in recent.records if record.counts.attachments > 0)
+            )
             ctx.filter_info[self] = f"sent {total_recent_attachments} attachments"
             return True
         return False
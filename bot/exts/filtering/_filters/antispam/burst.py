@@ -1,5 +1,4 @@
 from datetime import timedelta
-from itertools import takewhile
 from typing import ClassVar
 
 import arrow
@@ -30,12 +29,10 @@ class BurstFilter(UniqueFilter):
 
     async def triggered_on(self, ctx: FilterContext) -> bool:
         """Search for the filter's content within a given context."""
-        earliest_relevant_at = arrow.utcnow() - timedelta(seconds=self.extra_fields.interval)
-        relevant_messages = list(takewhile(lambda msg: msg.created_at > earliest_relevant_at, ctx.content))
+        recent = ctx.content.since(arrow.utcnow() - timedelta(seconds=self.extra_fields.interval))
 
-        detected_messages = {msg for msg in relevant_messages if msg.author == ctx.author}
-        if len(detected_messages) > self.extra_fields.threshold:
-            ctx.related_messages |= detected_messages
-            ctx.filter_info[self] = f"sent {len(detected_messages)} messages"
+        if recent.totals.messages > self.extra_fields.threshold:
+            ctx.related_messages |= recent.messages
+            ctx.filter_info[self] = f"sent {recent.totals.messages} messages"
             return True
         return False
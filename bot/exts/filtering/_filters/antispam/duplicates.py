@@ -1,10 +1,10 @@
 from datetime import timedelta
-from itertools import takewhile
 from typing import ClassVar
 
 import arrow
 from pydantic import BaseModel
 
+from bot.exts.filtering._antispam_window import resolve_records
 from bot.exts.filtering._filter_context import Event, FilterContext
 from bot.exts.filtering._filters.filter import UniqueFilter
 
@@ -30,13 +30,19 @@ class DuplicatesFilter(UniqueFilter):
 
     async def triggered_on(self, ctx: FilterContext) -> bool:
         """Search for the filter's content within a given context."""
-        earliest_relevant_at = arrow.utcnow() - timedelta(seconds=self.extra_fields.interval)
-        relevant_messages = list(takewhile(lambda msg: msg.created_at > earliest_relevant_at, ctx.content))
-
-        detected_messages = {
-            msg for msg in relevant_messages
-            if msg.author == ctx.author and msg.content == ctx.message.content and msg.content
-        }
+        recent = ctx.content.since(arrow.utcnow() - timedelta(seconds=self.extra_fields.interval))
+
+        # Messages are only resolved once there are enough records with the same hash, and then their contents are
+        # compared, in case the hashes collide.
+        content = ctx.message.content
+        content_hash = hash(content)
+        candidates = [
+            record for record in recent.records if record.counts.chars and record.content_hash == content_hash
+        ]
+        if len(candidates) <= self.extra_fields.threshold:
+            return False
+
+        detected_messages = {message for message in resolve_records(candidates) if message.content == content}
         if len(detected_messages) > self.extra_fields.threshold:
             ctx.related_messages |= detected_messages
             ctx.filter_info[self] = f"sent {len(detected_messages)} duplicate messages"
@@ -1,6 +1,4 @@
-import re
 from datetime import timedelta
-from itertools import takewhile
 from typing import ClassVar
 
 import arrow
@@ -9,8 +7,6 @@ from pydantic import BaseModel
 from bot.exts.filtering._filter_context import Event, FilterContext
 from bot.exts.filtering._filters.filter import UniqueFilter
 
-LINK_RE = re.compile(r"(https?://\S+)")
-
 
 class ExtraLinksSettings(BaseModel):
     """Extra settings for when to trigger the antispam rule."""
@@ -33,20 +29,11 @@ class LinksFilter(UniqueFilter):
 
     async def triggered_on(self, ctx: FilterContext) -> bool:
         """Search for the filter's content within a given context."""
-        earliest_relevant_at = arrow.utcnow() - timedelta(seconds=self.extra_fields.interval)
-        relevant_messages = list(takewhile(lambda msg: msg.created_at > earliest_relevant_at, ctx.content))
-        detected_messages = {msg for msg in relevant_messages if msg.author == ctx.author}
-
-        total_links = 0
-        messages_with_links = 0
-        for msg in detected_messages:
-            total_matches = len(LINK_RE.findall(msg.content))
-            if total_matches:
-                messages_with_links += 1
-                total_links += total_matches
-
-        if total_links > self.extra_fields.threshold and messages_with_links > 1:
-            ctx.related_messages |= detected_messages
+        recent = ctx.content.since(arrow.utcnow() - timedelta(seconds=self.extra_fields.interval))
+        total_links = recent.totals.links
+
+        if total_links > self.extra_fields.threshold and recent.totals.messages_with_links > 1:
+            ctx.related_messages |= recent.messages
             ctx.filter_info[self] = f"sent {total_links} links"
             return True
         return False
@@ -1,18 +1,22 @@
+import asyncio
 from datetime import timedelta
-from itertools import takewhile
 from typing import ClassVar
 
 import arrow
-from discord import DeletedReferencedMessage, MessageType, NotFound
+from discord import HTTPException, MessageReference, NotFound
 from pydantic import BaseModel
 from pydis_core.utils.logging import get_logger
 
 import bot
+from bot.exts.filtering._antispam_window import AuthorWindow
 from bot.exts.filtering._filter_context import Event, FilterContext
 from bot.exts.filtering._filters.filter import UniqueFilter
 
 log = get_logger(__name__)
 
+# How long to wait for the messages replied to, before counting the mentions without knowing who was replied to.
+REPLY_FETCH_TIMEOUT = 3
+
 
 class ExtraMentionsSettings(BaseModel):
     """Extra settings for when to trigger the antispam rule."""
@@ -42,49 +46,48 @@ class MentionsFilter(UniqueFilter):
 
     async def triggered_on(self, ctx: FilterContext) -> bool:
         """Search for the filter's content within a given context."""
-        earliest_relevant_at = arrow.utcnow() - timedelta(seconds=self.extra_fields.interval)
-        relevant_messages = list(takewhile(lambda msg: msg.created_at > earliest_relevant_at, ctx.content))
-        detected_messages = {msg for msg in relevant_messages if msg.author == ctx.author}
-
-        # We use `msg.mentions` here as that is supplied by the api itself, to determine who was mentioned.
-        # Additionally, `msg.mentions` includes the user replied to, even if the mention doesn't occur in the body.
-        # In order to exclude users who are mentioned as a reply, we check if the msg has a reference
-        #
-        # While we could use regex to parse the message content, and get a list of
-        # the mentions, that solution is very prone to breaking.
-        # We would need to deal with codeblocks, escaping markdown, and any discrepancies between
-        # our implementation and discord's Markdown parser which would cause false positives or false negatives.
-        total_recent_mentions = 0
-        for msg in detected_messages:
-            # We check if the message is a reply, and if it is try to get the author
-            # since we ignore mentions of a user that we're replying to
-            reply_author = None
-
-            if msg.type == MessageType.reply:
-                ref = msg.reference
-
-                if not (resolved := ref.resolved):
-                    # It is possible, in a very unusual situation, for a message to have a reference
-                    # that is both not in the cache, and deleted while running this function.
-                    # In such a situation, this will throw an error which we catch.
-                    try:
-                        resolved = await bot.instance.get_partial_messageable(resolved.channel_id).fetch_message(
-                            resolved.message_id
-                        )
-                    except NotFound:
-                        log.info("Could not fetch the reference message as it has been deleted.")
-
-                if resolved and not isinstance(resolved, DeletedReferencedMessage):
-                    reply_author = resolved.author
-
-            for user in msg.mentions:
-                # Don't count bot or self mentions, or the user being replied to (if applicable)
-                if user.bot or user in {msg.author, reply_author}:
-                    continue
-                total_recent_mentions += 1
-
+        earliest = arrow.utcnow() - timedelta(seconds=self.extra_fields.interval)
+        window: AuthorWindow = ctx.content
+        recent = window.since(earliest)
+
+        # The mentions of each message are counted when it's recorded. Replies to messages which weren't resolved by
+        # then are counted once the authors of the messages replied to are fetched.
+        pending = {
+            record.pending_reply.message_id: record.pending_reply
+            for record in recent.records if record.pending_reply is not None
+        }
+        if pending:
+            await asyncio.gather(*(self._resolve_reply(window, reference) for reference in pending.values()))
+            recent = window.since(earliest)
+
+        total_recent_mentions = recent.totals.mentions
         if total_recent_mentions > self.extra_fields.threshold:
-            ctx.related_messages |= detected_messages
+            ctx.related_messages |= recent.messages
             ctx.filter_info[self] = f"sent {total_recent_mentions} mentions"
             return True
         return False
+
+    @staticmethod
+    async def _resolve_reply(window: AuthorWindow, reference: MessageReference) -> None:
+        """
+        Resolve the replies to a message in the window with its author, fetching the message if its author isn't known.
+
+        If the message can't be fetched in time, its author is recorded as unknown for as long as it's replied to in
+        the window, so that it isn't fetched again, and the mentions of the user replied to are counted.
+        """
+        author_id, pending_reply = window.reply_authors.lookup(reference)
+        if pending_reply is None:
+            window.resolve_reply(reference, author_id)
+            return
+
+        channel = bot.instance.get_partial_messageable(reference.channel_id)
+        try:
+            message = await asyncio.wait_for(channel.fetch_message(reference.message_id), REPLY_FETCH_TIMEOUT)
+        except NotFound:
+            log.info("Could not fetch the reference message as it has been deleted.")
+            window.resolve_reply(reference, None)
+        except (TimeoutError, HTTPException) as e:
+            log.info(f"Could not fetch the reference message {reference.message_id}: {e!r}")
+            window.resolve_reply(reference, None)
+        else:
+            window.resolve_reply(reference, message.author.id)
@@ -1,6 +1,4 @@
-import re
 from datetime import timedelta
-from itertools import takewhile
 from typing import ClassVar
 
 import arrow
@@ -9,8 +7,6 @@ from pydantic import BaseModel
 from bot.exts.filtering._filter_context import Event, FilterContext
 from bot.exts.filtering._filters.filter import UniqueFilter
 
-NEWLINES = re.compile(r"(\n+)")
-
 
 class ExtraNewlinesSettings(BaseModel):
     """Extra settings for when to trigger the antispam rule."""
@@ -37,25 +33,18 @@ class NewlinesFilter(UniqueFilter):
 
     async def triggered_on(self, ctx: FilterContext) -> bool:
         """Search for the filter's content within a given context."""
-        earliest_relevant_at = arrow.utcnow() - timedelta(seconds=self.extra_fields.interval)
-        relevant_messages = list(takewhile(lambda msg: msg.created_at > earliest_relevant_at, ctx.content))
-        detected_messages = {msg for msg in relevant_messages if msg.author == ctx.author}
-
-        # Identify groups of newline characters and get group & total counts
-        newline_counts = []
-        for msg in detected_messages:
-            newline_counts += [len(group) for group in NEWLINES.findall(msg.content)]
-        total_recent_newlines = sum(newline_counts)
+        recent = ctx.content.since(arrow.utcnow() - timedelta(seconds=self.extra_fields.interval))
+        total_recent_newlines = recent.totals.newlines
         # Get maximum newline group size
-        max_newline_group = max(newline_counts, default=0)
+        max_newline_group = max((record.max_newline_group for record in recent.records), default=0)
 
         # Check first for total newlines, if this passes then check for large groupings
         if total_recent_newlines > self.extra_fields.threshold:
-            ctx.related_messages |= detected_messages
+            ctx.related_messages |= recent.messages
             ctx.filter_info[self] = f"sent {total_recent_newlines} newlines"
             return True
         if max_newline_group > self.extra_fields.consecutive_threshold:
-            ctx.related_messages |= detected_messages
+            ctx.related_messages |= recent.messages
             ctx.filter_info[self] = f"sent {max_newline_group} consecutive newlines"
             return True
         return False
@@ -1,5 +1,4 @@
 from datetime import timedelta
-from itertools import takewhile
 from typing import ClassVar
 
 import arrow
@@ -30,13 +29,11 @@ class RoleMentionsFilter(UniqueFilter):
 
     async def triggered_on(self, ctx: FilterContext) -> bool:
         """Search for the filter's content within a given context."""
-        earliest_relevant_at = arrow.utcnow() - timedelta(seconds=self.extra_fields.interval)
-        relevant_messages = list(takewhile(lambda msg: msg.created_at > earliest_relevant_at, ctx.content))
-        detected_messages = {msg for msg in relevant_messages if msg.author == ctx.author}
-        total_recent_mentions = sum(len(msg.role_mentions) for msg in detected_messages)
+        recent = ctx.content.since(arrow.utcnow() - timedelta(seconds=self.extra_fields.interval))
+        total_recent_mentions = recent.totals.role_mentions
 
         if total_recent_mentions > self.extra_fields.threshold:
-            ctx.related_messages |= detected_messages
+            ctx.related_messages |= recent.messages
             ctx.filter_info[self] = f"sent {total_recent_mentions} role mentions"
             return True
         return False
@@ -1,4 +1,5 @@
 import re
+from collections.abc import Mapping
 from typing import ClassVar
 from urllib.parse import urlparse
 
@@ -8,6 +9,7 @@ from pydantic import BaseModel
 
 from bot.exts.filtering._filter_context import FilterContext
 from bot.exts.filtering._filters.filter import Filter
+from bot.exts.filtering._settings import Defaults
 
 URL_RE = re.compile(r"(?:https?://)?(\S+?)[\\/]*", flags=re.IGNORECASE)
 
@@ -34,13 +36,22 @@ class DomainFilter(Filter):
     name = "domain"
     extra_fields_type = ExtraDomainSettings
 
+    def __init__(self, filter_data: dict, defaults: Defaults | None = None):
+        super().__init__(filter_data, defaults)
+        self.registered_domain = tldextract.extract(self.content).registered_domain.lower()
+
     async def triggered_on(self, ctx: FilterContext) -> bool:
-        """Searches for a domain within a given context."""
-        domain = tldextract.extract(self.content).registered_domain.lower()
+        """
+        Searches for a domain within a given context.
 
+        The context content is either an iterable of URLs, or a mapping of URLs to their already extracted parts.
+        """
         for found_url in ctx.content:
-            extract = tldextract.extract(found_url)
-            if self.content.lower() in found_url and extract.registered_domain == domain:
+            if isinstance(ctx.content, Mapping):
+                extract = ctx.content[found_url]
+            else:
+                extract = tldextract.extract(found_url)
+            if self.content.lower() in found_url and extract.registered_domain == self.registered_domain:
                 if self.extra_fields.only_subdomains:
                     if not extract.subdomain and not urlparse(f"https://{found_url}").path:
                         return False
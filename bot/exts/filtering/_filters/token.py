@@ -1,9 +1,138 @@
-import re
+from __future__ import annotations
 
+import asyncio
+import typing
+
+import regex
+from discord import Colour, Embed
 from discord.ext.commands import BadArgument
+from pydis_core.utils import scheduling
 
+import bot
+from bot.constants import Channels, FilteringSettings
 from bot.exts.filtering._filter_context import FilterContext
 from bot.exts.filtering._filters.filter import Filter
+from bot.exts.filtering._settings import Defaults
+from bot.log import get_logger
+
+log = get_logger(__name__)
+
+try:
+    # The parser of the re module is private, so the nested repeat check is skipped if it ever moves or changes.
+    import re._constants as sre_constants
+    import re._parser as sre_parser
+except ImportError:
+    log.warning("The regular expression parser is unavailable, nested repeats won't be detected in token filters.")
+    sre_constants = sre_parser = None
+
+# Characters to build benchmark inputs from, in addition to the characters in the pattern itself.
+BENCHMARK_CHARACTERS = "a1 _.-"
+# The longest content a pattern is expected to run on, the length of a message.
+BENCHMARK_LENGTH = 4_000
+UNBOUNDED_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) if sre_constants else ()
+
+
+def _children(op: int, av: typing.Any) -> list[sre_parser.SubPattern]:
+    """Return the subpatterns directly nested in a parsed item."""
+    if op in UNBOUNDED_REPEATS or op == sre_constants.POSSESSIVE_REPEAT:
+        return [av[2]]
+    if op == sre_constants.SUBPATTERN:
+        return [av[3]]
+    if op == sre_constants.BRANCH:
+        return av[1]
+    if op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+        return [av[1]]
+    if op == sre_constants.ATOMIC_GROUP:
+        return [av]
+    if op == sre_constants.GROUPREF_EXISTS:
+        return [branch for branch in av[1:] if branch]
+    return []
+
+
+def _contains_repeat(op: int, av: typing.Any) -> bool:
+    """Return whether an unbounded repeat appears anywhere in the parsed item."""
+    if op in UNBOUNDED_REPEATS and av[1] == sre_constants.MAXREPEAT:
+        return True
+    return any(_contains_repeat(*item) for child in _children(op, av) for item in child)
+
+
+def _has_separator(body: sre_parser.SubPattern) -> bool:
+    """Return whether each iteration of a repeat over the body must match something besides its nested repeats."""
+    for op, av in body:
+        # Groups don't separate anything by themselves, but what they contain might.
+        if op == sre_constants.SUBPATTERN and _has_separator(av[3]):
+            return True
+        if not _contains_repeat(op, av) and sre_parser.SubPattern(body.state, [(op, av)]).getwidth()[0] > 0:
+            return True
+    return False
+
+
+def _has_nested_repeat(subpattern: sre_parser.SubPattern, inside_repeat: bool = False) -> bool:
+    """
+    Return whether an unbounded repeat is nested in another without anything separating the iterations.
+
+    In a pattern like `(a+)+`, the same text can be split between the iterations in exponentially many ways, and all of
+    them are tried before the pattern fails to match. A required separator, such as the dot in `([a-z]+\\.)+`, rules
+    that out.
+    """
+    for op, av in subpattern:
+        if op in UNBOUNDED_REPEATS:
+            _, max_repeat, body = av
+            unbounded = max_repeat == sre_constants.MAXREPEAT
+            if unbounded and inside_repeat:
+                return True
+            if _has_nested_repeat(body, unbounded and not _has_separator(body)):
+                return True
+        # Atomic groups and possessive repeats don't backtrack, so they're safe.
+        elif op not in (sre_constants.ATOMIC_GROUP, sre_constants.POSSESSIVE_REPEAT):
+            if any(_has_nested_repeat(child, inside_repeat) for child in _children(op, av)):
+                return True
+    return False
+
+
+def _is_exponential(content: str) -> bool:
+    """Return whether the pattern has a nested repeat, if it can be parsed by the standard library."""
+    if sre_parser is None:
+        return False
+    try:
+        return _has_nested_repeat(sre_parser.parse(content))
+    except sre_constants.error:
+        # The pattern uses syntax only the regex module supports, leave it to the benchmark.
+        return False
+    except (AttributeError, IndexError, TypeError, ValueError):
+        # The parsed form isn't a public interface, leave it to the benchmark if it's not what's expected.
+        log.warning(f"The pattern {content!r} couldn't be checked for nested repeats.", exc_info=True)
+        return False
+
+
+def max_width(content: str) -> int | None:
+    """Return the length of the longest text the pattern can match, or None if it's unbounded or can't be told."""
+    if sre_parser is None:
+        return None
+    try:
+        width = sre_parser.parse(content).getwidth()[1]
+    except sre_constants.error:
+        # The pattern uses syntax only the regex module supports.
+        return None
+    except (AttributeError, IndexError, TypeError, ValueError):
+        log.warning(f"The width of the pattern {content!r} couldn't be determined.", exc_info=True)
+        return None
+    return width if width < sre_constants.MAXREPEAT else None
+
+
+async def _exceeds_budget(pattern: regex.Pattern, content: str) -> bool:
+    """Return whether searching the pattern takes longer than the budget on inputs built to cause backtracking."""
+    characters = dict.fromkeys(BENCHMARK_CHARACTERS + "".join(c for c in content if c.isprintable()))
+    for character in characters:
+        # Repeating a character the pattern expects, then failing at the end, is what triggers heavy backtracking.
+        text = character * BENCHMARK_LENGTH + "\x00"
+        try:
+            await asyncio.to_thread(
+                pattern.search, text, timeout=FilteringSettings.token_benchmark_budget, concurrent=True
+            )
+        except TimeoutError:
+            return True
+    return False
 
 
 class TokenFilter(Filter):
@@ -11,16 +140,55 @@ class TokenFilter(Filter):
 
     name = "token"
 
+    def __init__(self, filter_data: dict, defaults: Defaults | None = None):
+        super().__init__(filter_data, defaults)
+        # Set when searching the pattern times out, after which the filter is ignored until it's edited.
+        # Filters which weren't edited are kept as they are when the lists are updated, so the flag carries over.
+        self.quarantined = False
+        try:
+            self.pattern = regex.compile(self.content, flags=regex.IGNORECASE)
+        except regex.error as e:
+            log.warning(f"The pattern of token filter {self.id} could not be compiled, it will be ignored: {e}")
+            self.pattern = None
+
     async def triggered_on(self, ctx: FilterContext) -> bool:
         """Searches for a regex pattern within a given context."""
-        pattern = self.content
+        if self.pattern is None or self.quarantined:
+            return False
 
-        match = re.search(pattern, ctx.content, flags=re.IGNORECASE)
+        try:
+            match = self.pattern.search(ctx.content, timeout=FilteringSettings.token_timeout)
+        except TimeoutError:
+            self.quarantine()
+            return False
         if match:
             ctx.matches.append(match[0])
             return True
         return False
 
+    def quarantine(self) -> None:
+        """Stop evaluating the filter, and alert the moderators that its pattern needs to be fixed."""
+        self.quarantined = True
+        log.warning(f"The pattern of token filter {self.id} timed out, and it will be ignored until it's edited.")
+        if bot.instance:
+            scheduling.create_task(self._send_quarantine_alert())
+
+    async def _send_quarantine_alert(self) -> None:
+        """Send an alert about the quarantined filter to the moderators."""
+        channel = bot.instance.get_channel(Channels.mod_alerts)
+        if not channel:
+            return
+        embed = Embed(
+            title="Token filter quarantined",
+            description=(
+                f"Searching for the pattern of {self} took longer than {FilteringSettings.token_timeout}s, "
+                "so the filter will be ignored until it's edited. "
+                "The pattern is probably backtracking too much, and should be simplified."
+            ),
+            colour=Colour.orange(),
+        )
+        await channel.send(embed=embed)
+
     @classmethod
     async def process_input(cls, content: str, description: str) -> tuple[str, str]:
         """
@@ -29,7 +197,18 @@ class TokenFilter(Filter):
         A BadArgument should be raised if the content can't be used.
         """
         try:
-            re.compile(content)
-        except re.error as e:
+            pattern = regex.compile(content, flags=regex.IGNORECASE)
+        except regex.error as e:
             raise BadArgument(str(e))
+
+        if _is_exponential(content):
+            raise BadArgument(
+                "The pattern has a repeat nested in another repeat, such as `(a+)+`, which can take exponential time. "
+                "Restructure it, or use an atomic group or a possessive quantifier."
+            )
+        if await _exceeds_budget(pattern, content):
+            raise BadArgument(
+                f"The pattern took longer than {FilteringSettings.token_benchmark_budget}s to search a benchmark "
+                "input. It's probably backtracking too much, and should be simplified."
+            )
         return content, description
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+
+from discord import Invite, NotFound
+
+from bot.bot import Bot
+from bot.log import get_logger
+
+log = get_logger(__name__)
+
+CACHE_SIZE = 2_000
+# How long to remember an invite that was resolved successfully.
+INVITE_TTL = 10 * 60
+# How long to remember that an invite code doesn't resolve. Kept shorter, as such a code can be claimed later.
+NOT_FOUND_TTL = 2 * 60
+
+
+class InviteCache:
+    """
+    A bounded cache of resolved Discord invites.
+
+    Both invites which were found and invite codes which weren't found are cached, each with its own time to live.
+    When the cache is full, the least recently used codes are evicted first.
+
+    Concurrent lookups of the same code which isn't cached share a single request to the Discord API.
+    """
+
+    def __init__(
+        self, bot: Bot, maxsize: int = CACHE_SIZE, ttl: float = INVITE_TTL, not_found_ttl: float = NOT_FOUND_TTL
+    ):
+        self.bot = bot
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.not_found_ttl = not_found_ttl
+
+        # A mapping of invite codes to the time the entry expires, and the invite or None if it wasn't found.
+        self._entries: OrderedDict[str, tuple[float, Invite | None]] = OrderedDict()
+        self._pending: dict[str, asyncio.Future[Invite | None]] = {}
+
+    def get(self, code: str) -> tuple[bool, Invite | None]:
+        """Return whether there's a valid entry for the code, and the cached invite (None if it wasn't found)."""
+        entry = self._entries.get(code)
+        if entry is None:
+            return False, None
+
+        expires_at, invite = entry
+        if expires_at <= time.monotonic():
+            del self._entries[code]
+            return False, None
+
+        self._entries.move_to_end(code)
+        return True, invite
+
+    def set(self, code: str, invite: Invite | None) -> None:
+        """Cache the invite resolved from the code, or None if the invite wasn't found."""
+        ttl = self.ttl if invite is not None else self.not_found_ttl
+        self._entries[code] = (time.monotonic() + ttl, invite)
+        self._entries.move_to_end(code)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        self._entries.clear()
+
+    async def fetch(self, code: str) -> Invite | None:
+        """Return the invite matching the code, or None if it doesn't exist."""
+        found, invite = self.get(code)
+        if found:
+            self.bot.stats.incr("filters.invite_cache.hit")
+            return invite
+
+        self.bot.stats.incr("filters.invite_cache.miss")
+        if code not in self._pending:
+            self._pending[code] = asyncio.ensure_future(self._resolve(code))
+        # Shield the shared request, so that a cancelled caller doesn't cancel it for everyone else waiting on it.
+        return await asyncio.shield(self._pending[code])
+
+    async def fetch_many(self, codes: Iterable[str]) -> dict[str, Invite | None]:
+        """Resolve all the given codes concurrently, and return a mapping of each code to its invite or None."""
+        codes = list(dict.fromkeys(codes))
+        invites = await asyncio.gather(*(self.fetch(code) for code in codes))
+        return dict(zip(codes, invites, strict=True))
+
+    async def _resolve(self, code: str) -> Invite | None:
+        """Fetch the invite from the Discord API and cache the result."""
+        try:
+            invite = await self.bot.fetch_invite(code)
+        except NotFound:
+            invite = None
+        finally:
+            self._pending.pop(code, None)
+
+        self.set(code, invite)
+        return invite
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import time
+import typing
+from collections import deque
+
+from discord import Colour, Embed
+from pydis_core.utils import scheduling
+
+import bot
+from bot.constants import Channels, FilteringSettings
+from bot.log import get_logger
+
+if typing.TYPE_CHECKING:
+    from bot.exts.filtering._filter_context import Event
+    from bot.exts.filtering._filter_lists.filter_list import AtomicList, ListType
+    from bot.exts.filtering._filters.filter import Filter
+
+log = get_logger(__name__)
+
+# How many of the latest evaluation times of each filter to keep.
+RECENT_SAMPLES = 100
+
+
+class FilterTimings:
+    """The latest evaluation times of a single filter, in seconds."""
+
+    def __init__(self, atomic_list: AtomicList, filter_: Filter):
+        self.atomic_list = atomic_list
+        self.filter = filter_
+        self.samples: deque[float] = deque(maxlen=RECENT_SAMPLES)
+        self.last_alert_at: float | None = None
+
+    @property
+    def mean(self) -> float:
+        """The average of the recent evaluation times."""
+        return sum(self.samples) / len(self.samples)
+
+    @property
+    def max(self) -> float:
+        """The longest of the recent evaluation times."""
+        return max(self.samples)
+
+    def over_budget(self, budget: float) -> int:
+        """Return how many of the recent evaluations took longer than the budget."""
+        return sum(sample > budget for sample in self.samples)
+
+    def __str__(self) -> str:
+        return f"{self.atomic_list.label} {self.filter}"
+
+
+class LatencyTracker:
+    """
+    Time the filter lists and the filters, and report the timings to statsd.
+
+    Sending a timing for every filter evaluated on every message would flood statsd, so the timings of individual
+    filters are sampled at the configured rate, which statsd scales back up. The latest few timings of each filter are
+    also kept in memory to find the slowest filters. A filter which repeatedly goes over the latency budget is reported
+    in the dev log, at most once per cooldown period.
+    """
+
+    def __init__(self):
+        self._filters: dict[tuple[str, str, int], FilterTimings] = {}
+
+    def record_list(self, list_name: str, event: Event, seconds: float) -> None:
+        """Report how long it took a filter list to handle an event."""
+        self._timing(f"filters.latency.list.{list_name}.{event.name.lower()}", seconds)
+
+    def record_atomic_list(self, atomic_list: AtomicList, event: Event, seconds: float) -> None:
+        """Report how long it took to evaluate the filters of an atomic list."""
+        self._timing(
+            f"filters.latency.atomic_list.{atomic_list.name}.{atomic_list.list_type.name.lower()}.{event.name.lower()}",
+            seconds
+        )
+
+    def record_filter(self, atomic_list: AtomicList, filter_: Filter, event: Event, seconds: float) -> None:
+        """Record how long it took to evaluate a filter, and alert if it's been repeatedly slow."""
+        self._timing(
+            f"filters.latency.filter.{atomic_list.name}.{atomic_list.list_type.name.lower()}.{event.name.lower()}"
+            f".{filter_.id}",
+            seconds,
+            FilteringSettings.filter_timing_sample_rate
+        )
+        key = (atomic_list.name, atomic_list.list_type.name, filter_.id)
+        timings = self._filters.get(key)
+        if timings is None:
+            timings = self._filters[key] = FilterTimings(atomic_list, filter_)
+        # The filter might have been edited since it was last recorded.
+        timings.atomic_list, timings.filter = atomic_list, filter_
+        timings.samples.append(seconds)
+
+        budget = FilteringSettings.filter_latency_budget
+        if seconds > budget and timings.over_budget(budget) >= FilteringSettings.slow_filter_strikes:
+            self._maybe_alert(timings)
+
+    def slowest(self, amount: int) -> list[FilterTimings]:
+        """Return the filters with the longest average of their recent evaluation times, slowest first."""
+        return sorted(self._filters.values(), key=lambda timings: timings.mean, reverse=True)[:amount]
+
+    def prune(self, atomic_list: AtomicList) -> None:
+        """Forget the timings of filters which are no longer in the atomic list."""
+        list_type = atomic_list.list_type.name
+        for key in [
+            key for key in self._filters
+            if key[:2] == (atomic_list.name, list_type) and key[2] not in atomic_list.filters
+        ]:
+            del self._filters[key]
+
+    def forget_list(self, list_name: str, list_type: ListType) -> None:
+        """Forget the timings of all the filters of an atomic list which was removed."""
+        for key in [key for key in self._filters if key[:2] == (list_name, list_type.name)]:
+            del self._filters[key]
+
+    def clear(self) -> None:
+        """Forget all recorded filter timings."""
+        self._filters.clear()
+
+    @staticmethod
+    def _timing(stat: str, seconds: float, rate: float = 1) -> None:
+        """Send a timing in milliseconds to statsd at the given sample rate, if the bot is running."""
+        if bot.instance:
+            bot.instance.stats.timing(stat, seconds * 1000, rate)
+
+    def _maybe_alert(self, timings: FilterTimings) -> None:
+        """Alert about a slow filter in the dev log, unless it was alerted about recently."""
+        now = time.monotonic()
+        if timings.last_alert_at is not None and now - timings.last_alert_at < FilteringSettings.slow_filter_cooldown:
+            return
+        timings.last_alert_at = now
+
+        budget = FilteringSettings.filter_latency_budget
+        description = (
+            f"{timings} went over the latency budget of {budget * 1000:.0f}ms "
+            f"in {timings.over_budget(budget)} of its last {len(timings.samples)} evaluations.\n"
+            f"Average: {timings.mean * 1000:.2f}ms, longest: {timings.max * 1000:.2f}ms."
+        )
+        log.warning(description)
+        if bot.instance:
+            scheduling.create_task(self._send_alert(description))
+
+    @staticmethod
+    async def _send_alert(description: str) -> None:
+        """Send the slow filter alert to the dev log."""
+        channel = bot.instance.get_channel(Channels.dev_log)
+        if channel:
+            await channel.send(embed=Embed(title="Slow filter", description=description, colour=Colour.orange()))
+
+
+latency_tracker = LatencyTracker()
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import datetime
+import heapq
+import time
+from collections import defaultdict
+from collections.abc import Coroutine, Iterable
+
+import arrow
+import discord
+from discord import HTTPException, NotFound
+from pydis_core.site_api import ResponseCodeError
+from pydis_core.utils import scheduling
+
+from bot.bot import Bot
+from bot.log import get_logger
+
+log = get_logger(__name__)
+
+# How long to collect new offensive messages before posting them to the API, and how many to collect at most.
+POST_BATCH_DELAY = 5
+POST_BATCH_SIZE = 50
+# How many times to try posting a message to the API, a batch delay apart, before giving up on it.
+POST_ATTEMPTS = 5
+# How many requests to the site API to make at the same time. The API has no bulk endpoints for offensive messages.
+API_CONCURRENCY = 5
+# Discord only bulk deletes messages younger than 14 days. A minute is left as a margin for clock differences.
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14, minutes=-1)
+BULK_DELETE_MAX_MESSAGES = 100
+
+
+async def gather_bounded(coros: Iterable[Coroutine], limit: int = API_CONCURRENCY) -> None:
+    """Run the coroutines concurrently, at most `limit` at a time."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro: Coroutine) -> None:
+        async with semaphore:
+            await coro
+
+    await asyncio.gather(*(run(coro) for coro in coros))
+
+
+class OffensiveMessageDeleter:
+    """
+    Persist offensive messages to the site API, and delete them once their deletion date is reached.
+
+    New messages are posted to the API in batches, and messages which failed to post are retried with the next batch.
+    The messages waiting for deletion are kept in a single queue ordered by their deletion date, which one task sleeps
+    on. Messages which are due at the same time are deleted in bulk per channel where Discord allows it, and are then
+    removed from the API.
+    """
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        # A heap of the deletion timestamp, message ID, and channel ID of each message waiting for deletion.
+        self._queue: list[tuple[float, int, int]] = []
+        self._queue_changed = asyncio.Event()
+        # The data of each message waiting to be posted, and how many times posting it failed.
+        self._pending_posts: list[tuple[dict, int]] = []
+        self._flush_task: asyncio.Task | None = None
+        self._worker: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """Load the messages waiting for deletion from the API, and start deleting them when they're due."""
+        response = await self.bot.api_client.get("bot/offensive-messages")
+        for msg in response:
+            self._schedule(msg)
+        self._worker = scheduling.create_task(self._delete_forever(), event_loop=self.bot.loop)
+
+    async def stop(self) -> None:
+        """Stop deleting messages, and post any messages which weren't posted yet."""
+        if self._worker:
+            self._worker.cancel()
+        if self._flush_task:
+            self._flush_task.cancel()
+        await self.flush()
+        if self._flush_task:  # Posts which failed would be retried later.
+            self._flush_task.cancel()
+        if self._pending_posts:
+            log.warning(f"Dropping {len(self._pending_posts)} offensive messages which failed to post.")
+            self._pending_posts = []
+
+    def add(self, msg: discord.Message, delete_at: datetime.datetime) -> None:
+        """Queue a message to be posted to the API, and to be deleted at the given time."""
+        data = {"id": msg.id, "channel_id": msg.channel.id, "delete_date": delete_at.isoformat()}
+        self._pending_posts.append((data, 0))
+        if len(self._pending_posts) >= POST_BATCH_SIZE:
+            scheduling.create_task(self.flush(), event_loop=self.bot.loop)
+        else:
+            self._flush_soon()
+
+    def _flush_soon(self) -> None:
+        """Post the pending messages once the batch delay has passed, unless that's already scheduled."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = scheduling.create_task(self._flush_later(), event_loop=self.bot.loop)
+
+    async def _flush_later(self) -> None:
+        """Post the pending messages once the batch delay has passed."""
+        await asyncio.sleep(POST_BATCH_DELAY)
+        self._flush_task = None  # Messages which fail to post now are retried by the next flush.
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Post all the pending messages to the API and queue them for deletion, keeping the failed ones for later."""
+        batch, self._pending_posts = self._pending_posts, []
+        await gather_bounded(self._post(data, failures) for data, failures in batch)
+
+    async def _post(self, data: dict, failures: int) -> None:
+        """
+        Post a single message to the API, and queue it for deletion if it was added.
+
+        If posting fails for a reason other than a rejected request, it's retried with the next batch.
+        """
+        try:
+            await self.bot.api_client.post("bot/offensive-messages", json=data)
+        except ResponseCodeError as e:
+            if e.status == 400 and "already exists" in e.response_json.get("id", [""])[0]:
+                log.debug(f"Offensive message {data['id']} already exists.")
+            elif e.status < 500:
+                log.error(f"Offensive message {data['id']} was rejected by the API: {e}")
+            else:
+                self._retry_post(data, failures, e)
+        except Exception as e:
+            self._retry_post(data, failures, e)
+        else:
+            self._schedule(data)
+            log.trace(f"Offensive message {data['id']} will be deleted on {data['delete_date']}")
+
+    def _retry_post(self, data: dict, failures: int, error: Exception) -> None:
+        """Queue the message to be posted again with the next batch, unless it failed too many times already."""
+        failures += 1
+        if failures >= POST_ATTEMPTS:
+            log.error(f"Offensive message {data['id']} failed to post {failures} times, giving up: {error!r}")
+            return
+        log.warning(f"Offensive message {data['id']} failed to post, retrying later: {error!r}")
+        self._pending_posts.append((data, failures))
+        self._flush_soon()
+
+    def _schedule(self, msg: dict) -> None:
+        """Queue the message for deletion on its deletion date."""
+        heapq.heappush(self._queue, (arrow.get(msg["delete_date"]).timestamp(), msg["id"], msg["channel_id"]))
+        self._queue_changed.set()
+
+    async def _delete_forever(self) -> None:
+        """Wait until the earliest queued messages are due, and delete all the messages which are due by then."""
+        while True:
+            self._queue_changed.clear()
+            if not self._queue:
+                await self._queue_changed.wait()
+                continue
+
+            delay = self._queue[0][0] - time.time()
+            if delay > 0:
+                # Wake up early if a message which is due sooner is queued meanwhile.
+                with contextlib.suppress(TimeoutError):
+                    async with asyncio.timeout(delay):
+                        await self._queue_changed.wait()
+                continue
+
+            now = time.time()
+            due = []
+            while self._queue and self._queue[0][0] <= now:
+                due.append(heapq.heappop(self._queue))
+            try:
+                await self._delete(due)
+            except Exception:
+                # The messages are still in the API, so they'll be deleted after the next restart.
+                log.exception(f"Failed to delete {len(due)} offensive messages.")
+
+    async def _delete(self, due: list[tuple[float, int, int]]) -> None:
+        """Delete the messages from their channels, and then from the API."""
+        ids_per_channel = defaultdict(list)
+        for _, msg_id, channel_id in due:
+            ids_per_channel[channel_id].append(msg_id)
+
+        for channel_id, msg_ids in ids_per_channel.items():
+            if channel := self.bot.get_channel(channel_id):
+                await self._delete_from_channel(channel, msg_ids)
+
+        await gather_bounded(self._delete_record(msg_id) for _, msg_id, _ in due)
+
+    async def _delete_from_channel(self, channel: discord.abc.Messageable, msg_ids: list[int]) -> None:
+        """Delete the messages from the channel, in bulk where possible."""
+        single = msg_ids
+        if hasattr(channel, "delete_messages"):
+            bulk_cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+            recent, single = [], []
+            for msg_id in msg_ids:
+                (recent if discord.utils.snowflake_time(msg_id) > bulk_cutoff else single).append(msg_id)
+            for start in range(0, len(recent), BULK_DELETE_MAX_MESSAGES):
+                chunk = recent[start:start + BULK_DELETE_MAX_MESSAGES]
+                try:
+                    await channel.delete_messages([discord.Object(msg_id) for msg_id in chunk])
+                except Exception as e:
+                    log.info(f"Failed to bulk delete {len(chunk)} messages in {channel}, deleting separately: {e!r}")
+                    single.extend(chunk)
+                else:
+                    log.info(f"Deleted {len(chunk)} offensive messages in {channel}.")
+
+        for msg_id in single:
+            try:
+                await channel.get_partial_message(msg_id).delete()
+            except NotFound:
+                log.info(
+                    f"Tried to delete message {msg_id}, but the message can't be found "
+                    f"(it has been probably already deleted)."
+                )
+            except HTTPException as e:
+                log.warning(f"Failed to delete message {msg_id}: status {e.status}")
+            except Exception as e:
+                log.warning(f"Failed to delete message {msg_id}: {e!r}")
+
+    async def _delete_record(self, msg_id: int) -> None:
+        """Remove the message from the API."""
+        try:
+            await self.bot.api_client.delete(f"bot/offensive-messages/{msg_id}")
+        except Exception as e:
+            log.error(f"Failed to remove offensive message {msg_id} from the database: {e!r}")
+        else:
+            log.info(f"Deleted the offensive message with id {msg_id}.")
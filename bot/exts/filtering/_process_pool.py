@@ -0,0 +1,214 @@
+"""
+Matching of message content in worker processes, so that CPU-heavy filtering doesn't block the event loop.
+
+The worker processes don't have the filter lists. Instead, each task names the version of the filter snapshot it should
+be matched against, and a worker which doesn't have that version yet asks for it, after which the task is sent again
+along with the snapshot. The snapshot is immutable and versioned by the token matcher it was taken from, so editing the
+filters creates a new version which the workers pick up on their next task.
+
+Only pure content matching is done in the workers: normalizing the content, searching the token patterns, and
+extracting the URLs. Anything which is async or needs Discord, such as fetching invites, validating the filters
+against the context, and taking actions, is left to the filter lists on the event loop, using the results.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import typing
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor
+from dataclasses import dataclass, replace
+
+import regex
+import tldextract
+from tldextract.tldextract import ExtractResult
+
+from bot.constants import FilteringSettings
+from bot.exts.filtering._filter_lists.domain import URL_RE
+from bot.exts.filtering._filter_lists.filter_list import ListType
+from bot.exts.filtering._filter_lists.token import TokenMatcher
+from bot.exts.filtering._utils import normalized_content
+from bot.log import get_logger
+
+if typing.TYPE_CHECKING:
+    from bot.exts.filtering._filter_lists.token import TokensList
+
+log = get_logger(__name__)
+
+# The normalized views of the content which the workers compute, and which are shared with the filter lists.
+SHARED_VIEWS = ("cleaned", "cleaned_with_newlines", "spoilers_expanded")
+# How many times a broken pool is replaced with a new one, before giving up on the pool altogether.
+MAX_RESTARTS = 3
+
+
+@dataclass(frozen=True)
+class FilterSnapshot:
+    """The immutable data the workers need from the filter lists, versioned by the token matcher it was taken from."""
+
+    version: int
+    token_patterns: tuple[tuple[int, str], ...]  # The ID and pattern of each denied token filter, in list order.
+
+
+@dataclass(frozen=True)
+class ContentAnalysis:
+    """The results of matching some content in a worker process."""
+
+    content: str
+    token_version: int  # The version of the snapshot the tokens were matched against.
+    views: dict[str, str]
+    token_triggers: frozenset[int]  # The IDs of the token filters whose patterns were found.
+    token_timeouts: frozenset[int]  # The IDs of the token filters whose patterns timed out.
+    extracted_urls: dict[str, ExtractResult]
+
+
+class SnapshotFilter:
+    """A token filter rebuilt from a snapshot in a worker process."""
+
+    def __init__(self, id_: int, content: str):
+        self.id = id_
+        self.content = content
+        self.quarantined = False
+        try:
+            self.pattern = regex.compile(content, flags=regex.IGNORECASE)
+        except regex.error:
+            self.pattern = None
+
+
+# The state of the worker process.
+_worker_matcher: TokenMatcher | None = None
+
+
+def _load_snapshot(snapshot: FilterSnapshot) -> None:
+    """Build the token matcher of the worker process from the snapshot."""
+    global _worker_matcher
+    filters = [SnapshotFilter(id_, content) for id_, content in snapshot.token_patterns]
+    _worker_matcher = TokenMatcher(filters, version=snapshot.version)
+
+
+def analyze_content(content: str, version: int, snapshot: FilterSnapshot | None = None) -> ContentAnalysis | None:
+    """
+    Match the content against the snapshot of the given version, and return the results.
+
+    If the worker doesn't have the snapshot, None is returned, and the task should be sent again with the snapshot.
+    """
+    if snapshot is not None:
+        _load_snapshot(snapshot)
+    if _worker_matcher is None or _worker_matcher.version != version:
+        return None
+
+    normalized = normalized_content(content)
+    text = normalized.spoilers_expanded
+    triggers = set()
+    timeouts = set()
+    for filter_ in _worker_matcher.candidates(text):
+        if filter_.quarantined:
+            continue
+        try:
+            if filter_.pattern.search(text, timeout=FilteringSettings.token_timeout):
+                triggers.add(filter_.id)
+        except TimeoutError:
+            # Stop evaluating it in this worker. The filter list quarantines the filter, which creates a new snapshot.
+            filter_.quarantined = True
+            timeouts.add(filter_.id)
+
+    urls = {match.group(1).lower().rstrip("/") for match in URL_RE.finditer(normalized.cleaned)}
+    return ContentAnalysis(
+        content,
+        version,
+        {view: getattr(normalized, view) for view in SHARED_VIEWS},
+        frozenset(triggers),
+        frozenset(timeouts),
+        {url: tldextract.extract(url) for url in urls},
+    )
+
+
+class FilterProcessPool:
+    """
+    Send content to be matched in worker processes, along with snapshots of the filters whenever they change.
+
+    If the worker processes die, the pool is replaced with a new one, up to `MAX_RESTARTS` times, after which the pool
+    is disabled and the filter lists do all the matching themselves.
+    """
+
+    def __init__(self, executor: Executor | None = None):
+        # A pool which was passed in can't be recreated, so it's disabled if it breaks.
+        self._owns_executor = executor is None
+        self.executor: Executor | None = executor or self._create_executor()
+        self._snapshot: FilterSnapshot | None = None
+        self._pending = 0
+        self._restarts = 0
+
+    @staticmethod
+    def _create_executor() -> ProcessPoolExecutor:
+        """Start a new pool of worker processes."""
+        return ProcessPoolExecutor(
+            max_workers=FilteringSettings.process_pool_workers,
+            # Forking a process with a running event loop and threads isn't safe.
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def snapshot(self, tokens_list: TokensList | None) -> FilterSnapshot:
+        """Return the snapshot of the current filters, taking a new one if they changed since the last one."""
+        matcher = tokens_list.matcher(ListType.DENY) if tokens_list else None
+        version = matcher.version if matcher else 0
+        if self._snapshot is None or self._snapshot.version != version:
+            patterns = tuple((filter_.id, filter_.content) for filter_ in matcher.filters) if matcher else ()
+            self._snapshot = FilterSnapshot(version, patterns)
+        return self._snapshot
+
+    async def analyze(self, content: str, tokens_list: TokensList | None) -> ContentAnalysis | None:
+        """
+        Match the content in a worker process, and share the normalized views it computed.
+
+        None is returned if the pool is unavailable, backed up, or didn't respond in time, in which case the filter
+        lists do the matching themselves.
+        """
+        if self.executor is None:
+            return None
+        if self._pending >= FilteringSettings.process_pool_max_pending:
+            log.trace("The filtering process pool is backed up, matching the content on the event loop instead.")
+            return None
+
+        snapshot = self.snapshot(tokens_list)
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        self._pending += 1
+        try:
+            async with asyncio.timeout(FilteringSettings.process_pool_timeout):
+                analysis = await loop.run_in_executor(executor, analyze_content, content, snapshot.version)
+                if analysis is None:
+                    analysis = await loop.run_in_executor(
+                        executor, analyze_content, content, snapshot.version, snapshot
+                    )
+        except TimeoutError:
+            log.warning("The filtering process pool didn't respond in time.")
+            return None
+        except BrokenExecutor as e:
+            log.warning(f"The filtering process pool broke: {e!r}")
+            self._replace_broken(executor)
+            return None
+        finally:
+            self._pending -= 1
+
+        # Keep the original string rather than the copy sent back from the worker.
+        analysis = replace(analysis, content=content)
+        normalized_content(content).prime(analysis.views)
+        return analysis
+
+    def _replace_broken(self, executor: Executor) -> None:
+        """Replace the broken pool with a new one, or disable the pool if it can't be replaced."""
+        if executor is not self.executor:  # Another task already handled it.
+            return
+        executor.shutdown(wait=False, cancel_futures=True)
+        if not self._owns_executor or self._restarts >= MAX_RESTARTS:
+            log.error("Disabling the filtering process pool, content will be matched on the event loop.")
+            self.executor = None
+            return
+        self._restarts += 1
+        log.info(f"Restarting the filtering process pool ({self._restarts}/{MAX_RESTARTS}).")
+        self.executor = self._create_executor()
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, cancelling any pending tasks."""
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
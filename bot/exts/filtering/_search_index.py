@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import typing
+from collections import defaultdict
+from collections.abc import Hashable, Iterable
+from typing import Any
+
+if typing.TYPE_CHECKING:
+    from bot.exts.filtering._filters.filter import Filter
+
+# The filter fields which can be searched by substring, rather than by settings.
+TEXT_FIELDS = ("content", "description")
+
+
+def normalize_value(value: Any) -> Hashable:
+    """Return a hashable form of a setting value, such that values which `repr_equals` considers equal are the same."""
+    if isinstance(value, tuple | list | set):
+        return frozenset(map(str, value))
+    return str(value)
+
+
+def trigrams(text: str) -> set[str]:
+    """Return the sequences of three characters in the lowercased text."""
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class FilterSearchIndex:
+    """
+    Inverted indexes for finding the filters of an atomic list which match a search, without going over all of them.
+
+    Setting overrides and filter settings are indexed by their name and normalized value, and the filters are indexed by
+    their type. The content and description are indexed by their trigrams, for substring searches.
+
+    The index is built when it's first searched, and is then updated as filters are added, edited and removed.
+    """
+
+    def __init__(self):
+        self.built = False
+        self._clear()
+
+    def _clear(self) -> None:
+        """Forget all indexed filters."""
+        self.filters: dict[int, Filter] = {}
+        self._by_type: defaultdict[type[Filter], set[int]] = defaultdict(set)
+        # The IDs of the filters overriding each setting, the IDs per overridden value, and the IDs of filters whose
+        # override is None, which matches any value.
+        self._overridden: defaultdict[str, set[int]] = defaultdict(set)
+        self._by_override: defaultdict[tuple[str, Hashable], set[int]] = defaultdict(set)
+        self._any_override: defaultdict[str, set[int]] = defaultdict(set)
+        self._by_filter_setting: defaultdict[tuple[str, Hashable], set[int]] = defaultdict(set)
+        self._trigrams: dict[str, defaultdict[str, set[int]]] = {field: defaultdict(set) for field in TEXT_FIELDS}
+
+    def build(self, filters: Iterable[Filter]) -> None:
+        """Index all the given filters, replacing anything indexed before."""
+        self._clear()
+        self.built = True
+        for filter_ in filters:
+            self.add(filter_)
+
+    def add(self, filter_: Filter) -> None:
+        """Index the filter, replacing the filter with the same ID if there is one. Does nothing until it's built."""
+        if not self.built:
+            return
+        if existing := self.filters.get(filter_.id):
+            for id_set in self._entries(existing):
+                id_set.discard(filter_.id)
+        # Assigning to an existing key keeps its position, so an edited filter stays in its place in the results.
+        self.filters[filter_.id] = filter_
+        for id_set in self._entries(filter_):
+            id_set.add(filter_.id)
+
+    def remove(self, filter_id: int) -> None:
+        """Remove the filter with the given ID from the index. Does nothing until it's built."""
+        filter_ = self.filters.pop(filter_id, None)
+        if filter_ is None:
+            return
+        for id_set in self._entries(filter_):
+            id_set.discard(filter_id)
+
+    def _entries(self, filter_: Filter) -> list[set[int]]:
+        """Return the sets of IDs the filter belongs in."""
+        entries = [self._by_type[type(filter_)]]
+        overrides, _ = filter_.overrides
+        for setting_name, value in overrides.items():
+            entries.append(self._overridden[setting_name])
+            if value is None:
+                entries.append(self._any_override[setting_name])
+            else:
+                entries.append(self._by_override[(setting_name, normalize_value(value))])
+
+        filter_settings = filter_.extra_fields.model_dump() if filter_.extra_fields else {}
+        for setting_name, value in filter_settings.items():
+            entries.append(self._by_filter_setting[(setting_name, normalize_value(value))])
+
+        for field in TEXT_FIELDS:
+            text = getattr(filter_, field) or ""
+            entries.extend(self._trigrams[field][trigram] for trigram in trigrams(text))
+        return entries
+
+    def search(
+        self,
+        filter_type: type[Filter] | None,
+        settings: dict[str, Any],
+        filter_settings: dict[str, Any],
+        differ_by_default: set[str],
+        text_query: dict[str, str],
+    ) -> list[Filter]:
+        """
+        Return the filters matching the query, in the order they were added.
+
+        A filter matches a setting if it overrides it with the queried value, or doesn't override it and the list's
+        default already matches, that is if the setting isn't in `differ_by_default`. The filter settings must all be
+        equal to the queried values, and the text fields must contain the queried substrings, ignoring case.
+        """
+        if filter_type:
+            candidates = set().union(*(
+                ids for type_, ids in self._by_type.items() if issubclass(type_, filter_type)
+            ))
+        else:
+            candidates = set(self.filters)
+
+        for setting_name, value in settings.items():
+            if not candidates:
+                break
+            matching = self._by_override.get((setting_name, normalize_value(value)), set())
+            matching = matching | self._any_override.get(setting_name, set())
+            if setting_name in differ_by_default:
+                candidates &= matching
+            else:
+                candidates -= self._overridden.get(setting_name, set()) - matching
+
+        for setting_name, value in filter_settings.items():
+            candidates &= self._by_filter_setting.get((setting_name, normalize_value(value)), set())
+
+        for field, substring in text_query.items():
+            substring = substring.lower()
+            for trigram in trigrams(substring):
+                candidates &= self._trigrams[field].get(trigram, set())
+            # Trigrams narrow down the candidates, but don't guarantee the substring is there.
+            candidates = {id_ for id_ in candidates if substring in (getattr(self.filters[id_], field) or "").lower()}
+
+        return [filter_ for id_, filter_ in self.filters.items() if id_ in candidates]
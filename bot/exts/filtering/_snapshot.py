@@ -0,0 +1,47 @@
+"""
+Versioning of the filter list payloads fetched from the site API, for loading from a snapshot of the last payload.
+
+The version of a list covers the list's own `updated_at` as well as the ID and `updated_at` of each of its filters,
+since editing a filter doesn't necessarily update the list it's in.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable
+
+# A filter list is identified by its name and list type.
+ListKey = tuple[str, int]
+
+
+def list_key(list_data: dict) -> ListKey:
+    """Return the name and list type identifying the list data."""
+    return list_data["name"], list_data["list_type"]
+
+
+def snapshot_key(key: ListKey) -> str:
+    """Return the key the list is saved under in the snapshot."""
+    name, list_type = key
+    return f"{name}:{list_type}"
+
+
+def list_version(list_data: dict) -> str:
+    """Return a string which changes whenever the list or any of its filters is added, edited, or removed."""
+    filters = sorted((filter_data["id"], str(filter_data["updated_at"])) for filter_data in list_data["filters"])
+    return json.dumps([str(list_data["updated_at"]), filters])
+
+
+def payload_versions(payload: Iterable[dict]) -> dict[ListKey, str]:
+    """Return the version of each list in the payload."""
+    return {list_key(list_data): list_version(list_data) for list_data in payload}
+
+
+def changed_lists(versions: dict[ListKey, str], payload: list[dict]) -> tuple[list[dict], set[ListKey]]:
+    """
+    Compare a new payload with the versions of the lists which are loaded.
+
+    Return the data of the lists which were added or changed, and the keys of the lists which no longer exist.
+    """
+    changed = [list_data for list_data in payload if versions.get(list_key(list_data)) != list_version(list_data)]
+    removed = versions.keys() - {list_key(list_data) for list_data in payload}
+    return changed, removed
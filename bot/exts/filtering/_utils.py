@@ -4,14 +4,16 @@ import importlib
 import importlib.util
 import inspect
 import pkgutil
+import re
 import types
+import unicodedata
 import urllib.parse
 import warnings
 from abc import ABC, abstractmethod
 from collections import defaultdict
 from collections.abc import Callable, Iterable
 from dataclasses import dataclass
-from functools import cache
+from functools import cache, cached_property, lru_cache
 from typing import Any, Self, TypeVar, Union, get_args, get_origin
 
 import discord
@@ -27,6 +29,10 @@ from bot.constants import Guild
 VARIATION_SELECTORS = r"\uFE00-\uFE0F\U000E0100-\U000E01EF"
 INVISIBLE_RE = regex.compile(rf"[{VARIATION_SELECTORS}\p{{UNASSIGNED}}\p{{FORMAT}}\p{{CONTROL}}--\s]", regex.V1)
 ZALGO_RE = regex.compile(rf"[\p{{NONSPACING MARK}}\p{{ENCLOSING MARK}}--[{VARIATION_SELECTORS}]]", regex.V1)
+SPOILER_RE = re.compile(r"(\|\|.+?\|\|)", re.DOTALL)
+
+# How many recently seen contents to keep the normalized views of, so that repeated content isn't normalized again.
+NORMALIZED_CONTENT_CACHE_SIZE = 256
 
 
 T = TypeVar("T")
@@ -68,6 +74,76 @@ def clean_input(string: str, *, keep_newlines: bool = False) -> str:
     return INVISIBLE_RE.sub("", content)
 
 
+def expand_spoilers(text: str) -> str:
+    """Return a string containing all interpretations of a spoilered message."""
+    split_text = SPOILER_RE.split(text)
+    return "".join(
+        split_text[0::2] + split_text[1::2] + split_text
+    )
+
+
+class NormalizedContent:
+    """
+    Normalized views of some content, which are computed when first accessed.
+
+    Use `normalized_content` to get an instance, so that the views are shared by everything looking at the same content.
+    """
+
+    def __init__(self, raw: str):
+        self.raw = raw
+
+    def prime(self, views: dict[str, str]) -> None:
+        """Fill in views which were computed elsewhere, such as in the filtering process pool."""
+        # Cached properties are stored in the instance dictionary, so they won't be computed again.
+        for name, value in views.items():
+            self.__dict__.setdefault(name, value)
+
+    @cached_property
+    def cleaned(self) -> str:
+        """The content without zalgo, invisible characters, URL quoting and newlines."""
+        return clean_input(self.raw)
+
+    @cached_property
+    def cleaned_with_newlines(self) -> str:
+        """The content without zalgo, invisible characters and URL quoting."""
+        return clean_input(self.raw, keep_newlines=True)
+
+    @cached_property
+    def spoilers_expanded(self) -> str:
+        """The cleaned content, containing all interpretations of any spoilers in it."""
+        if not SPOILER_RE.search(self.raw):
+            return self.cleaned
+        return clean_input(expand_spoilers(self.raw))
+
+    @cached_property
+    def nfkc(self) -> str:
+        """The content in the NFKC normal form."""
+        return unicodedata.normalize("NFKC", self.raw)
+
+    @cached_property
+    def nfkc_folded(self) -> str:
+        """The content in the NFKC normal form, without combining characters."""
+        return "".join([c for c in self.nfkc if not unicodedata.combining(c)])
+
+
+def edited_span(old: str, new: str) -> tuple[int, int]:
+    """Return the start and end of the part of the new text which differs from the old text."""
+    max_common = min(len(old), len(new))
+    prefix = 0
+    while prefix < max_common and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < max_common - prefix and old[-suffix - 1] == new[-suffix - 1]:
+        suffix += 1
+    return prefix, len(new) - suffix
+
+
+@lru_cache(maxsize=NORMALIZED_CONTENT_CACHE_SIZE)
+def normalized_content(content: str) -> NormalizedContent:
+    """Return the normalized views of the content, shared with any recent lookup of the same content."""
+    return NormalizedContent(content)
+
+
 def past_tense(word: str) -> str:
     """Return the past tense form of the input word."""
     if not word:
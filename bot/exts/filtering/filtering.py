@@ -1,10 +1,11 @@
+import asyncio
 import datetime
 import io
 import json
 import re
-import unicodedata
+import time
 from collections import defaultdict
-from collections.abc import Iterable, Mapping
+from collections.abc import Iterable
 from functools import partial, reduce
 from io import BytesIO
 from operator import attrgetter
@@ -24,14 +25,22 @@ import bot
 import bot.exts.filtering._ui.filter as filters_ui
 from bot import constants
 from bot.bot import Bot
-from bot.constants import BaseURLs, Channels, Guild, MODERATION_ROLES, Roles
+from bot.constants import BaseURLs, Channels, FilteringSettings, Guild, MODERATION_ROLES, Roles
 from bot.exts.backend.branding._repository import HEADERS, PARAMS
+from bot.exts.filtering._alert_dispatcher import AlertDispatcher
+from bot.exts.filtering._antispam_window import AntispamWindow
 from bot.exts.filtering._filter_context import Event, FilterContext
 from bot.exts.filtering._filter_lists import FilterList, ListType, ListTypeConverter, filter_list_types
-from bot.exts.filtering._filter_lists.filter_list import AtomicList
+from bot.exts.filtering._filter_lists.filter_list import AtomicList, validation_key
 from bot.exts.filtering._filters.filter import Filter, UniqueFilter
+from bot.exts.filtering._invite_cache import InviteCache
+from bot.exts.filtering._latency import latency_tracker
+from bot.exts.filtering._offensive_messages import OffensiveMessageDeleter
+from bot.exts.filtering._process_pool import FilterProcessPool
+from bot.exts.filtering._search_index import TEXT_FIELDS
 from bot.exts.filtering._settings import ActionSettings
 from bot.exts.filtering._settings_types.actions.infraction_and_notification import Infraction
+from bot.exts.filtering._snapshot import ListKey, changed_lists, list_key, list_version, snapshot_key
 from bot.exts.filtering._ui.filter import (
     build_filter_repr_dict,
     description_and_settings_converter,
@@ -47,11 +56,12 @@ from bot.exts.filtering._ui.ui import (
     build_mod_alert,
     format_response_error,
 )
-from bot.exts.filtering._utils import past_tense, repr_equals, starting_value, to_serializable
+from bot.exts.filtering._utils import past_tense, starting_value, to_serializable
 from bot.exts.moderation.infraction.infractions import COMP_BAN_DURATION, COMP_BAN_REASON
 from bot.exts.utils.snekbox._io import FileAttachment
 from bot.log import get_logger
 from bot.pagination import LinePaginator
+from bot.utils.attachments import read_text_prefix
 from bot.utils.channel import is_mod_channel
 from bot.utils.lock import lock_arg
 from bot.utils.message_cache import MessageCache
@@ -61,16 +71,33 @@ log = get_logger(__name__)
 WEBHOOK_ICON_URL = r"https://github.com/python-discord/branding/raw/main/icons/filter/filter_pfp.png"
 WEBHOOK_NAME = "Filtering System"
 CACHE_SIZE = 1000
+# Compact records take a fraction of the memory of full messages, so many more of them fit in the same memory.
+COMPACT_CACHE_SIZE = 10_000
 HOURS_BETWEEN_NICKNAME_ALERTS = 1
+# The maximum number of members to remember a clean display name verdict for.
+NAME_VERDICT_CACHE_SIZE = 10_000
 OFFENSIVE_MSG_DELETE_TIME = datetime.timedelta(days=7)
 WEEKLY_REPORT_ISO_DAY = 3  # 1=Monday, 7=Sunday
+# The delays between attempts to reconcile the filter lists with the database, in seconds.
+RECONCILE_MIN_DELAY = 5
+RECONCILE_MAX_DELAY = 5 * 60
+# How often to reconcile the filter lists with the database, in case they were changed other than through the bot.
+RECONCILE_INTERVAL = 60 * 60
+
+# The actions, alert messages, and triggered filters per list type returned by a filter list.
+ListResult = tuple[ActionSettings | None, list[str], dict[ListType, list[Filter]]]
 
 
 async def _extract_text_file_content(att: discord.Attachment) -> str:
     """Extract up to the first 30 lines or first 2000 characters (whichever is shorter) of an attachment."""
-    file_encoding = re.search(r"charset=(\S+)", att.content_type).group(1)
-    file_content_bytes = await att.read()
-    file_lines = file_content_bytes.decode(file_encoding).splitlines()
+    prefix = await read_text_prefix(
+        att,
+        max_bytes=FilteringSettings.attachment_max_bytes,
+        max_chars=2_000,
+        max_lines=30,
+        timeout=FilteringSettings.attachment_timeout,
+    )
+    file_lines = prefix.text.splitlines()
     first_n_lines = "\n".join(file_lines[:30])[:2_000]
     return f"{att.filename}: {first_n_lines}"
 
@@ -83,6 +110,8 @@ class Filtering(Cog):
 
     # Redis cache mapping a user ID to the last timestamp a bad nickname alert was sent.
     name_alerts = RedisCache()
+    # Redis cache mapping the name and type of each filter list to its last known data, for a fast warm start.
+    filter_list_snapshots = RedisCache()
 
     # region: init
 
@@ -90,37 +119,68 @@ class Filtering(Cog):
         self.bot = bot
         self.filter_lists: dict[str, FilterList] = {}
         self._subscriptions = defaultdict[Event, list[FilterList]](list)
-        self.delete_scheduler = scheduling.Scheduler(self.__class__.__name__)
+        self.offensive_messages = OffensiveMessageDeleter(bot)
         self.webhook: discord.Webhook | None = None
+        self.alert_dispatcher = AlertDispatcher(bot)
 
         self.loaded_settings = {}
         self.loaded_filters = {}
         self.loaded_filter_settings = {}
 
-        self.message_cache = MessageCache(CACHE_SIZE, newest_first=True)
+        if FilteringSettings.compact_message_cache:
+            self.message_cache = MessageCache(COMPACT_CACHE_SIZE, newest_first=True, compact=True)
+        else:
+            self.message_cache = MessageCache(CACHE_SIZE, newest_first=True)
+        self.antispam_window = AntispamWindow(self.message_cache)
+        self.invite_cache = InviteCache(bot)
+        # A mapping of member IDs to the key of the last display name verdict which came out clean.
+        self.name_verdicts: dict[int, tuple] = {}
+        self.process_pool: FilterProcessPool | None = None
+        # The data of each loaded list as it's saved in the snapshot, and its version.
+        self._raw_lists: dict[ListKey, dict] = {}
+        self._list_versions: dict[ListKey, str] = {}
+        self._reconcile_task: asyncio.Task | None = None
+        self._reconcile_requested = False
 
     async def cog_load(self) -> None:
         """
         Fetch the filter data from the API, parse it, and load it to the appropriate data structures.
 
+        If a snapshot of the last known data exists, it's loaded instead, so that filtering can start right away.
+        The lists are then reconciled with the API in the background, and periodically afterwards.
+
         Additionally, fetch the alerting webhook.
         """
         await self.bot.wait_until_guild_available()
 
-        log.trace("Loading filtering information from the database.")
-        raw_filter_lists = await self.bot.api_client.get("bot/filter/filter_lists")
-        example_list = None
-        for raw_filter_list in raw_filter_lists:
-            loaded_list = self._load_raw_filter_list(raw_filter_list)
-            if not example_list and loaded_list:
-                example_list = loaded_list
+        raw_filter_lists = await self._get_filter_lists_snapshot()
+        from_snapshot = raw_filter_lists is not None
+        if from_snapshot:
+            try:
+                example_list = self._load_filter_lists(raw_filter_lists)
+            except Exception:
+                log.exception("The filter lists snapshot could not be loaded, loading from the database instead.")
+                self._unload_filter_lists()
+                from_snapshot = False
+        if not from_snapshot:
+            log.trace("Loading filtering information from the database.")
+            raw_filter_lists = await self.bot.api_client.get("bot/filter/filter_lists")
+            example_list = self._load_filter_lists(raw_filter_lists)
+            await self._save_snapshot(replace=True)
 
         # The webhook must be generated by the bot to send messages with components through it.
         self.webhook = await self._fetch_or_generate_filtering_webhook()
+        if self.webhook:
+            self.alert_dispatcher.start(self.webhook)
 
         self.collect_loaded_types(example_list)
-        await self.schedule_offending_messages_deletion()
+        if FilteringSettings.process_pool:
+            self.process_pool = FilterProcessPool()
+        if from_snapshot:
+            self._schedule_reconcile()
+        await self.offensive_messages.start()
         self.weekly_auto_infraction_report_task.start()
+        self.periodic_reconcile_task.start()
 
     def subscribe(self, filter_list: FilterList, *events: Event) -> None:
         """
@@ -200,18 +260,6 @@ class Filtering(Cog):
                 for field_name in extra_fields_type.model_fields
             }
 
-    async def schedule_offending_messages_deletion(self) -> None:
-        """Load the messages that need to be scheduled for deletion from the database."""
-        response = await self.bot.api_client.get("bot/offensive-messages")
-
-        now = arrow.utcnow()
-        for msg in response:
-            delete_at = arrow.get(msg["delete_date"])
-            if delete_at < now:
-                await self._delete_offensive_msg(msg)
-            else:
-                self._schedule_msg_delete(msg)
-
     async def cog_check(self, ctx: Context) -> bool:
         """Only allow moderators to invoke the commands in this cog."""
         return await has_any_role(*MODERATION_ROLES).predicate(ctx)
@@ -230,13 +278,14 @@ class Filtering(Cog):
             return
 
         self.message_cache.append(msg)
+        self.antispam_window.add(msg)
 
         ctx = FilterContext.from_message(Event.MESSAGE, msg, None, self.message_cache)
 
-        text_contents = [
-            await _extract_text_file_content(a)
-            for a in msg.attachments if "charset" in a.content_type
-        ]
+        text_contents = await asyncio.gather(*(
+            _extract_text_file_content(a)
+            for a in msg.attachments if a.content_type and "charset" in a.content_type
+        ))
 
         if text_contents:
             attachment_content = "\n\n".join(text_contents)
@@ -258,7 +307,12 @@ class Filtering(Cog):
 
     @Cog.listener()
     async def on_message_edit(self, before: discord.Message, after: discord.Message) -> None:
-        """Filter the contents of an edited message. Don't reinvoke filters already invoked on the `before` version."""
+        """
+        Filter the contents of an edited message. Don't reinvoke filters already invoked on the `before` version.
+
+        Lists which only look at the content are skipped if it didn't change, and the token list only searches around
+        the edited part of the content.
+        """
         if before.author.bot or before.webhook_id or before.type == MessageType.auto_moderation_action:
             return
 
@@ -273,6 +327,7 @@ class Filtering(Cog):
         # Update the cache first, it might be used by the antispam filter.
         # No need to update the triggers, they're going to be updated inside the sublists if necessary.
         self.message_cache.update(after)
+        self.antispam_window.update(after)
         ctx = FilterContext.from_message(Event.MESSAGE_EDIT, after, before, self.message_cache)
         result_actions, list_messages, triggers = await self._resolve_action(ctx)
         if result_actions:
@@ -282,6 +337,18 @@ class Filtering(Cog):
         await self._maybe_schedule_msg_delete(ctx, result_actions)
         self._increment_stats(triggers)
 
+    @Cog.listener()
+    async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel) -> None:
+        """Forget cached validation results if a channel was renamed or moved, as channel scopes depend on it."""
+        if before.name != after.name or getattr(before, "category_id", None) != getattr(after, "category_id", None):
+            self._clear_validation_caches()
+
+    @Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role) -> None:
+        """Forget cached validation results if a role was renamed, as roles can bypass filters by name."""
+        if before.name != after.name:
+            self._clear_validation_caches()
+
     @Cog.listener()
     async def on_voice_state_update(self, member: discord.Member, *_) -> None:
         """Checks for bad words in usernames when users join, switch or leave a voice channel."""
@@ -597,7 +664,8 @@ class Filtering(Cog):
             """The actual removal routine."""
             await bot.instance.api_client.delete(f"bot/filter/filters/{filter_id}")
             log.info(f"Successfully deleted filter with ID {filter_id}.")
-            filter_list[list_type].filters.pop(filter_id)
+            filter_list.remove_filter(list_type, filter_id)
+            await self._snapshot_filter(filter_list, list_type, filter_id, None)
             await ctx.reply(f"✅ Deleted filter: {filter_}")
 
         result = self._get_filter_by_id(filter_id)
@@ -686,6 +754,8 @@ class Filtering(Cog):
 
         If a list type and/or a list name are provided, the search will be limited to those parameters. A list name must
         be provided in order to search by filter-specific settings.
+
+        The `content` and `description` criteria match filters containing the given text, ignoring case.
         """
         filter_type = None
         if filter_type_name:
@@ -729,6 +799,23 @@ class Filtering(Cog):
         )
         await ctx.send(embed=embed, reference=ctx.message, view=view)
 
+    @filter.command(name="slowest")
+    async def f_slowest(self, ctx: Context, amount: int = 10) -> None:
+        """Show the filters which took the longest to evaluate recently, by their average evaluation time."""
+        slowest = latency_tracker.slowest(amount)
+        if not slowest:
+            await ctx.reply("No filters were evaluated yet.")
+            return
+
+        lines = [
+            f"» {timings} - average {timings.mean * 1000:.2f}ms, longest {timings.max * 1000:.2f}ms "
+            f"over the last {len(timings.samples)} evaluations"
+            for timings in slowest
+        ]
+        embed = Embed(colour=Colour.blue())
+        embed.set_author(name="Slowest filters")
+        await LinePaginator.paginate(lines, ctx, embed, max_lines=10, empty=False)
+
     @filter.command(root_aliases=("compfilter", "compf"))
     async def compadd(
         self, ctx: Context, list_name: str | None, content: str, *, description: str | None = "Phishing"
@@ -884,11 +971,13 @@ class Filtering(Cog):
             message = await ctx.send("⏳ Annihilation in progress, please hold...", file=file)
             # Unload the filter list.
             filter_list.pop(list_type)
+            latency_tracker.forget_list(filter_list.name, list_type)
             if not filter_list:  # There's nothing left, remove from the cog.
                 self.filter_lists.pop(filter_list.name)
                 self.unsubscribe(filter_list)
 
             await bot.instance.api_client.delete(f"bot/filter/filter_lists/{list_id}")
+            await self._forget_snapshot_list((filter_list.name, list_type.value))
             log.info(f"Successfully deleted the {filter_list[list_type].label} filterlist.")
             await message.edit(content=f"✅ The {list_description} list has been deleted.")
 
@@ -928,6 +1017,161 @@ class Filtering(Cog):
             self.filter_lists[list_name] = filter_list_types[list_name](self)
         return self.filter_lists[list_name].add_list(list_data)
 
+    def _load_filter_lists(self, raw_filter_lists: list[dict]) -> AtomicList | None:
+        """Load the filter lists of a payload, and return one of the loaded lists as an example of the types used."""
+        self._raw_lists = {list_key(list_data): list_data for list_data in raw_filter_lists}
+        self._list_versions = {key: list_version(list_data) for key, list_data in self._raw_lists.items()}
+        example_list = None
+        for raw_filter_list in raw_filter_lists:
+            loaded_list = self._load_raw_filter_list(raw_filter_list)
+            if not example_list and loaded_list:
+                example_list = loaded_list
+        return example_list
+
+    def _unload_filter_lists(self) -> None:
+        """Forget all loaded filter lists, such as after a payload couldn't be loaded in full."""
+        for filter_list in self.filter_lists.values():
+            self.unsubscribe(filter_list)
+        self.filter_lists.clear()
+        self._raw_lists = {}
+        self._list_versions = {}
+
+    async def _get_filter_lists_snapshot(self) -> list[dict] | None:
+        """Return the last known data of the filter lists, if a snapshot of it exists and can be read."""
+        try:
+            snapshot = await self.filter_list_snapshots.to_dict()
+            if not snapshot:
+                return None
+            return [json.loads(list_data) for list_data in snapshot.values()]
+        except Exception:
+            log.exception("The snapshot of the filter lists could not be read, loading from the database instead.")
+            return None
+
+    async def _save_snapshot(
+        self, changed: Iterable[ListKey] = (), removed: Iterable[ListKey] = (), *, replace: bool = False
+    ) -> None:
+        """
+        Save the data of the changed lists to the snapshot, and remove the removed lists from it.
+
+        If `replace` is True, the whole snapshot is replaced with the data of the loaded lists. Failing to save the
+        snapshot is only logged, since the lists are reconciled with the database whenever they're loaded from it.
+        """
+        try:
+            if replace:
+                await self.filter_list_snapshots.clear()
+                changed = self._raw_lists
+            if items := {snapshot_key(key): json.dumps(self._raw_lists[key]) for key in changed}:
+                await self.filter_list_snapshots.update(items)
+            for key in removed:
+                await self.filter_list_snapshots.delete(snapshot_key(key))
+        except Exception:
+            log.exception("The snapshot of the filter lists could not be saved.")
+
+    async def _snapshot_list(self, list_data: dict) -> None:
+        """Save the data of a list which was added or edited, as returned by the API, to the snapshot."""
+        key = list_key(list_data)
+        self._raw_lists[key] = list_data
+        self._list_versions[key] = list_version(list_data)
+        self._rerun_reconcile()
+        await self._save_snapshot([key])
+
+    async def _snapshot_filter(
+        self, filter_list: FilterList, list_type: ListType, filter_id: int, filter_data: dict | None
+    ) -> None:
+        """
+        Save a filter which was added or edited, as returned by the API, to the snapshot of its list.
+
+        If no filter data is given, the filter was deleted and is removed from the snapshot instead.
+        """
+        list_data = self._raw_lists.get((filter_list.name, list_type.value))
+        if list_data is None:
+            # The list was loaded some other way, so it's only in the snapshot once it's reconciled.
+            self._schedule_reconcile()
+            return
+        filters = [filter_ for filter_ in list_data["filters"] if filter_["id"] != filter_id]
+        if filter_data is not None:
+            filters.append(filter_data)
+        await self._snapshot_list({**list_data, "filters": filters})
+
+    async def _forget_snapshot_list(self, key: ListKey) -> None:
+        """Remove a list which was deleted from the snapshot."""
+        self._raw_lists.pop(key, None)
+        self._list_versions.pop(key, None)
+        self._rerun_reconcile()
+        await self._save_snapshot(removed=[key])
+
+    def _rerun_reconcile(self) -> None:
+        """Run a reconciliation in progress again once it's done, since it might have fetched the lists too early."""
+        if self._reconcile_task and not self._reconcile_task.done():
+            self._reconcile_requested = True
+
+    def _schedule_reconcile(self) -> None:
+        """
+        Reconcile the filter lists with the database in the background, which also refreshes the snapshot.
+
+        If a reconciliation is already in progress, it runs again once it's done, since it might have fetched the
+        lists before the change it's requested for.
+        """
+        if self._reconcile_task and not self._reconcile_task.done():
+            self._reconcile_requested = True
+            return
+        self._reconcile_task = scheduling.create_task(self._reconcile_filter_lists(), event_loop=self.bot.loop)
+
+    async def _reconcile_filter_lists(self) -> None:
+        """Reconcile the filter lists with the database, retrying with an increasing delay until it succeeds."""
+        delay = RECONCILE_MIN_DELAY
+        while True:
+            self._reconcile_requested = False
+            try:
+                await self._reconcile_filter_lists_once()
+            except Exception:
+                log.exception(f"Failed to reconcile the filter lists with the database, retrying in {delay}s.")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONCILE_MAX_DELAY)
+                continue
+            if not self._reconcile_requested:
+                return
+            delay = RECONCILE_MIN_DELAY
+
+    async def _reconcile_filter_lists_once(self) -> None:
+        """Fetch the filter lists from the API, and apply and save the lists which changed since they were loaded."""
+        log.trace("Reconciling the loaded filter lists with the database.")
+        raw_filter_lists = await self.bot.api_client.get("bot/filter/filter_lists")
+        changed, removed = changed_lists(self._list_versions, raw_filter_lists)
+
+        for list_data in changed:
+            if list_data["name"] in self.filter_lists:
+                self.filter_lists[list_data["name"]].update_list(list_data)
+            else:
+                self._load_raw_filter_list(list_data)
+        for list_name, list_type in removed:
+            filter_list = self.filter_lists.get(list_name)
+            if filter_list is None:
+                continue
+            filter_list.pop(ListType(list_type), None)
+            latency_tracker.forget_list(list_name, ListType(list_type))
+            if not filter_list:
+                self.filter_lists.pop(list_name)
+                self.unsubscribe(filter_list)
+
+        for list_data in changed:
+            self._raw_lists[list_key(list_data)] = list_data
+            self._list_versions[list_key(list_data)] = list_version(list_data)
+        for key in removed:
+            self._raw_lists.pop(key, None)
+            self._list_versions.pop(key, None)
+        await self._save_snapshot([list_key(list_data) for list_data in changed], removed)
+        log.info(
+            f"Reconciled the filter lists with the database: {len(changed)} list(s) updated, {len(removed)} removed."
+        )
+
+    def _clear_validation_caches(self) -> None:
+        """Forget the cached validation results of every loaded list, and the display name verdicts based on them."""
+        self.name_verdicts.clear()
+        for filter_list in self.filter_lists.values():
+            for atomic_list in filter_list.values():
+                atomic_list.clear_validation_cache()
+
     async def _fetch_or_generate_filtering_webhook(self) -> discord.Webhook | None:
         """Generate a webhook with the filtering avatar."""
         alerts_channel = self.bot.get_guild(Guild.id).get_channel(Channels.mod_alerts)
@@ -964,11 +1208,13 @@ class Filtering(Cog):
         Additionally, a message is possibly provided from each filter list describing the triggers,
         which should be relayed to the moderators.
         """
+        if self.process_pool and ctx.content and isinstance(ctx.content, str):
+            ctx.analysis = await self.process_pool.analyze(ctx.content, self.filter_lists.get("token"))
+
         actions = []
         messages = {}
         triggers = {}
-        for filter_list in self._subscriptions[ctx.event]:
-            list_actions, list_message, list_triggers = await filter_list.actions_for(ctx)
+        for filter_list, (list_actions, list_message, list_triggers) in await self._dispatch_to_lists(ctx):
             triggers.update({filter_list[list_type]: filters for list_type, filters in list_triggers.items()})
             if list_actions:
                 actions.append(list_actions)
@@ -984,16 +1230,94 @@ class Filtering(Cog):
                     result_actions.pop("mentions", None)
         return result_actions, messages, triggers
 
+    async def _dispatch_to_lists(self, ctx: FilterContext) -> list[tuple[FilterList, ListResult]]:
+        """
+        Dispatch the context to the lists subscribed to its event, and return their results in subscription order.
+
+        Lists which don't require the shared context run on isolated copies of the context, whose outputs are merged
+        back into the context in subscription order, so that a list which times out leaves no partial output behind.
+        If concurrent dispatch is enabled, consecutive such lists run concurrently, with the same outcome as running
+        them one after the other.
+
+        Lists which require the shared context aren't subject to the timeout, since cancelling them could leave their
+        side effects half done.
+        """
+        results = []
+        concurrent_lists = []
+        for filter_list in self._subscriptions[ctx.event]:
+            previous = ctx.previously_filtered_content
+            if filter_list.content_only and previous is not None and previous == ctx.message.content:
+                # The list already filtered this content, and the edit only changed something else, such as embeds.
+                continue
+            if not filter_list.requires_shared_context:
+                concurrent_lists.append(filter_list)
+                if not FilteringSettings.concurrent_lists:
+                    results += await self._run_isolated_lists(ctx, concurrent_lists)
+                    concurrent_lists = []
+                continue
+            results += await self._run_isolated_lists(ctx, concurrent_lists)
+            concurrent_lists = []
+            results.append((filter_list, await self._run_list(filter_list, ctx, timed=False)))
+
+        results += await self._run_isolated_lists(ctx, concurrent_lists)
+        return results
+
+    async def _run_isolated_lists(
+        self, ctx: FilterContext, filter_lists: list[FilterList]
+    ) -> list[tuple[FilterList, ListResult]]:
+        """Run the filter lists concurrently on isolated copies of the context, and merge the outputs back in order."""
+        if not filter_lists:
+            return []
+
+        base_ctx = ctx.replace()
+        list_contexts = [ctx.isolated_copy() for _ in filter_lists]
+        list_results = await asyncio.gather(*(
+            self._run_list(filter_list, list_ctx)
+            for filter_list, list_ctx in zip(filter_lists, list_contexts, strict=True)
+        ))
+
+        results = []
+        for filter_list, list_ctx, list_result in zip(filter_lists, list_contexts, list_results, strict=True):
+            if list_result is None:  # Timed out, discard any partial output.
+                list_result = (None, [], {})
+            else:
+                ctx.merge(list_ctx, base_ctx)
+            results.append((filter_list, list_result))
+        return results
+
+    async def _run_list(
+        self, filter_list: FilterList, ctx: FilterContext, *, timed: bool = True
+    ) -> ListResult | None:
+        """Return the result of the filter list for the context, or None if it was timed and didn't finish in time."""
+        start = time.perf_counter()
+        timeout = FilteringSettings.list_timeout if timed else None
+        try:
+            return await asyncio.wait_for(filter_list.actions_for(ctx), timeout=timeout)
+        except TimeoutError:
+            log.warning(f"The {filter_list.name} filter list timed out while filtering a {ctx.event.name} event.")
+            self.bot.stats.incr(f"filters.timeout.{filter_list.name}")
+            return None
+        finally:
+            latency_tracker.record_list(filter_list.name, ctx.event, time.perf_counter() - start)
+
     async def _send_alert(self, ctx: FilterContext, triggered_filters: dict[FilterList, Iterable[str]]) -> None:
-        """Build an alert message from the filter context, and send it via the alert webhook."""
+        """Build an alert message from the filter context, and queue it to be sent via the alert webhook."""
         if not self.webhook:
             return
 
         name = f"{ctx.event.name.replace('_', ' ').title()} Filter"
         embed = await build_mod_alert(ctx, triggered_filters)
-        # There shouldn't be more than 10, but if there are it's not very useful to send them all.
-        await self.webhook.send(
-            username=name, content=ctx.alert_content, embeds=[embed, *ctx.alert_embeds][:10], view=AlertView(ctx)
+        author_id = ctx.author.id if ctx.author else None
+        # Repeated alerts for the same author and filters are merged.
+        filters_key = tuple((filter_list.name, tuple(lines)) for filter_list, lines in triggered_filters.items())
+        self.alert_dispatcher.enqueue(
+            (name, author_id, filters_key),
+            username=name,
+            content=ctx.alert_content,
+            # There shouldn't be more than 10, but if there are it's not very useful to send them all.
+            embeds=[embed, *ctx.alert_embeds][:10],
+            view=AlertView(ctx),
+            author_id=author_id,
         )
 
     def _increment_stats(self, triggered_filters: dict[AtomicList, list[Filter]]) -> None:
@@ -1013,21 +1337,52 @@ class Filtering(Cog):
 
         return False
 
+    def _name_verdict_key(self, ctx: FilterContext) -> tuple:
+        """
+        Return what the verdict on a display name depends on: the name, the author's roles, and the filter lists.
+
+        The channel isn't part of the key, since a display name is the same in every channel, so a name which came out
+        clean isn't checked again when the member moves to another channel. The revision of a filter list changes when
+        its filters or settings change. Renamed roles are handled by clearing the verdicts with the validation caches.
+        """
+        _, role_ids, in_guild = validation_key(ctx)
+        filters_version = tuple(
+            (filter_list.name, filter_list.revision, len(filter_list))
+            for filter_list in self._subscriptions[Event.NICKNAME]
+        )
+        return ctx.content, role_ids, in_guild, filters_version
+
     @lock_arg("filtering.check_bad_name", "ctx", attrgetter("author.id"))
     async def _check_bad_display_name(self, ctx: FilterContext) -> None:
-        """Check filter triggers in the passed context - a member's display name."""
+        """
+        Check filter triggers in the passed context - a member's display name.
+
+        Names which didn't trigger anything are remembered, and aren't checked again until the name or the filters
+        change.
+        """
+        verdict_key = self._name_verdict_key(ctx)
+        if self.name_verdicts.get(ctx.author.id) == verdict_key:
+            return
         if await self._recently_alerted_name(ctx.author):
             return
-        new_ctx = await self._check_bad_name(ctx)
+        new_ctx, triggers = await self._check_bad_name(ctx)
         if new_ctx.send_alert:
             # Update time when alert sent
             await self.name_alerts.set(ctx.author.id, arrow.utcnow().timestamp())
+        elif not any(triggers.values()):
+            if len(self.name_verdicts) >= NAME_VERDICT_CACHE_SIZE:
+                self.name_verdicts.clear()
+            self.name_verdicts[ctx.author.id] = verdict_key
+
+    async def _check_bad_name(self, ctx: FilterContext) -> tuple[FilterContext, dict[AtomicList, list[Filter]]]:
+        """
+        Check filter triggers for some given name (thread name, a member's display name).
 
-    async def _check_bad_name(self, ctx: FilterContext) -> FilterContext:
-        """Check filter triggers for some given name (thread name, a member's display name)."""
+        Return the context used for the alert, and the triggered filters.
+        """
         name = ctx.content
-        normalised_name = unicodedata.normalize("NFKC", name)
-        cleaned_normalised_name = "".join([c for c in normalised_name if not unicodedata.combining(c)])
+        normalised_name = ctx.normalized.nfkc
+        cleaned_normalised_name = ctx.normalized.nfkc_folded
 
         # Run filters against normalised, cleaned normalised and the original name,
         # in case there are filters for one but not another.
@@ -1041,7 +1396,7 @@ class Filtering(Cog):
         if new_ctx.send_alert:
             await self._send_alert(new_ctx, list_messages)
         self._increment_stats(triggers)
-        return new_ctx
+        return new_ctx, triggers
 
     async def _resolve_list_type_and_name(
         self, ctx: Context, list_type: ListType | None = None, list_name: str | None = None, *, exclude: str = ""
@@ -1237,6 +1592,7 @@ class Filtering(Cog):
         response = await bot.instance.api_client.post("bot/filter/filters", json=to_serializable(payload))
         new_filter = filter_list.add_filter(list_type, response)
         log.info(f"Added new filter: {new_filter}.")
+        await self._snapshot_filter(filter_list, list_type, response["id"], response)
         if new_filter:
             await self._maybe_alert_auto_infraction(filter_list, list_type, new_filter)
             extra_msg = Filtering._identical_filters_message(content, filter_list, list_type, new_filter)
@@ -1289,6 +1645,7 @@ class Filtering(Cog):
         # Return type can be None, but if it's being edited then it's not supposed to be.
         edited_filter = filter_list.add_filter(list_type, response)
         log.info(f"Successfully patched filter {edited_filter}.")
+        await self._snapshot_filter(filter_list, list_type, filter_.id, response)
         await self._maybe_alert_auto_infraction(filter_list, list_type, edited_filter, filter_)
         extra_msg = Filtering._identical_filters_message(content, filter_list, list_type, edited_filter)
         await msg.reply(f"✅ Edited filter: {edited_filter}" + extra_msg)
@@ -1300,74 +1657,36 @@ class Filtering(Cog):
         response = await bot.instance.api_client.post("bot/filter/filter_lists", json=payload)
         log.info(f"Successfully posted the new {filterlist_name} filterlist.")
         self._load_raw_filter_list(response)
+        await self._snapshot_list(response)
         await msg.reply(f"✅ Added a new filter list: {filterlist_name}")
 
-    @staticmethod
-    async def _patch_filter_list(msg: Message, filter_list: FilterList, list_type: ListType, settings: dict) -> None:
+    async def _patch_filter_list(
+        self, msg: Message, filter_list: FilterList, list_type: ListType, settings: dict
+    ) -> None:
         """PATCH the new data of the filter list to the site API."""
         list_id = filter_list[list_type].id
         response = await bot.instance.api_client.patch(
             f"bot/filter/filter_lists/{list_id}", json=to_serializable(settings)
         )
         log.info(f"Successfully patched the {filter_list[list_type].label} filterlist, reloading...")
-        filter_list.pop(list_type, None)
-        filter_list.add_list(response)
+        filter_list.update_list(response)
+        await self._snapshot_list(response)
         await msg.reply(f"✅ Edited filter list: {filter_list[list_type].label}")
 
-    def _filter_match_query(
-        self, filter_: Filter, settings_query: dict, filter_settings_query: dict, differ_by_default: set[str]
-    ) -> bool:
-        """Return whether the given filter matches the query."""
-        override_matches = set()
-        overrides, _ = filter_.overrides
-        for setting_name, setting_value in settings_query.items():
-            if setting_name not in overrides:
-                continue
-            if repr_equals(overrides[setting_name], setting_value):
-                override_matches.add(setting_name)
-            else:  # If an override doesn't match then the filter doesn't match.
-                return False
-        if not (differ_by_default <= override_matches):  # The overrides didn't cover for the default mismatches.
-            return False
-
-        filter_settings = filter_.extra_fields.model_dump() if filter_.extra_fields else {}
-        # If the dict changes then some fields were not the same.
-        return (filter_settings | filter_settings_query) == filter_settings
-
-    def _search_filter_list(
-        self, atomic_list: AtomicList, filter_type: type[Filter] | None, settings: dict, filter_settings: dict
-    ) -> list[Filter]:
-        """Find all filters in the filter list which match the settings."""
-        # If the default answers are known, only the overrides need to be checked for each filter.
-        all_defaults = atomic_list.defaults.dict()
-        match_by_default = set()
-        differ_by_default = set()
-        for setting_name, setting_value in settings.items():
-            if repr_equals(all_defaults[setting_name], setting_value):
-                match_by_default.add(setting_name)
-            else:
-                differ_by_default.add(setting_name)
-
-        result_filters = []
-        for filter_ in atomic_list.filters.values():
-            if filter_type and not isinstance(filter_, filter_type):
-                continue
-            if self._filter_match_query(filter_, settings, filter_settings, differ_by_default):
-                result_filters.append(filter_)
-
-        return result_filters
-
     async def _search_filters(
         self, message: Message, filter_type: type[Filter] | None, settings: dict, filter_settings: dict
     ) -> None:
         """Find all filters which match the settings and display them."""
+        # The content and description are searched by substring rather than compared to the filter list settings.
+        text_query = {field: settings[field] for field in TEXT_FIELDS if field in settings}
+        settings = {name: value for name, value in settings.items() if name not in text_query}
         lines = []
         result_count = 0
         for filter_list in self.filter_lists.values():
             if filter_type and filter_type not in filter_list.filter_types:
                 continue
             for atomic_list in filter_list.values():
-                list_results = self._search_filter_list(atomic_list, filter_type, settings, filter_settings)
+                list_results = atomic_list.search(filter_type, settings, filter_settings, text_query)
                 if list_results:
                     lines.append(f"**{atomic_list.label.title()}**")
                     lines.extend(map(str, list_results))
@@ -1379,52 +1698,13 @@ class Filtering(Cog):
         ctx = await bot.instance.get_context(message)
         await LinePaginator.paginate(lines, ctx, embed, max_lines=15, empty=False, reply=True)
 
-    async def _delete_offensive_msg(self, msg: Mapping[str, int]) -> None:
-        """Delete an offensive message, and then delete it from the DB."""
-        try:
-            channel = self.bot.get_channel(msg["channel_id"])
-            if channel:
-                msg_obj = await channel.fetch_message(msg["id"])
-                await msg_obj.delete()
-        except discord.NotFound:
-            log.info(
-                f"Tried to delete message {msg['id']}, but the message can't be found "
-                f"(it has been probably already deleted)."
-            )
-        except HTTPException as e:
-            log.warning(f"Failed to delete message {msg['id']}: status {e.status}")
-
-        await self.bot.api_client.delete(f'bot/offensive-messages/{msg["id"]}')
-        log.info(f"Deleted the offensive message with id {msg['id']}.")
-
-    def _schedule_msg_delete(self, msg: dict) -> None:
-        """Delete an offensive message once its deletion date is reached."""
-        delete_at = arrow.get(msg["delete_date"]).datetime
-        self.delete_scheduler.schedule_at(delete_at, msg["id"], self._delete_offensive_msg(msg))
-
     async def _maybe_schedule_msg_delete(self, ctx: FilterContext, actions: ActionSettings | None) -> None:
-        """Post the message to the database and schedule it for deletion if it's not set to be deleted already."""
+        """Queue the message to be stored and deleted later if it's not set to be deleted already."""
         msg = ctx.message
         if not msg or not actions or actions.get_setting("remove_context", True):
             return
 
-        delete_date = (msg.created_at + OFFENSIVE_MSG_DELETE_TIME).isoformat()
-        data = {
-            "id": msg.id,
-            "channel_id": msg.channel.id,
-            "delete_date": delete_date
-        }
-
-        try:
-            await self.bot.api_client.post("bot/offensive-messages", json=data)
-        except ResponseCodeError as e:
-            if e.status == 400 and "already exists" in e.response_json.get("id", [""])[0]:
-                log.debug(f"Offensive message {msg.id} already exists.")
-            else:
-                log.error(f"Offensive message {msg.id} failed to post: {e}")
-        else:
-            self._schedule_msg_delete(data)
-            log.trace(f"Offensive message {msg.id} will be deleted on {delete_date}")
+        self.offensive_messages.add(msg, msg.created_at + OFFENSIVE_MSG_DELETE_TIME)
 
     # endregion
     # region: tasks
@@ -1437,6 +1717,12 @@ class Filtering(Cog):
 
         await self.send_weekly_auto_infraction_report()
 
+    @tasks.loop(seconds=RECONCILE_INTERVAL)
+    async def periodic_reconcile_task(self) -> None:
+        """Reconcile the filter lists with the database, skipping the first run since they were just loaded."""
+        if self.periodic_reconcile_task.current_loop > 0:
+            self._schedule_reconcile()
+
     async def send_weekly_auto_infraction_report(
         self,
         channel: discord.TextChannel | discord.Thread | None = None,
@@ -1506,9 +1792,15 @@ class Filtering(Cog):
     # endregion
 
     async def cog_unload(self) -> None:
-        """Cancel the weekly auto-infraction filter report and deletion scheduling on cog unload."""
+        """Cancel the scheduled tasks, stop delivering alerts, and stop the process pool on cog unload."""
         self.weekly_auto_infraction_report_task.cancel()
-        self.delete_scheduler.cancel_all()
+        self.periodic_reconcile_task.cancel()
+        self.alert_dispatcher.stop()
+        if self._reconcile_task:
+            self._reconcile_task.cancel()
+        await self.offensive_messages.stop()
+        if self.process_pool:
+            self.process_pool.shutdown()
 
 
 async def setup(bot: Bot) -> None:
@@ -1,18 +1,20 @@
-import contextlib
+import asyncio
 import itertools
 import re
 import time
 from collections import defaultdict
-from collections.abc import Callable, Iterable
-from contextlib import suppress
+from collections.abc import AsyncIterator, Callable, Iterable
+from contextlib import aclosing, suppress
 from datetime import datetime
-from itertools import takewhile
+from operator import attrgetter
 from typing import Literal, TYPE_CHECKING
 
+import discord
 from discord import Colour, Message, NotFound, TextChannel, Thread, User, errors
 from discord.ext.commands import Cog, Context, Converter, Greedy, command, group, has_any_role
 from discord.ext.commands.converter import TextChannelConverter
 from discord.ext.commands.errors import BadArgument
+from pydis_core.utils import scheduling
 
 from bot.bot import Bot
 from bot.constants import Channels, CleanMessages, Colours, Emojis, Event, Icons, MODERATION_ROLES
@@ -20,6 +22,7 @@ from bot.converters import Age, ISODateTime
 from bot.exts.moderation.modlog import ModLog
 from bot.log import get_logger
 from bot.utils.channel import is_mod_channel
+from bot.utils.message_cache import ChannelMessageIndex
 from bot.utils.messages import upload_log
 from bot.utils.modlog import send_log_message
 
@@ -27,6 +30,23 @@ log = get_logger(__name__)
 
 # Number of seconds before command invocations and responses are deleted in non-moderation channels.
 MESSAGE_DELETE_DELAY = 5
+# The number of recent messages, across all channels, to keep indexed by channel.
+INDEX_SIZE = 10_000
+# The maximum number of messages which can be deleted in bulk at once.
+BULK_DELETE_LIMIT = 100
+# The number of messages found in a channel's history to hand over for deletion at once.
+HISTORY_BATCH_SIZE = BULK_DELETE_LIMIT
+# The number of channels to bulk delete messages in at once.
+BULK_DELETE_CONCURRENCY = 5
+# The number of workers deleting messages too old to be deleted in bulk, one by one.
+SINGLE_DELETE_WORKERS = 3
+# How many times to try deleting a message which fails due to rate limits or server errors, and the bounds of the
+# delay the workers back off by, in seconds. The delay doubles on every such failure, and halves on every success.
+SINGLE_DELETE_ATTEMPTS = 5
+MIN_BACKOFF = 0.5
+MAX_BACKOFF = 30
+# Number of seconds between updates of the clean's status message.
+PROGRESS_INTERVAL = 2
 
 # Type alias for checks for whether a message should be deleted.
 Predicate = Callable[[Message], bool]
@@ -65,6 +85,103 @@ if TYPE_CHECKING:  # Used to allow method resolution in IDEs like in converters.
     Regex = re.Pattern
 
 
+class DeletionScheduler:
+    """
+    Deletes the messages found for a clean, as they're submitted.
+
+    Messages less than 14d old are deleted in bulk, in batches of up to 100. Each channel is a separate rate limit
+    bucket, so the batches of several channels are deleted in parallel, with a worker per channel. Older messages are
+    deleted one by one by a pool of workers, which back off when deletions fail due to rate limits or server errors.
+
+    Cancelling the clean is honoured between batches and between single deletions.
+    """
+
+    def __init__(self, cog: "Clean", status: Message):
+        self.cog = cog
+        self.status = status
+        self.deleted: list[Message] = []
+        self.backoff = 0
+
+        self._bulk_semaphore = asyncio.Semaphore(BULK_DELETE_CONCURRENCY)
+        self._bulk_queues: dict[TextChannel, asyncio.Queue[list[Message] | None]] = {}
+        self._old_messages: asyncio.Queue[Message | None] = asyncio.Queue()
+        self._workers = [scheduling.create_task(self._delete_old()) for _ in range(SINGLE_DELETE_WORKERS)]
+        self._reporter = scheduling.create_task(self._report_progress())
+
+    def submit(self, channel: TextChannel, messages: list[Message]) -> None:
+        """Schedule the deletion of messages found in the channel, ordered newest first."""
+        recent = list(itertools.takewhile(lambda message: not self.cog.is_older_than_14d(message), messages))
+        if recent:
+            if channel not in self._bulk_queues:
+                self._bulk_queues[channel] = asyncio.Queue()
+                self._workers.append(
+                    scheduling.create_task(self._delete_in_bulk(channel, self._bulk_queues[channel]))
+                )
+            for start in range(0, len(recent), BULK_DELETE_LIMIT):
+                self._bulk_queues[channel].put_nowait(recent[start:start + BULK_DELETE_LIMIT])
+
+        # Further messages are too old to be deleted in bulk.
+        for message in messages[len(recent):]:
+            self._old_messages.put_nowait(message)
+
+    async def finish(self) -> list[Message]:
+        """Wait for all submitted messages to be deleted, and return the deleted messages, newest first."""
+        for queue in self._bulk_queues.values():
+            queue.put_nowait(None)
+        for _ in range(SINGLE_DELETE_WORKERS):
+            self._old_messages.put_nowait(None)
+        await asyncio.gather(*self._workers)
+        return sorted(self.deleted, key=attrgetter("id"), reverse=True)
+
+    def cancel(self) -> None:
+        """Stop all workers."""
+        for task in (*self._workers, self._reporter):
+            task.cancel()
+
+    async def _delete_in_bulk(self, channel: TextChannel, batches: asyncio.Queue[list[Message] | None]) -> None:
+        """Bulk delete the batches of messages submitted for the channel, one after the other."""
+        while (batch := await batches.get()) is not None:
+            if not self.cog.cleaning:
+                # Cleaning was canceled, but the queue is still drained until the end is submitted.
+                continue
+            async with self._bulk_semaphore:
+                with suppress(NotFound):
+                    await channel.delete_messages(batch)
+            self.deleted.extend(batch)
+
+    async def _delete_old(self) -> None:
+        """Delete the submitted messages which are too old to be deleted in bulk."""
+        while (message := await self._old_messages.get()) is not None:
+            if not self.cog.cleaning:
+                continue
+            for attempt in range(1, SINGLE_DELETE_ATTEMPTS + 1):
+                if self.backoff:
+                    await asyncio.sleep(self.backoff)
+                try:
+                    await message.delete()
+                except NotFound:  # Message doesn't exist or was already deleted
+                    break
+                except errors.HTTPException as e:
+                    if (e.status != 429 and e.status < 500) or attempt == SINGLE_DELETE_ATTEMPTS:
+                        raise
+                    self.backoff = min(max(self.backoff * 2, MIN_BACKOFF), MAX_BACKOFF)
+                    log.info(f"Deleting message {message.id} failed with status {e.status}, backing off.")
+                else:
+                    self.deleted.append(message)
+                    self.backoff = self.backoff / 2 if self.backoff > MIN_BACKOFF else 0
+                    break
+
+    async def _report_progress(self) -> None:
+        """Periodically edit the status message with the number of messages deleted so far."""
+        reported = 0
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            if len(self.deleted) != reported:
+                reported = len(self.deleted)
+                with suppress(errors.HTTPException):
+                    await self.status.edit(content=f":hourglass: Deleted {reported} messages so far...")
+
+
 class Clean(Cog):
     """
     A cog that allows messages to be deleted in bulk while applying various filters.
@@ -79,6 +196,7 @@ class Clean(Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
         self.cleaning = False
+        self.message_index = self._build_message_index()
 
     @property
     def mod_log(self) -> ModLog:
@@ -217,9 +335,22 @@ class Clean(Cog):
                 # Invocation message has already been deleted
                 log.info("Tried to delete invocation message, but it was already deleted.")
 
-    def _use_cache(self, limit: datetime) -> bool:
-        """Tell whether all messages to be cleaned can be found in the cache."""
-        return self.bot.cached_messages[0].created_at <= limit
+    def _build_message_index(self) -> ChannelMessageIndex:
+        """
+        Create the index of recent messages per channel, starting with the messages already in the bot's cache.
+
+        The index starts tracking from the oldest message in the bot's cache, or when the first message is received if
+        there's none, since messages sent before the bot connected wouldn't be in the index.
+        """
+        index = ChannelMessageIndex(INDEX_SIZE)
+        for message in self.bot.cached_messages:
+            index.add(message)
+        return index
+
+    def _use_cache(self, channel: TextChannel, limit: datetime) -> bool:
+        """Tell whether all messages to be cleaned in the channel can be found in the cache."""
+        complete_since = self.message_index.complete_since(channel.id)
+        return complete_since is not None and complete_since <= limit
 
     def _get_messages_from_cache(
         self,
@@ -230,14 +361,15 @@ class Clean(Cog):
         """Helper function for getting messages from the cache."""
         message_mappings = defaultdict(list)
         message_ids = []
-        for message in takewhile(lambda m: m.created_at > lower_limit, reversed(self.bot.cached_messages)):
-            if not self.cleaning:
-                # Cleaning was canceled
-                return message_mappings, message_ids
+        for channel in channels:
+            for message in self.message_index.messages_since(channel.id, lower_limit):
+                if not self.cleaning:
+                    # Cleaning was canceled
+                    return message_mappings, message_ids
 
-            if message.channel in channels and to_delete(message):
-                message_mappings[message.channel].append(message)
-                message_ids.append(message.id)
+                if to_delete(message):
+                    message_mappings[message.channel].append(message)
+                    message_ids.append(message.id)
 
         return message_mappings, message_ids
 
@@ -247,27 +379,47 @@ class Clean(Cog):
         to_delete: Predicate,
         after: datetime,
         before: datetime | None = None
-    ) -> tuple[defaultdict[TextChannel, list], list]:
+    ) -> AsyncIterator[tuple[TextChannel, list[Message]]]:
         """
-        Collect the messages for deletion by iterating over the histories of the appropriate channels.
+        Find the messages for deletion by iterating over the histories of the appropriate channels.
+
+        Several channels are scanned at once. Each channel's history is its own rate limit bucket, and is only scanned
+        by a single task, so the concurrency is bounded to stay clear of the global rate limit. Batches of the messages
+        found in a channel are yielded, newest first, while the scanning continues.
 
         The clean cog enforces an upper limit on message age through `_validate_input`.
         """
-        message_mappings = defaultdict(list)
-        message_ids = []
-
-        for channel in channels:
-            async for message in channel.history(limit=CleanMessages.message_limit, before=before, after=after):
-
-                if not self.cleaning:
-                    # Cleaning was canceled, return empty containers.
-                    return defaultdict(list), []
-
-                if to_delete(message):
-                    message_mappings[message.channel].append(message)
-                    message_ids.append(message.id)
-
-        return message_mappings, message_ids
+        found: asyncio.Queue[tuple[TextChannel, list[Message]] | None] = asyncio.Queue()
+        semaphore = asyncio.Semaphore(CleanMessages.history_concurrency)
+
+        async def scan(channel: TextChannel) -> None:
+            async with semaphore:
+                batch = []
+                async for message in channel.history(limit=CleanMessages.message_limit, before=before, after=after):
+                    if not self.cleaning:
+                        # Cleaning was canceled
+                        return
+
+                    if to_delete(message):
+                        batch.append(message)
+                        if len(batch) == HISTORY_BATCH_SIZE:
+                            await found.put((channel, batch))
+                            batch = []
+                if batch:
+                    await found.put((channel, batch))
+
+        tasks = [scheduling.create_task(scan(channel)) for channel in channels]
+        scans = asyncio.gather(*tasks)
+        scans.add_done_callback(lambda _: found.put_nowait(None))
+        try:
+            while self.cleaning and (batch := await found.get()) is not None:
+                yield batch
+        finally:
+            for task in tasks:
+                task.cancel()
+            with suppress(asyncio.CancelledError):
+                # Raise any error from scanning a channel.
+                await scans
 
     @staticmethod
     def is_older_than_14d(message: Message) -> bool:
@@ -281,64 +433,37 @@ class Clean(Cog):
         two_weeks_old_snowflake = int((time.time() - 14 * 24 * 60 * 60) * 1000.0 - 1420070400000) << 22
         return message.id < two_weeks_old_snowflake
 
-    async def _delete_messages_individually(self, messages: list[Message]) -> list[Message]:
-        """Delete each message in the list unless cleaning is cancelled. Return the deleted messages."""
-        deleted = []
-        for message in messages:
-            # Ensure that deletion was not canceled
-            if not self.cleaning:
-                return deleted
-            with contextlib.suppress(NotFound):  # Message doesn't exist or was already deleted
-                await message.delete()
-                deleted.append(message)
-        return deleted
-
-    async def _delete_found(self, message_mappings: dict[TextChannel, list[Message]]) -> list[Message]:
+    async def _delete_found(
+        self,
+        ctx: Context,
+        message_mappings: dict[TextChannel, list[Message]],
+        history_batches: AsyncIterator[tuple[TextChannel, list[Message]]] | None = None,
+    ) -> list[Message]:
         """
-        Delete the detected messages.
+        Delete the detected messages, along with the batches found in channel histories as they're found.
 
-        Deletion is made in bulk per channel for messages less than 14d old.
-        The function returns the deleted messages.
+        Deletion is made in bulk per channel for messages less than 14d old, and one by one otherwise.
+        The progress is shown in a status message in the context channel.
+        The function returns the deleted messages, newest first.
         If cleaning was cancelled in the middle, return messages already deleted.
         """
-        deleted = []
-        for channel, messages in message_mappings.items():
-            to_delete = []
-
-            delete_old = False
-            for current_index, message in enumerate(messages):  # noqa: B007
-                if not self.cleaning:
-                    # Means that the cleaning was canceled
-                    return deleted
-
-                if self.is_older_than_14d(message):
-                    # Further messages are too old to be deleted in bulk
-                    delete_old = True
-                    break
-
-                to_delete.append(message)
-
-                if len(to_delete) == 100:
-                    # Only up to 100 messages can be deleted in a bulk
-                    await channel.delete_messages(to_delete)
-                    deleted.extend(to_delete)
-                    to_delete.clear()
-
-            if not self.cleaning:
-                return deleted
-            if len(to_delete) > 0:
-                # Deleting any leftover messages if there are any
-                with suppress(NotFound):
-                    await channel.delete_messages(to_delete)
-                deleted.extend(to_delete)
-
-            if not self.cleaning:
-                return deleted
-            if delete_old:
-                old_deleted = await self._delete_messages_individually(messages[current_index:])
-                deleted.extend(old_deleted)
-
-        return deleted
+        status = await ctx.send(":hourglass: Deleting messages...")
+        scheduler = DeletionScheduler(self, status)
+        try:
+            for channel, messages in message_mappings.items():
+                scheduler.submit(channel, messages)
+            if history_batches is not None:
+                async with aclosing(history_batches) as batches:
+                    async for channel, messages in batches:
+                        # The history is still being scanned while the status message is up.
+                        messages = [message for message in messages if message.id != status.id]
+                        self.mod_log.ignore(Event.message_delete, *(message.id for message in messages))
+                        scheduler.submit(channel, messages)
+            return await scheduler.finish()
+        finally:
+            scheduler.cancel()
+            with suppress(NotFound):
+                await status.delete()
 
     async def _modlog_cleaned_messages(
         self,
@@ -420,28 +545,38 @@ class Clean(Cog):
             # Delete the invocation first
             await self._delete_invocation(ctx)
 
-        if self._use_cache(first_limit):
-            log.trace(f"Messages for cleaning by {ctx.author.id} will be searched in the cache.")
-            message_mappings, message_ids = self._get_messages_from_cache(
-                channels=deletion_channels, to_delete=predicate, lower_limit=first_limit
-            )
-        else:
-            log.trace(f"Messages for cleaning by {ctx.author.id} will be searched in channel histories.")
-            message_mappings, message_ids = await self._get_messages_from_channels(
-                channels=deletion_channels,
+        # Each channel is searched in the cache if it holds all the channel's messages since the limit.
+        cached_channels = {channel for channel in deletion_channels if self._use_cache(channel, first_limit)}
+        history_channels = deletion_channels - cached_channels
+        log.trace(
+            f"Messages for cleaning by {ctx.author.id} will be searched in the cache for {len(cached_channels)} "
+            f"channels, and in channel histories for {len(history_channels)} channels."
+        )
+        message_mappings, message_ids = self._get_messages_from_cache(
+            channels=cached_channels, to_delete=predicate, lower_limit=first_limit
+        )
+        if not self.cleaning:
+            # Means that the cleaning was canceled
+            return None
+
+        history_batches = None
+        if history_channels:
+            # The messages found in the histories are deleted while the rest of the histories are still scanned.
+            history_batches = self._get_messages_from_channels(
+                channels=history_channels,
                 to_delete=predicate,
                 after=first_limit,  # Remember first is the earlier datetime (the "older" time).
                 before=second_limit
             )
 
-        if not self.cleaning:
-            # Means that the cleaning was canceled
-            return None
-
         # Now let's delete the actual messages with purge.
         self.mod_log.ignore(Event.message_delete, *message_ids)
-        deleted_messages = await self._delete_found(message_mappings)
+        deleted_messages = await self._delete_found(ctx, message_mappings, history_batches)
+
+        canceled = not self.cleaning
         self.cleaning = False
+        if canceled and not deleted_messages:
+            return None
 
         if not channels:
             channels = deletion_channels
@@ -461,6 +596,26 @@ class Clean(Cog):
                 await mods.send(f"{ctx.author.mention} {success_message}")
         return log_url
 
+    # region: Listeners
+
+    @Cog.listener()
+    async def on_message(self, message: Message) -> None:
+        """Index new messages by their channel."""
+        self.message_index.add(message)
+
+    @Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent) -> None:
+        """Remove deleted messages from the index."""
+        self.message_index.remove(payload.channel_id, payload.message_id)
+
+    @Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent) -> None:
+        """Remove bulk deleted messages from the index."""
+        for message_id in payload.message_ids:
+            self.message_index.remove(payload.channel_id, message_id)
+
+    # endregion
+
     # region: Commands
 
     @group(invoke_without_command=True, name="clean", aliases=("clear",))
@@ -10,6 +10,7 @@ from pydis_core.utils import paste_service
 from bot.bot import Bot
 from bot.constants import Emojis
 from bot.log import get_logger
+from bot.utils.attachments import get_cached_prefix
 
 log = get_logger(__name__)
 
@@ -38,9 +39,14 @@ class AutoTextAttachmentUploader(commands.Cog):
     @staticmethod
     async def _convert_attachment(attachment: discord.Attachment) -> paste_service.PasteFile:
         """Converts an attachment to a PasteFile, according to the attachment's file encoding."""
-        encoding = re.search(r"charset=(\S+)", attachment.content_type).group(1)
-        file_content_bytes = await attachment.read()
-        file_content = file_content_bytes.decode(encoding)
+        # Small files might have been downloaded in full already, when they were filtered.
+        prefix = get_cached_prefix(attachment)
+        if prefix and prefix.complete:
+            file_content = prefix.text
+        else:
+            encoding = re.search(r"charset=(\S+)", attachment.content_type).group(1)
+            file_content_bytes = await attachment.read()
+            file_content = file_content_bytes.decode(encoding)
         return paste_service.PasteFile(content=file_content, name=attachment.filename)
 
     async def wait_for_user_reaction(
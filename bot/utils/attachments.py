@@ -0,0 +1,125 @@
+import asyncio
+import codecs
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import aiohttp
+import discord
+
+import bot
+from bot.log import get_logger
+
+log = get_logger(__name__)
+
+CHARSET_RE = re.compile(r"charset=([^\s;]+)")
+# How many downloaded prefixes to keep, so that cogs handling the same message don't download its attachments again.
+CACHE_SIZE = 256
+CHUNK_SIZE = 4_096
+
+
+@dataclass(frozen=True)
+class AttachmentPrefix:
+    """The beginning of a text attachment, downloaded with the given limits."""
+
+    data: bytes
+    text: str
+    complete: bool  # Whether the data is the entire file.
+    max_bytes: int
+    max_chars: int | None
+    max_lines: int | None
+
+    def covers(self, max_bytes: int, max_chars: int | None, max_lines: int | None) -> bool:
+        """Whether the prefix has everything a download with the given limits would have read."""
+        if self.complete:
+            return True
+        return (
+            self.max_bytes >= max_bytes
+            and (self.max_chars is None or (max_chars is not None and self.max_chars >= max_chars))
+            and (self.max_lines is None or (max_lines is not None and self.max_lines >= max_lines))
+        )
+
+
+_prefixes: OrderedDict[int, AttachmentPrefix] = OrderedDict()
+
+
+def attachment_encoding(attachment: discord.Attachment) -> str:
+    """Return the charset of a text attachment, or UTF-8 if it's missing or unknown."""
+    match = CHARSET_RE.search(attachment.content_type or "")
+    if not match:
+        return "utf-8"
+    try:
+        return codecs.lookup(match.group(1)).name
+    except LookupError:
+        log.trace(f"Unknown charset {match.group(1)!r} for attachment {attachment.id}, falling back to UTF-8.")
+        return "utf-8"
+
+
+def get_cached_prefix(attachment: discord.Attachment) -> AttachmentPrefix | None:
+    """Return the prefix of the attachment if it was downloaded recently."""
+    return _prefixes.get(attachment.id)
+
+
+async def read_text_prefix(
+    attachment: discord.Attachment,
+    *,
+    max_bytes: int,
+    max_chars: int | None = None,
+    max_lines: int | None = None,
+    timeout: float,
+) -> AttachmentPrefix:
+    """
+    Download the beginning of a text attachment, and decode it according to its charset.
+
+    The download is streamed, and stops once `max_bytes` bytes were read, or once the decoded text has at least
+    `max_chars` characters or `max_lines` complete lines. If it takes longer than `timeout` seconds, or fails, whatever
+    was read until then is returned. Bytes which can't be decoded are replaced.
+
+    Unless the download was cut short by a timeout or a failure, the result is cached, and reused by later calls for the
+    same attachment with the same or smaller limits. A prefix which was cut short doesn't have everything its limits
+    allow, so it's only cached if it happens to have the entire file.
+    """
+    cached = _prefixes.get(attachment.id)
+    if cached and cached.covers(max_bytes, max_chars, max_lines):
+        _prefixes.move_to_end(attachment.id)
+        return cached
+
+    decoder = codecs.getincrementaldecoder(attachment_encoding(attachment))(errors="replace")
+    chunks = []
+    text_parts = []
+    size = chars = lines = 0
+    interrupted = False
+    try:
+        async with asyncio.timeout(timeout), bot.instance.http_session.get(attachment.url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                chunk = chunk[:max_bytes - size]
+                chunks.append(chunk)
+                size += len(chunk)
+                text = decoder.decode(chunk)
+                text_parts.append(text)
+                chars += len(text)
+                lines += text.count("\n")
+                if (
+                    size >= max_bytes
+                    or (max_chars is not None and chars >= max_chars)
+                    or (max_lines is not None and lines >= max_lines)
+                ):
+                    break
+    except TimeoutError:
+        log.info(f"Timed out after reading {size} bytes of attachment {attachment.id}.")
+        interrupted = True
+    except aiohttp.ClientError as e:
+        log.warning(f"Failed to download attachment {attachment.id}: {e}")
+        interrupted = True
+
+    complete = size >= attachment.size
+    text_parts.append(decoder.decode(b"", final=complete))
+    prefix = AttachmentPrefix(b"".join(chunks), "".join(text_parts), complete, max_bytes, max_chars, max_lines)
+
+    if complete or not interrupted:
+        _prefixes[attachment.id] = prefix
+        _prefixes.move_to_end(attachment.id)
+        while len(_prefixes) > CACHE_SIZE:
+            _prefixes.popitem(last=False)
+    return prefix
@@ -1,8 +1,88 @@
 import typing as t
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime
 from math import ceil
+from operator import attrgetter
 
 from discord import Message
 
+import bot
+
+# The number of messages evicted from a channel in the channel message index after which its list is compacted.
+COMPACT_THRESHOLD = 64
+
+
+class CachedMessage:
+    """
+    A compact record of a message, holding only the fields needed to keep track of it.
+
+    The full message is resolved on demand from the bot's own message cache, for as long as it's still there.
+    """
+
+    __slots__ = ("attachments", "author_id", "channel_id", "content_hash", "created_at", "embeds", "id", "mention_ids")
+
+    def __init__(
+        self,
+        id: int,
+        author_id: int,
+        channel_id: int,
+        created_at: datetime,
+        content_hash: int,
+        mention_ids: tuple[int, ...],
+        attachments: int,
+        embeds: int,
+    ):
+        self.id = id
+        self.author_id = author_id
+        self.channel_id = channel_id
+        self.created_at = created_at
+        self.content_hash = content_hash
+        self.mention_ids = mention_ids
+        self.attachments = attachments
+        self.embeds = embeds
+
+    @classmethod
+    def from_message(cls, message: Message) -> "CachedMessage":
+        """Create a compact record of the message."""
+        return cls(
+            message.id,
+            message.author.id,
+            message.channel.id,
+            message.created_at,
+            hash(message.content),
+            tuple(user.id for user in message.mentions),
+            len(message.attachments),
+            len(message.embeds),
+        )
+
+    def resolve(self) -> Message | None:
+        """Return the full message from the bot's message cache, or None if it's no longer cached there."""
+        return resolve_messages((self.id,)).get(self.id)
+
+    def __repr__(self):
+        return f"<CachedMessage id={self.id} author_id={self.author_id} channel_id={self.channel_id}>"
+
+
+def resolve_messages(message_ids: t.Iterable[int]) -> dict[int, Message]:
+    """
+    Return the full messages with the given IDs which are still in the bot's message cache, by their IDs.
+
+    The bot's cache is searched once for all the messages, stopping as soon as they're all found.
+    """
+    remaining = set(message_ids)
+    if not remaining:
+        return {}
+    found = {}
+    # Searching from the end, since the bot's cache is in the order the messages were received.
+    for message in reversed(bot.instance.cached_messages):
+        if message.id in remaining:
+            remaining.remove(message.id)
+            found[message.id] = message
+            if not remaining:
+                break
+    return found
+
 
 class MessageCache:
     """
@@ -20,77 +100,88 @@ class MessageCache:
 
     The implementation is transparent to the user: to the user the first element is always at index 0, and there are
     only as many elements as were inserted (meaning, without any pre-allocated placeholder values).
+
+    In compact mode, a `CachedMessage` record is stored in place of each message, which takes a fraction of the memory
+    of a full message along with the objects it references. The full messages can be resolved from the records when
+    needed.
     """
 
-    def __init__(self, maxlen: int, *, newest_first: bool = False):
+    def __init__(self, maxlen: int, *, newest_first: bool = False, compact: bool = False):
         if maxlen <= 0:
             raise ValueError("maxlen must be positive")
         self.maxlen = maxlen
         self.newest_first = newest_first
+        self.compact = compact
 
         self._start = 0
         self._end = 0
 
-        self._messages: list[Message | None] = [None] * self.maxlen
+        self._messages: list[Message | CachedMessage | None] = [None] * self.maxlen
         self._message_id_mapping = {}
         self._message_metadata = {}
 
     def append(self, message: Message, *, metadata: dict | None = None) -> None:
         """Add the received message to the cache, depending on the order of messages defined by `newest_first`."""
+        message = self._entry(message)
         if self.newest_first:
             self._appendleft(message)
         else:
             self._appendright(message)
         self._message_metadata[message.id] = metadata
 
-    def _appendright(self, message: Message) -> None:
+    def _entry(self, message: Message) -> Message | CachedMessage:
+        """Return what should be stored in the cache for the message."""
+        return CachedMessage.from_message(message) if self.compact else message
+
+    def _appendright(self, message: Message | CachedMessage) -> None:
         """Add the received message to the end of the cache."""
         if self._is_full():
-            del self._message_id_mapping[self._messages[self._start].id]
-            del self._message_metadata[self._messages[self._start].id]
+            self._forget(self._messages[self._start])
             self._start = (self._start + 1) % self.maxlen
 
         self._messages[self._end] = message
         self._message_id_mapping[message.id] = self._end
         self._end = (self._end + 1) % self.maxlen
 
-    def _appendleft(self, message: Message) -> None:
+    def _appendleft(self, message: Message | CachedMessage) -> None:
         """Add the received message to the beginning of the cache."""
         if self._is_full():
             self._end = (self._end - 1) % self.maxlen
-            del self._message_id_mapping[self._messages[self._end].id]
-            del self._message_metadata[self._messages[self._end].id]
+            self._forget(self._messages[self._end])
 
         self._start = (self._start - 1) % self.maxlen
         self._messages[self._start] = message
         self._message_id_mapping[message.id] = self._start
 
-    def pop(self) -> Message:
+    def pop(self) -> Message | CachedMessage:
         """Remove the last message in the cache and return it."""
         if self._is_empty():
             raise IndexError("pop from an empty cache")
 
         self._end = (self._end - 1) % self.maxlen
         message = self._messages[self._end]
-        del self._message_id_mapping[message.id]
-        del self._message_metadata[message.id]
+        self._forget(message)
         self._messages[self._end] = None
 
         return message
 
-    def popleft(self) -> Message:
+    def popleft(self) -> Message | CachedMessage:
         """Return the first message in the cache and return it."""
         if self._is_empty():
             raise IndexError("pop from an empty cache")
 
         message = self._messages[self._start]
-        del self._message_id_mapping[message.id]
-        del self._message_metadata[message.id]
+        self._forget(message)
         self._messages[self._start] = None
         self._start = (self._start + 1) % self.maxlen
 
         return message
 
+    def _forget(self, message: Message | CachedMessage) -> None:
+        """Remove a message which is being removed from the buffer from the mappings."""
+        del self._message_id_mapping[message.id]
+        del self._message_metadata[message.id]
+
     def clear(self) -> None:
         """Remove all messages from the cache."""
         self._messages = [None] * self.maxlen
@@ -100,8 +191,8 @@ class MessageCache:
         self._start = 0
         self._end = 0
 
-    def get_message(self, message_id: int) -> Message | None:
-        """Return the message that has the given message ID, if it is cached."""
+    def get_message(self, message_id: int) -> Message | CachedMessage | None:
+        """Return the message that has the given message ID if it is cached, or its record in compact mode."""
         index = self._message_id_mapping.get(message_id, None)
         return self._messages[index] if index is not None else None
 
@@ -118,7 +209,7 @@ class MessageCache:
         index = self._message_id_mapping.get(message.id, None)
         if index is None:
             return False
-        self._messages[index] = message
+        self._messages[index] = self._entry(message)
         if metadata is not None:
             self._message_metadata[message.id] = metadata
         return True
@@ -127,7 +218,7 @@ class MessageCache:
         """Return True if the cache contains a message with the given ID ."""
         return message_id in self._message_id_mapping
 
-    def __getitem__(self, item: int | slice) -> Message | list[Message]:
+    def __getitem__(self, item: int | slice) -> Message | CachedMessage | list[Message | CachedMessage]:
         """
         Return the message(s) in the index or slice provided.
 
@@ -181,7 +272,7 @@ class MessageCache:
 
         raise TypeError(f"cache indices must be integers or slices, not {type(item)}")
 
-    def __iter__(self) -> t.Iterator[Message]:
+    def __iter__(self) -> t.Iterator[Message | CachedMessage]:
         if self._is_empty():
             return
 
@@ -206,3 +297,121 @@ class MessageCache:
     def _is_full(self) -> bool:
         """Return True if every cell in the cache already contains a message."""
         return self._messages[self._end] is not None
+
+
+class _ChannelMessages:
+    """
+    The indexed messages of a single channel, in the order they were added.
+
+    The messages are kept in a list so that they can be binary searched, and evicted messages are only dropped from the
+    front of the list once enough of them accumulate, rather than shifting the whole list on every eviction.
+    """
+
+    __slots__ = ("_head", "_messages")
+
+    def __init__(self):
+        self._messages: list[Message | None] = []
+        # The messages before this index were evicted, and are only kept until the list is compacted.
+        self._head = 0
+
+    def append(self, message: Message) -> None:
+        """Add a new message to the end of the channel's messages."""
+        self._messages.append(message)
+
+    def popleft(self) -> Message:
+        """Evict the oldest message of the channel and return it."""
+        message = self._messages[self._head]
+        self._messages[self._head] = None
+        self._head += 1
+        if self._head >= COMPACT_THRESHOLD and self._head * 2 >= len(self._messages):
+            del self._messages[:self._head]
+            self._head = 0
+        return message
+
+    def remove(self, message_id: int) -> None:
+        """Remove the message with the given ID, if it's there."""
+        position = bisect_right(self._messages, message_id, lo=self._head, key=attrgetter("id"))
+        if position > self._head and self._messages[position - 1].id == message_id:
+            del self._messages[position - 1]
+
+    def since(self, since: datetime) -> list[Message]:
+        """Return the messages created after `since`, newest first."""
+        start = bisect_right(self._messages, since, lo=self._head, key=attrgetter("created_at"))
+        return self._messages[start:][::-1]
+
+    @property
+    def oldest(self) -> Message:
+        """The oldest message of the channel."""
+        return self._messages[self._head]
+
+    def __len__(self):
+        return len(self._messages) - self._head
+
+
+class ChannelMessageIndex:
+    """
+    The most recent messages of each channel, up to a total size limit.
+
+    Unlike a single buffer of messages, the messages of one channel are found without going over those of every other
+    channel. The index also tracks, per channel, since when it holds every message sent there: the time it started
+    tracking messages, or the time of the channel's most recent message evicted to make room for newer ones. If no time
+    is given to start tracking from, tracking starts with the first message added.
+
+    Messages should be added in the order they were sent, and removed when they're deleted.
+    """
+
+    def __init__(self, maxlen: int, tracking_since: datetime | None = None):
+        if maxlen <= 0:
+            raise ValueError("maxlen must be positive")
+        self.maxlen = maxlen
+        self.tracking_since = tracking_since
+
+        self._channels: dict[int, _ChannelMessages] = {}
+        # The channel and message IDs of the indexed messages, in the order they were added.
+        self._order: deque[tuple[int, int]] = deque()
+        # The channels which had messages evicted, and the creation time of the most recent one evicted.
+        self._complete_since: dict[int, datetime] = {}
+
+    def add(self, message: Message) -> None:
+        """Add a new message to the index, evicting the oldest message overall if the index is full."""
+        if self.tracking_since is None:
+            self.tracking_since = message.created_at
+        self._channels.setdefault(message.channel.id, _ChannelMessages()).append(message)
+        self._order.append((message.channel.id, message.id))
+        if len(self._order) > self.maxlen:
+            self._evict()
+
+    def remove(self, channel_id: int, message_id: int) -> None:
+        """Remove a deleted message from the index, if it's there."""
+        messages = self._channels.get(channel_id)
+        if not messages:
+            return
+        messages.remove(message_id)
+        if not messages:
+            del self._channels[channel_id]
+
+    def complete_since(self, channel_id: int) -> datetime | None:
+        """
+        Return the time since which every message sent in the channel is in the index.
+
+        Return None if the index didn't start tracking messages yet.
+        """
+        return self._complete_since.get(channel_id, self.tracking_since)
+
+    def messages_since(self, channel_id: int, since: datetime) -> list[Message]:
+        """Return the indexed messages of the channel created after `since`, newest first."""
+        messages = self._channels.get(channel_id)
+        return messages.since(since) if messages else []
+
+    def _evict(self) -> None:
+        """Evict the oldest message in the index, unless it was already removed."""
+        channel_id, message_id = self._order.popleft()
+        messages = self._channels.get(channel_id)
+        if messages and messages.oldest.id == message_id:
+            self._complete_since[channel_id] = messages.popleft().created_at
+            if not messages:
+                del self._channels[channel_id]
+
+    def __len__(self):
+        return sum(len(messages) for messages in self._channels.values())
+
@@ -0,0 +1,268 @@
+"""
+Replay a recorded corpus of events through the filtering pipeline, and report how long each part of it took.
+
+The corpus is a JSON lines file, with one event per line:
+
+    {
+        "event": "message",  # Optional, any `Event` name. Defaults to a message.
+        "content": "the message content, or the name for name events",
+        "author": {"id": 1234, "roles": [5678]},  # Optional. Role names are accepted as well.
+        # Optional. Without a category, the channel is placed in one with ID 0. Channels with a null category are
+        # outside the default channel scope of filter lists.
+        "channel": {"id": 4321, "name": "python-general", "category": {"id": 8765, "name": "Python"}},
+        "attachments": [{"filename": "code.py", "content_type": "text/x-python; charset=utf-8", "size": 120}],
+        "embeds": [{"title": "An embed", "url": "https://example.com"}]  # Optional, in Discord's embed format.
+    }
+
+The filter lists are served by a fake site API from a snapshot, which is the JSON response of
+`GET bot/filter/filter_lists`.
+
+Events are dispatched through `Filtering._resolve_action` in the order they're recorded, with messages also added to the
+message cache so that the antispam rules see them. No actions are taken, and no Discord or site API requests are made:
+the cog runs on the stubs from `tests.helpers`, and invites always resolve as not found.
+
+Run it from the root of the repository, with the same environment variables as the tests:
+
+    python -m tests.benchmarks.filtering corpus.jsonl filter_lists.json --repeat 5
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import warnings
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import arrow
+import discord
+from discord import NotFound
+
+import bot
+from bot.exts.filtering._filter_context import Event, FilterContext
+from bot.exts.filtering.filtering import Filtering
+from tests.helpers import MockBot, MockMember, MockMessage, MockRole, MockTextChannel
+
+NAME_EVENTS = (Event.NICKNAME, Event.THREAD_NAME)
+PERCENTILES = (50, 95, 99)
+
+
+class FakeSiteAPI:
+    """Serve the filter lists snapshot, and ignore any other request."""
+
+    def __init__(self, filter_lists: list[dict]):
+        self.filter_lists = filter_lists
+
+    async def get(self, endpoint: str, *_, **__) -> list:
+        if endpoint == "bot/filter/filter_lists":
+            return self.filter_lists
+        return []
+
+    async def ignore(self, *_, **__) -> dict:
+        return {}
+
+
+class Timings:
+    """Latency samples in seconds, grouped by event type, filter list, and filter."""
+
+    def __init__(self):
+        self.events: defaultdict[str, list[float]] = defaultdict(list)
+        self.lists: defaultdict[str, list[float]] = defaultdict(list)
+        self.filters: defaultdict[str, list[float]] = defaultdict(list)
+
+    def timed(self, samples: list[float], func: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        """Wrap the coroutine function, so that its duration is added to the samples."""
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+        return wrapper
+
+
+def create_cog(filter_lists: list[dict]) -> Filtering:
+    """Create the filtering cog on top of the test stubs, and load the filter lists from the fake API's snapshot."""
+    mock_bot = MockBot()
+    site_api = FakeSiteAPI(filter_lists)
+    mock_bot.api_client.get = AsyncMock(side_effect=site_api.get)
+    for method in ("post", "patch", "put", "delete"):
+        setattr(mock_bot.api_client, method, AsyncMock(side_effect=site_api.ignore))
+    mock_bot.fetch_invite = AsyncMock(side_effect=NotFound(MagicMock(status=404), "Unknown Invite"))
+    bot.instance = mock_bot
+
+    cog = Filtering(mock_bot)
+    example_list = None
+    for raw_filter_list in filter_lists:
+        loaded_list = cog._load_raw_filter_list(raw_filter_list)
+        example_list = example_list or loaded_list
+    cog.collect_loaded_types(example_list)
+    return cog
+
+
+def instrument(cog: Filtering, timings: Timings) -> None:
+    """Time every filter list and every loaded filter."""
+    for filter_list in cog.filter_lists.values():
+        filter_list.actions_for = timings.timed(timings.lists[filter_list.name], filter_list.actions_for)
+        for atomic_list in filter_list.values():
+            for filter_ in atomic_list.filters.values():
+                key = f"{atomic_list.label} {filter_.id} {filter_.content[:40]!r}"
+                filter_.triggered_on = timings.timed(timings.filters[key], filter_.triggered_on)
+
+
+class CorpusBuilder:
+    """Create the stub Discord objects of the recorded events, reusing authors and channels across events."""
+
+    def __init__(self):
+        self.members: dict[int, MockMember] = {}
+        self.channels: dict[int, MockTextChannel] = {}
+        self.next_message_id = 1
+
+    def member(self, data: dict) -> MockMember:
+        """Return the author of an event."""
+        member_id = data.get("id", 0)
+        if member_id not in self.members:
+            roles = [
+                MockRole(id=role, name=str(role)) if isinstance(role, int) else MockRole(name=role)
+                for role in data.get("roles", [])
+            ]
+            self.members[member_id] = MockMember(id=member_id, name=data.get("name", str(member_id)), roles=roles)
+        return self.members[member_id]
+
+    def channel(self, data: dict) -> MockTextChannel:
+        """Return the channel of an event."""
+        channel_id = data.get("id", 0)
+        if channel_id not in self.channels:
+            channel = MockTextChannel(id=channel_id, name=data.get("name", str(channel_id)))
+            category = data.get("category", {"id": 0, "name": "category"})
+            channel.category = None
+            if category:
+                channel.category = MagicMock(id=category.get("id"))
+                channel.category.name = category.get("name")
+            self.channels[channel_id] = channel
+        return self.channels[channel_id]
+
+    def message(self, data: dict) -> MockMessage:
+        """Create the message of an event, as if it was sent now."""
+        attachments = [
+            MagicMock(spec=discord.Attachment, id=index, **attachment)
+            for index, attachment in enumerate(data.get("attachments", []))
+        ]
+        message = MockMessage(
+            id=self.next_message_id,
+            content=data.get("content", ""),
+            author=self.member(data.get("author", {})),
+            channel=self.channel(data.get("channel", {})),
+            attachments=attachments,
+            embeds=[discord.Embed.from_dict(embed) for embed in data.get("embeds", [])],
+            mentions=[],
+            role_mentions=[],
+            created_at=arrow.utcnow().datetime,
+            type=discord.MessageType.default,
+            reference=None,
+        )
+        self.next_message_id += 1
+        return message
+
+
+async def replay(cog: Filtering, corpus: list[dict], repeat: int) -> tuple[Timings, float]:
+    """Dispatch the corpus to the cog, and return the timings and the total duration."""
+    timings = Timings()
+    instrument(cog, timings)
+    resolve_action = cog._resolve_action
+    builder = CorpusBuilder()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for data in corpus:
+            event = Event[data.get("event", "message").upper()]
+            msg = builder.message(data)
+            if event in NAME_EVENTS:
+                ctx = FilterContext.from_message(event, msg)
+                # Mirror `Filtering._check_bad_name`.
+                normalized = ctx.normalized
+                ctx = ctx.replace(content=" ".join((ctx.content, normalized.nfkc, normalized.nfkc_folded)))
+            else:
+                cog.message_cache.append(msg)
+                cog.antispam_window.add(msg)
+                ctx = FilterContext.from_message(event, msg, None, cog.message_cache)
+            await timings.timed(timings.events[event.name.lower()], resolve_action)(ctx)
+    return timings, time.perf_counter() - start
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    """Return the number of samples, the throughput, and the latency percentiles in milliseconds."""
+    total = sum(samples)
+    summary = {"count": len(samples), "per_second": len(samples) / total if total else float("inf")}
+    if len(samples) > 1:
+        quantiles = statistics.quantiles(samples, n=100, method="inclusive")
+        summary |= {f"p{p}": quantiles[p - 1] * 1_000 for p in PERCENTILES}
+    else:
+        summary |= {f"p{p}": samples[0] * 1_000 for p in PERCENTILES}
+    return summary
+
+
+def build_report(timings: Timings, duration: float, top: int) -> dict:
+    """Summarize the timings, keeping only the `top` slowest filters by their 99th percentile."""
+    filters = {key: summarize(samples) for key, samples in timings.filters.items() if samples}
+    slowest = sorted(filters.items(), key=lambda item: item[1]["p99"], reverse=True)[:top]
+    events = sum(len(samples) for samples in timings.events.values())
+    return {
+        "events": events,
+        "duration": duration,
+        "per_second": events / duration if duration else float("inf"),
+        "by_event": {key: summarize(samples) for key, samples in timings.events.items()},
+        "by_list": {key: summarize(samples) for key, samples in timings.lists.items() if samples},
+        "slowest_filters": dict(slowest),
+    }
+
+
+def format_report(report: dict) -> str:
+    """Format the report as plain text tables."""
+    header = f"{'':<60} {'count':>8} {'per sec':>10} " + " ".join(f"{'p' + str(p) + ' ms':>9}" for p in PERCENTILES)
+    lines = [
+        f"Replayed {report['events']} events in {report['duration']:.2f}s ({report['per_second']:.1f} events/s).",
+    ]
+    sections = {
+        "Events": report["by_event"], "Filter lists": report["by_list"], "Slowest filters": report["slowest_filters"]
+    }
+    for title, section in sections.items():
+        lines += ["", title, header]
+        for key, summary in section.items():
+            lines.append(
+                f"{key[:60]:<60} {summary['count']:>8} {summary['per_second']:>10.1f} "
+                + " ".join(f"{summary[f'p{p}']:>9.3f}" for p in PERCENTILES)
+            )
+    return "\n".join(lines) + "\n"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded events through the filtering pipeline.")
+    parser.add_argument("corpus", type=Path, help="A JSON lines file of recorded events.")
+    parser.add_argument("filter_lists", type=Path, help="A JSON snapshot of the filter lists from the site API.")
+    parser.add_argument("--repeat", type=int, default=1, help="How many times to replay the corpus.")
+    parser.add_argument("--top", type=int, default=20, help="How many of the slowest filters to report.")
+    parser.add_argument("--json", action="store_true", help="Output the report as JSON.")
+    args = parser.parse_args()
+
+    corpus = [json.loads(line) for line in args.corpus.read_text("utf-8").splitlines() if line.strip()]
+    filter_lists = json.loads(args.filter_lists.read_text("utf-8"))
+
+    async def run() -> tuple[Timings, float]:
+        cog = create_cog(filter_lists)
+        return await replay(cog, corpus, args.repeat)
+
+    # The test stubs inspect deprecated attributes of the objects they mock, and discord.py forces those warnings to
+    # always show. Record them instead, to keep them out of the report.
+    with warnings.catch_warnings(record=True):
+        timings, duration = asyncio.run(run())
+    report = build_report(timings, duration, args.top)
+    sys.stdout.write(json.dumps(report, indent=4) + "\n" if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import patch
+
+from bot.exts.filtering._filter_lists.filter_list import ListType
+from tests.benchmarks.filtering import build_report, create_cog, replay
+
+NOW = "2024-01-01T00:00:00Z"
+SETTINGS = {
+    "mentions": {"guild_pings": [], "dm_pings": []},
+    "send_alert": True,
+    "infraction_and_notification": {
+        "dm_content": "", "dm_embed": "", "infraction_type": "NONE", "infraction_reason": "",
+        "infraction_duration": 0, "infraction_channel": 0
+    },
+    "remove_context": False,
+    "enabled": True,
+    "channel_scope": {
+        "disabled_channels": [], "disabled_categories": [], "enabled_channels": [], "enabled_categories": []
+    },
+    "filter_dm": True,
+    "bypass_roles": [],
+}
+
+
+def filter_data(id_: int, content: str) -> dict:
+    return {
+        "id": id_, "content": content, "description": None, "settings": {}, "additional_settings": {},
+        "created_at": NOW, "updated_at": NOW
+    }
+
+
+class FilteringReplayTests(unittest.IsolatedAsyncioTestCase):
+    """Test the filtering replay benchmark."""
+
+    def setUp(self):
+        # Creating the cog sets the global bot instance.
+        patcher = patch("bot.instance", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_replay_reports_every_level(self):
+        """Events, lists and the filters which were evaluated should all have latency samples."""
+        snapshot = [
+            {
+                "id": 1, "name": "token", "list_type": 0, "created_at": NOW, "updated_at": NOW, "settings": SETTINGS,
+                "filters": [filter_data(1, "lemon"), filter_data(2, "kiwi")]
+            },
+        ]
+        corpus = [
+            {"content": "a lemon", "author": {"id": 1, "roles": [10]}, "channel": {"id": 2}},
+            {"content": "nothing", "author": {"id": 1}},
+            {"event": "nickname", "content": "kiwi"},
+        ]
+        cog = create_cog(snapshot)
+        self.assertEqual(len(cog.filter_lists["token"][ListType.DENY].filters), 2)
+
+        timings, duration = await replay(cog, corpus, repeat=2)
+        report = build_report(timings, duration, top=10)
+
+        self.assertEqual(report["events"], 6)
+        self.assertEqual(report["by_event"]["message"]["count"], 4)
+        self.assertEqual(report["by_event"]["nickname"]["count"], 2)
+        self.assertEqual(report["by_list"]["token"]["count"], 6)
+        self.assertEqual(set(report["slowest_filters"]), {"denied token 1 'lemon'", "denied token 2 'kiwi'"})
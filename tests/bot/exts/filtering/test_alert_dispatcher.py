@@ -0,0 +1,123 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from discord import Embed
+
+from bot.exts.filtering._alert_dispatcher import AlertDispatcher, QueuedAlert, coalesce, pack
+from tests.helpers import MockBot
+
+
+def make_alert(key: str, author_id: int = 1, username: str = "Message Filter", description: str = "x") -> QueuedAlert:
+    return QueuedAlert(key, username, "", [Embed(description=description)], None, author_id)
+
+
+class CoalesceAndPackTests(unittest.TestCase):
+    """Test merging and grouping queued alerts."""
+
+    def test_alerts_with_the_same_key_are_merged(self):
+        """Alerts with the same key should be merged into the first of them, with a count."""
+        first, second, third = make_alert("a"), make_alert("b"), make_alert("a")
+
+        alerts = coalesce([first, second, third])
+
+        self.assertEqual(alerts, [first, second])
+        self.assertEqual(first.count, 2)
+        self.assertIn("Triggered 2 times", first.merged_embeds()[0].footer.text)
+
+    def test_alerts_are_packed_by_username_and_author(self):
+        """Consecutive alerts should share a message only if they have the same username and author."""
+        alerts = [make_alert("a"), make_alert("b"), make_alert("c", author_id=2), make_alert("d", username="Anti-Spam")]
+
+        batches = pack(alerts)
+
+        self.assertEqual([len(batch) for batch in batches], [2, 1, 1])
+
+    def test_alerts_with_different_views_are_not_packed(self):
+        """Only the view of the first alert is sent, so alerts with different kinds of views shouldn't share it."""
+        alerts = [make_alert("a"), make_alert("b")]
+        alerts[1].view = MagicMock()
+
+        self.assertEqual([len(batch) for batch in pack(alerts)], [1, 1])
+
+    def test_packing_respects_embed_limits(self):
+        """A message should have at most 10 embeds, with a total length of at most 6000."""
+        self.assertEqual([len(batch) for batch in pack([make_alert(str(i)) for i in range(12)])], [10, 2])
+
+        long_alerts = [make_alert(str(i), description="a" * 2_500) for i in range(3)]
+        self.assertEqual([len(batch) for batch in pack(long_alerts)], [2, 1])
+
+
+class AlertDispatcherTests(unittest.IsolatedAsyncioTestCase):
+    """Test delivering the queued alerts through the webhook."""
+
+    async def asyncSetUp(self):
+        self.bot = MockBot()
+        self.dispatcher = AlertDispatcher(self.bot)
+        self.dispatcher.webhook = AsyncMock()
+
+        patcher = patch("bot.exts.filtering._alert_dispatcher.FilteringSettings", MagicMock(alert_coalesce_window=0.01))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def deliver(self, *windows: list[QueuedAlert]) -> None:
+        """Run the delivery loop, queueing each group of alerts after the previous group's window closed."""
+        task = asyncio.create_task(self.dispatcher._deliver_forever())
+        for alerts in windows:
+            for alert in alerts:
+                self.dispatcher._queue.put_nowait(alert)
+            await asyncio.sleep(0.05)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+    async def test_alerts_within_the_window_are_coalesced(self):
+        """Alerts queued within the same window should be merged and sent in a single message."""
+        await self.deliver([make_alert("a"), make_alert("b"), make_alert("a")])
+
+        self.dispatcher.webhook.send.assert_awaited_once()
+        self.assertEqual(len(self.dispatcher.webhook.send.call_args.kwargs["embeds"]), 2)
+        self.assertTrue(self.dispatcher._queue.empty())
+
+    async def test_each_window_is_delivered(self):
+        """Alerts queued after a window closed should be sent in the next one."""
+        await self.deliver([make_alert("a")], [make_alert("a")])
+
+        self.assertEqual(self.dispatcher.webhook.send.await_count, 2)
+
+    async def test_delivery_survives_failures(self):
+        """A window which failed to be delivered shouldn't stop the next ones."""
+        self.dispatcher.webhook.send.side_effect = [ValueError, None]
+
+        await self.deliver([make_alert("a")], [make_alert("b")])
+
+        self.assertEqual(self.dispatcher.webhook.send.await_count, 2)
+
+    async def test_alerts_without_a_webhook_are_dropped(self):
+        """Alerts should be dropped rather than break the delivery if there's no webhook."""
+        webhook, self.dispatcher.webhook = self.dispatcher.webhook, None
+
+        await self.deliver([make_alert("a")])
+
+        webhook.send.assert_not_awaited()
+        self.assertTrue(self.dispatcher._queue.empty())
+
+    async def test_send_combines_the_batch(self):
+        """A batch should be sent in a single webhook call, and its delivery lag reported."""
+        alerts = [make_alert("a"), make_alert("b")]
+        alerts[0].content = "<@&123>"
+        alerts[1].content = "<@&123>"
+
+        await self.dispatcher._send(alerts)
+
+        self.dispatcher.webhook.send.assert_awaited_once()
+        kwargs = self.dispatcher.webhook.send.call_args.kwargs
+        self.assertEqual(len(kwargs["embeds"]), 2)
+        self.assertEqual(kwargs["content"], "<@&123>")
+        self.assertEqual(self.bot.stats.timing.call_count, 2)
+
+    async def test_enqueue_reports_queue_depth(self):
+        """Queueing an alert should report the queue depth."""
+        self.dispatcher.enqueue("a", username="Message Filter", content="", embeds=[], view=None, author_id=1)
+
+        self.bot.stats.gauge.assert_called_once_with("filters.alerts.queue_depth", 1)
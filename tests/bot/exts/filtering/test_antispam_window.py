@@ -0,0 +1,134 @@
+import unittest
+from datetime import UTC, datetime, timedelta
+from unittest.mock import patch
+
+from discord import MessageType
+
+from bot.exts.filtering._antispam_window import AntispamWindow
+from bot.utils.message_cache import CachedMessage, MessageCache
+from tests.helpers import MockBot, MockMember, MockMessage, MockMessageReference
+
+START = datetime(2023, 1, 1, tzinfo=UTC)
+
+
+class AntispamWindowTests(unittest.TestCase):
+    """Test the per-author windows used by the antispam rules."""
+
+    def setUp(self):
+        """Sets up fresh objects for each test."""
+        self.cache = MessageCache(maxlen=4, newest_first=True)
+        self.window = AntispamWindow(self.cache)
+        self.alice = MockMember(id=1)
+        self.bob = MockMember(id=2)
+        self.next_id = 0
+
+    def send(self, author: MockMember, content: str = "", seconds: int = 0, **kwargs) -> MockMessage:
+        """Add a message to the cache and to the window, as the cog does."""
+        self.next_id += 1
+        msg = MockMessage(
+            id=self.next_id,
+            author=author,
+            content=content,
+            created_at=START + timedelta(seconds=seconds),
+            role_mentions=[],
+            **kwargs,
+        )
+        self.cache.append(msg)
+        self.window.add(msg)
+        return msg
+
+    def test_totals_since(self):
+        """The totals should only include the author's messages created after the given time."""
+        self.send(self.alice, "old", seconds=0)
+        first = self.send(self.alice, "hello\n\nhttps://a.com", seconds=5, attachments=["a"])
+        self.send(self.bob, "not alice's", seconds=6)
+        second = self.send(self.alice, ":smile: :smile:", seconds=7)
+
+        recent = self.window.for_author(self.alice.id).since(START + timedelta(seconds=1))
+
+        self.assertEqual(recent.messages, {first, second})
+        self.assertEqual(recent.totals.messages, 2)
+        self.assertEqual(recent.totals.chars, len(first.content) + len(second.content))
+        self.assertEqual(recent.totals.attachments, 1)
+        self.assertEqual(recent.totals.links, 1)
+        self.assertEqual(recent.totals.messages_with_links, 1)
+        self.assertEqual(recent.totals.newlines, 2)
+        self.assertEqual(recent.totals.emojis, 2)
+        self.assertEqual(max(record.max_newline_group for record in recent.records), 2)
+
+    def test_evicted_messages_leave_the_window(self):
+        """Messages evicted from the cache shouldn't be counted, and empty windows should be removed."""
+        self.send(self.bob, "bob", seconds=0)
+        for seconds in range(1, 5):
+            self.send(self.alice, "alice", seconds=seconds)
+
+        self.assertEqual(len(self.window.for_author(self.alice.id)), 4)
+        self.assertEqual(len(self.window.for_author(self.bob.id)), 0)
+        self.assertNotIn(self.bob.id, self.window._windows)
+
+        self.send(self.bob, "bob", seconds=5)
+        alice_window = self.window.for_author(self.alice.id)
+        self.assertEqual(len(alice_window), 3)
+        self.assertEqual(alice_window.since(START).totals.messages, 3)
+
+    def test_edits_update_the_totals(self):
+        """Editing a message should update its counts in the totals of the messages after it."""
+        msg = self.send(self.alice, "short", seconds=0)
+        self.send(self.alice, "other", seconds=1)
+
+        msg.content = "much longer"
+        self.assertTrue(self.window.update(msg))
+
+        window = self.window.for_author(self.alice.id)
+        self.assertEqual(window.since(START - timedelta(seconds=1)).totals.chars, len("much longer") + len("other"))
+        self.assertEqual(window.since(START).totals.chars, len("other"))
+
+    def test_updating_unknown_message(self):
+        """Updating a message which isn't in the window should do nothing."""
+        self.assertFalse(self.window.update(MockMessage(id=100, author=self.alice)))
+
+    def test_mentions_exclude_the_user_replied_to(self):
+        """Mentions of bots, of the author and of the user replied to shouldn't be counted."""
+        carol, robot = MockMember(id=3), MockMember(id=4, bot=True)
+        reference = MockMessageReference(message_id=50)
+        reference.resolved = MockMessage(author=self.bob)
+        self.send(
+            self.alice, seconds=0,
+            mentions=[self.alice, self.bob, carol, robot], type=MessageType.reply, reference=reference
+        )
+
+        self.assertEqual(self.window.for_author(self.alice.id).since(START - timedelta(seconds=1)).totals.mentions, 1)
+
+    def test_pending_replies_are_resolved_once(self):
+        """Resolving the author of a message replied to should update every reply to it, and be kept for new ones."""
+        reference = MockMessageReference(message_id=50)
+        reference.resolved = None
+        self.send(self.alice, seconds=0, mentions=[self.bob], type=MessageType.reply, reference=reference)
+        self.send(self.alice, seconds=1, mentions=[self.bob], type=MessageType.reply, reference=reference)
+        window = self.window.for_author(self.alice.id)
+        self.assertEqual(window.oldest.pending_reply, reference)
+        self.assertEqual(window.since(START - timedelta(seconds=1)).totals.mentions, 2)
+
+        window.resolve_reply(reference, self.bob.id)
+        self.assertEqual(window.since(START - timedelta(seconds=1)).totals.mentions, 0)
+        self.assertTrue(all(record.pending_reply is None for record in window))
+
+        self.send(self.alice, seconds=2, mentions=[self.bob], type=MessageType.reply, reference=reference)
+        self.assertEqual(window.since(START + timedelta(seconds=1)).totals.mentions, 0)
+        self.assertIsNone(window._records[-1].pending_reply)
+
+    def test_compact_cache_records(self):
+        """With a compact cache, the records should keep the cached records, and resolve the messages on demand."""
+        self.cache = MessageCache(maxlen=4, newest_first=True, compact=True)
+        self.window = AntispamWindow(self.cache)
+        first = self.send(self.alice, "spam", seconds=0, mentions=[], embeds=[])
+        self.send(self.alice, "spam", seconds=1, mentions=[], embeds=[])
+
+        recent = self.window.for_author(self.alice.id).since(START - timedelta(seconds=1))
+        self.assertTrue(all(isinstance(record.message, CachedMessage) for record in recent.records))
+        self.assertEqual(recent.totals.chars, 8)
+        self.assertEqual(recent.records[0].content_hash, recent.records[1].content_hash)
+
+        # Only the first message is still in the bot's cache.
+        with patch("bot.instance", MockBot(cached_messages=[first])):
+            self.assertEqual(recent.messages, {first})
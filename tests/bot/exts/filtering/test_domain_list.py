@@ -0,0 +1,74 @@
+import unittest
+from unittest.mock import MagicMock
+
+import arrow
+
+from bot.exts.filtering._filter_context import Event, FilterContext
+from bot.exts.filtering._filter_lists.domain import DomainsList
+from bot.exts.filtering._filter_lists.filter_list import ListType
+from tests.helpers import MockMember, MockMessage, MockTextChannel
+
+
+class DomainsListTests(unittest.IsolatedAsyncioTestCase):
+    """Test the DomainsList class."""
+
+    def setUp(self):
+        """Sets up fresh objects for each test."""
+        self.filter_list = DomainsList(MagicMock())
+        self.now = arrow.utcnow().timestamp()
+        domains = [("example.com", False), ("bad.org/path", False), ("sub.example.net", False), ("evil.io", True)]
+        self.filter_list.add_list({
+            "id": 1,
+            "list_type": 0,
+            "created_at": self.now,
+            "updated_at": self.now,
+            "settings": {},
+            "filters": [
+                self._filter_data(i, domain, only_subdomains)
+                for i, (domain, only_subdomains) in enumerate(domains, start=1)
+            ]
+        })
+
+        member = MockMember(id=123)
+        channel = MockTextChannel(id=345)
+        self.ctx = FilterContext(Event.MESSAGE, member, channel, "", MockMessage(author=member, channel=channel))
+
+    def _filter_data(self, id_: int, content: str, only_subdomains: bool = False) -> dict:
+        return {
+            "id": id_, "content": content, "description": None, "settings": {},
+            "additional_settings": {"only_subdomains": only_subdomains}, "created_at": self.now, "updated_at": self.now
+        }
+
+    async def test_triggers_and_potential_phish(self):
+        """The list should trigger the same filters as evaluating each filter on its own, and report unknown URLs."""
+        test_cases = (
+            ("https://python.org", [], {"python.org"}),
+            (
+                "see https://www.example.com and https://bad.org/path/more",
+                [1, 2],
+                {"www.example.com", "bad.org/path/more"}
+            ),
+            ("https://bad.org is fine", [], {"bad.org"}),
+            ("https://example.net", [], {"example.net"}),
+            ("https://evil.io", [], {"evil.io"}),
+            ("https://a.evil.io", [4], {"a.evil.io"}),
+        )
+
+        for content, expected_ids, expected_phish in test_cases:
+            with self.subTest(content=content):
+                ctx = self.ctx.replace(content=content, potential_phish={})
+                _, _, triggers = await self.filter_list.actions_for(ctx)
+
+                self.assertEqual([filter_.id for filter_ in triggers[ListType.DENY]], expected_ids)
+                self.assertEqual(ctx.potential_phish.get(self.filter_list, set()), expected_phish)
+
+    async def test_index_is_updated_on_filter_changes(self):
+        """Adding and removing filters should be reflected in the results."""
+        ctx = self.ctx.replace(content="https://kiwi.com/fruit")
+        self.filter_list.add_filter(ListType.DENY, self._filter_data(5, "kiwi.com"))
+        _, _, triggers = await self.filter_list.actions_for(ctx)
+        self.assertEqual([filter_.id for filter_ in triggers[ListType.DENY]], [5])
+
+        self.filter_list.remove_filter(ListType.DENY, 5)
+        _, _, triggers = await self.filter_list.actions_for(ctx.replace(potential_phish={}))
+        self.assertEqual(triggers[ListType.DENY], [])
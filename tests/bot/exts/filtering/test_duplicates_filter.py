@@ -0,0 +1,90 @@
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+
+import arrow
+
+from bot.exts.filtering._antispam_window import AntispamWindow
+from bot.exts.filtering._filter_context import Event, FilterContext
+from bot.exts.filtering._filters.antispam.duplicates import DuplicatesFilter
+from bot.utils.message_cache import MessageCache
+from tests.helpers import MockBot, MockMember, MockMessage, MockTextChannel
+
+
+class DuplicatesFilterTests(unittest.IsolatedAsyncioTestCase):
+    """Test the detection of duplicate messages."""
+
+    def setUp(self):
+        """Sets up a filter triggering on more than two duplicates, and a compact cache to record messages in."""
+        now = arrow.utcnow().timestamp()
+        self.filter = DuplicatesFilter({
+            "id": 1,
+            "content": "duplicates",
+            "description": None,
+            "settings": {},
+            "additional_settings": {"interval": 10, "threshold": 2},
+            "created_at": now,
+            "updated_at": now
+        })
+        self.window = AntispamWindow(MessageCache(maxlen=10, compact=True))
+        self.author = MockMember(id=1)
+        self.channel = MockTextChannel(id=2)
+        self.messages = []
+
+        patcher = patch("bot.instance", MockBot(cached_messages=self.messages))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send(self, content: str) -> MockMessage:
+        """Record a message with the given content."""
+        msg = MockMessage(
+            id=len(self.messages) + 1,
+            author=self.author,
+            channel=self.channel,
+            content=content,
+            created_at=arrow.utcnow().datetime - timedelta(seconds=1),
+            mentions=[],
+            role_mentions=[],
+            embeds=[],
+        )
+        self.messages.append(msg)
+        self.window.cache.append(msg)
+        self.window.add(msg)
+        return msg
+
+    async def run_filter(self, msg: MockMessage) -> tuple[bool, FilterContext]:
+        """Run the filter on the author's window, and return whether it triggered along with the context."""
+        ctx = FilterContext(Event.MESSAGE, self.author, self.channel, self.window.for_author(self.author.id), msg)
+        return await self.filter.triggered_on(ctx), ctx
+
+    async def test_duplicates_trigger(self):
+        """The filter should trigger once the duplicates exceed the threshold, and relate all of them."""
+        sent = [self.send("spam") for _ in range(3)]
+        self.send("not spam")
+
+        triggered, ctx = await self.run_filter(sent[-1])
+
+        self.assertTrue(triggered)
+        self.assertEqual(ctx.related_messages, set(sent))
+
+    async def test_messages_are_not_resolved_below_the_threshold(self):
+        """Messages shouldn't be resolved unless there are enough records with the same hash."""
+        self.send("spam")
+        msg = self.send("spam")
+
+        with patch("bot.exts.filtering._filters.antispam.duplicates.resolve_records") as resolve_records:
+            triggered, _ = await self.run_filter(msg)
+
+        self.assertFalse(triggered)
+        resolve_records.assert_not_called()
+
+    async def test_hash_collisions_are_not_duplicates(self):
+        """Messages whose content hash is the same, but whose content is different, shouldn't be counted."""
+        for content in ("spam", "eggs", "ham"):
+            msg = self.send(content)
+        for record in self.window.for_author(self.author.id):
+            record.content_hash = hash("ham")
+
+        triggered, _ = await self.run_filter(msg)
+
+        self.assertFalse(triggered)
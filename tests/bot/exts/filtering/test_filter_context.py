@@ -0,0 +1,61 @@
+import unittest
+
+from bot.exts.filtering._filter_context import Event, FilterContext
+from tests.helpers import MockMember, MockMessage, MockTextChannel
+
+
+class FilterContextTests(unittest.TestCase):
+    """Test the FilterContext class."""
+
+    def setUp(self):
+        member = MockMember(id=123)
+        channel = MockTextChannel(id=345)
+        self.ctx = FilterContext(Event.MESSAGE, member, channel, "content", MockMessage(author=member, channel=channel))
+
+    def test_isolated_copy_doesnt_share_outputs(self):
+        """Adding to the outputs of an isolated copy shouldn't affect the original context."""
+        self.ctx.matches.append("first")
+        copy = self.ctx.isolated_copy()
+        copy.matches.append("second")
+        copy.blocked_exts.add(".exe")
+
+        self.assertEqual(self.ctx.matches, ["first"])
+        self.assertEqual(self.ctx.blocked_exts, set())
+        self.assertEqual(copy.content, "content")
+
+    def test_merging_copies_in_order_matches_sequential_filtering(self):
+        """Merging the outputs of copies in order should be the same as filling the same context in order."""
+        def first_list(ctx: FilterContext) -> None:
+            ctx.matches.append("first")
+            ctx.notification_domain = "first.com"
+            ctx.filter_info["filter"] = "info"
+
+        def second_list(ctx: FilterContext) -> None:
+            ctx.matches += ["second", "third"]
+            ctx.related_channels |= {1, 2}
+            ctx.content = "censored"
+
+        sequential_ctx = self.ctx.replace()
+        first_list(sequential_ctx)
+        second_list(sequential_ctx)
+
+        base = self.ctx.replace()
+        copies = [self.ctx.isolated_copy(), self.ctx.isolated_copy()]
+        second_list(copies[1])
+        first_list(copies[0])
+        for copy in copies:
+            self.ctx.merge(copy, base)
+
+        self.assertEqual(self.ctx, sequential_ctx)
+
+    def test_normalized_views_are_shared(self):
+        """Contexts with the same content should share the normalized views, and each view should be computed once."""
+        ctx = self.ctx.replace(content="||a||b\nhttps%3A//x\u0301.com \ufb01")
+        other = ctx.replace()
+
+        self.assertIs(ctx.normalized, other.normalized)
+        self.assertEqual(ctx.normalized.cleaned, "||a||bhttps://x.com \ufb01")
+        self.assertEqual(ctx.normalized.cleaned_with_newlines, "||a||b\nhttps://x.com \ufb01")
+        self.assertEqual(ctx.normalized.spoilers_expanded, "bhttps://x.com \ufb01||a||||a||bhttps://x.com \ufb01")
+        self.assertEqual(ctx.normalized.nfkc_folded, "||a||b\nhttps%3A//x.com fi")
+        self.assertIs(ctx.normalized.cleaned, other.normalized.cleaned)
@@ -0,0 +1,51 @@
+import unittest
+from unittest.mock import MagicMock
+
+from bot.exts.filtering._filter_lists.filter_list import ValidationCache
+
+
+class ValidationCacheTests(unittest.TestCase):
+    """Test the ValidationCache class."""
+
+    def setUp(self):
+        """Sets up a cache which fits four verdicts."""
+        self.cache = ValidationCache(maxsize=4)
+        self.defaults = ({"enabled"}, set())
+
+    def test_filter_verdicts_count_towards_the_size(self):
+        """Both the default verdict and the filter verdicts of a key should count towards the size."""
+        self.cache.set_defaults((1,), self.defaults)
+        self.cache.add_filter_verdicts((1,), {MagicMock(): True, MagicMock(): False})
+
+        self.assertEqual(len(self.cache), 3)
+        _, filter_verdicts = self.cache.get((1,))
+        self.assertEqual(len(filter_verdicts), 2)
+
+    def test_least_recently_used_keys_are_evicted(self):
+        """Going over the size should evict the least recently used keys, rather than all of them."""
+        for key in ((1,), (2,), (3,)):
+            self.cache.set_defaults(key, self.defaults)
+        self.cache.get((1,))
+
+        self.cache.add_filter_verdicts((3,), {MagicMock(): True, MagicMock(): True})
+
+        self.assertIsNone(self.cache.get((2,)))
+        self.assertIsNotNone(self.cache.get((1,)))
+        self.assertIsNotNone(self.cache.get((3,)))
+        self.assertEqual(len(self.cache), 4)
+
+    def test_verdicts_of_evicted_keys_are_not_added(self):
+        """Filter verdicts for a key which is no longer cached should be dropped."""
+        self.cache.add_filter_verdicts((1,), {MagicMock(): True})
+
+        self.assertIsNone(self.cache.get((1,)))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_clear(self):
+        """Clearing the cache should forget all keys and reset the size."""
+        self.cache.set_defaults((1,), self.defaults)
+        self.cache.add_filter_verdicts((1,), {MagicMock(): True})
+        self.cache.clear()
+
+        self.assertIsNone(self.cache.get((1,)))
+        self.assertEqual(len(self.cache), 0)
@@ -0,0 +1,364 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import arrow
+
+from bot.exts.filtering._filter_context import Event, FilterContext
+from bot.exts.filtering._filter_lists.filter_list import ListType
+from bot.exts.filtering.filtering import Filtering
+from tests.helpers import MockBot, MockMember, MockMessage, MockRole, MockTextChannel
+
+
+class FakeFilterList:
+    """A filter list which adds a description to the context, optionally taking a while to do so."""
+
+    content_only = False
+
+    def __init__(self, name: str, *, requires_shared_context: bool = False, delay: float = 0):
+        self.name = name
+        self.requires_shared_context = requires_shared_context
+        self.delay = delay
+
+    async def actions_for(self, ctx: FilterContext) -> tuple:
+        """Describe the list in the context, after the delay."""
+        ctx.action_descriptions.append(f"{self.name} started")
+        await asyncio.sleep(self.delay)
+        ctx.action_descriptions.append(f"{self.name} finished")
+        return None, [self.name], {}
+
+
+class FilteringDispatchTests(unittest.IsolatedAsyncioTestCase):
+    """Test dispatching a context to the subscribed filter lists."""
+
+    async def asyncSetUp(self):
+        """Sets up a cog and a message context."""
+        self.cog = Filtering(MockBot())
+        member = MockMember(id=123)
+        channel = MockTextChannel(id=345)
+        self.ctx = FilterContext(Event.MESSAGE, member, channel, "", MockMessage(author=member, channel=channel))
+
+    async def test_timed_out_list_leaves_no_partial_output(self):
+        """A list which times out should have its output discarded, even when lists run sequentially."""
+        slow = FakeFilterList("slow", delay=1)
+        fast = FakeFilterList("fast")
+        self.cog._subscriptions[Event.MESSAGE] = [slow, fast]
+
+        settings = MagicMock(concurrent_lists=False, list_timeout=0.01)
+        with patch("bot.exts.filtering.filtering.FilteringSettings", settings):
+            results = await self.cog._dispatch_to_lists(self.ctx)
+
+        self.assertEqual(results, [(slow, (None, [], {})), (fast, (None, ["fast"], {}))])
+        self.assertListEqual(self.ctx.action_descriptions, ["fast started", "fast finished"])
+
+    async def test_shared_context_list_is_not_timed_out(self):
+        """A list which requires the shared context should be allowed to finish regardless of the timeout."""
+        shared = FakeFilterList("shared", requires_shared_context=True, delay=0.05)
+        self.cog._subscriptions[Event.MESSAGE] = [shared]
+
+        for concurrent in (False, True):
+            self.ctx.action_descriptions.clear()
+            settings = MagicMock(concurrent_lists=concurrent, list_timeout=0.01)
+            with self.subTest(concurrent=concurrent), patch("bot.exts.filtering.filtering.FilteringSettings", settings):
+                results = await self.cog._dispatch_to_lists(self.ctx)
+
+                self.assertEqual(results, [(shared, (None, ["shared"], {}))])
+                self.assertListEqual(self.ctx.action_descriptions, ["shared started", "shared finished"])
+
+
+class ValidationCacheInvalidationTests(unittest.IsolatedAsyncioTestCase):
+    """Test forgetting cached validation results when the guild changes."""
+
+    async def asyncSetUp(self):
+        """Sets up a cog with a loaded list and a cached display name verdict."""
+        self.cog = Filtering(MockBot())
+        self.atomic_list = MagicMock()
+        self.cog.filter_lists = {"token": MagicMock(values=MagicMock(return_value=[self.atomic_list]))}
+        self.cog.name_verdicts[123] = ("name",)
+
+    def assert_cleared(self, cleared: bool) -> None:
+        """Assert whether the caches were cleared."""
+        if cleared:
+            self.atomic_list.clear_validation_cache.assert_called_once()
+            self.assertEqual(self.cog.name_verdicts, {})
+        else:
+            self.atomic_list.clear_validation_cache.assert_not_called()
+            self.assertIn(123, self.cog.name_verdicts)
+
+    async def test_channel_update(self):
+        """Renaming or moving a channel should clear the caches, other changes shouldn't."""
+        test_cases = (
+            ("renamed", {"name": "new-name"}, True),
+            ("moved", {"category_id": 2}, True),
+            ("topic changed", {"topic": "new topic"}, False),
+        )
+
+        for description, changes, cleared in test_cases:
+            with self.subTest(description=description):
+                self.atomic_list.reset_mock()
+                self.cog.name_verdicts[123] = ("name",)
+                before = MockTextChannel(name="old-name", category_id=1, topic="old topic")
+                after = MockTextChannel(**{"name": "old-name", "category_id": 1, "topic": "old topic", **changes})
+
+                await self.cog.on_guild_channel_update(before, after)
+
+                self.assert_cleared(cleared)
+
+    async def test_role_update(self):
+        """Renaming a role should clear the caches, other changes shouldn't."""
+        test_cases = (
+            ("renamed", {"name": "New Name"}, True),
+            ("recoloured", {"colour": 2}, False),
+        )
+
+        for description, changes, cleared in test_cases:
+            with self.subTest(description=description):
+                self.atomic_list.reset_mock()
+                self.cog.name_verdicts[123] = ("name",)
+                before = MockRole(name="Old Name", colour=1)
+                after = MockRole(**{"name": "Old Name", "colour": 1, **changes})
+
+                await self.cog.on_guild_role_update(before, after)
+
+                self.assert_cleared(cleared)
+
+
+class FilterListsSnapshotTests(unittest.IsolatedAsyncioTestCase):
+    """Test loading the filter lists from a snapshot, and reconciling them with the database."""
+
+    async def asyncSetUp(self):
+        """Sets up a cog whose loading doesn't need Discord, with a snapshot of a token list."""
+        self.bot = MockBot()
+        self.cog = Filtering(self.bot)
+        self.now = arrow.utcnow().timestamp()
+        self.payload = [self._list_data([(1, "lemon")])]
+
+        self.snapshot = MagicMock(
+            to_dict=AsyncMock(return_value={"token:0": json.dumps(self.payload[0])}),
+            update=AsyncMock(),
+            clear=AsyncMock(),
+            delete=AsyncMock(),
+        )
+        patches = (
+            patch.object(Filtering, "filter_list_snapshots", self.snapshot),
+            patch.object(Filtering, "weekly_auto_infraction_report_task"),
+            patch.object(Filtering, "periodic_reconcile_task"),
+            patch.object(self.cog, "_fetch_or_generate_filtering_webhook", AsyncMock(return_value=None)),
+            patch.object(self.cog, "collect_loaded_types"),
+            patch.object(self.cog.offensive_messages, "start", AsyncMock()),
+            patch.object(self.cog, "_schedule_reconcile"),
+        )
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _filter_data(self, id_: int, content: str) -> dict:
+        return {
+            "id": id_, "content": content, "description": None, "settings": {},
+            "additional_settings": {}, "created_at": self.now, "updated_at": self.now
+        }
+
+    def _list_data(self, filters: list[tuple[int, str]]) -> dict:
+        return {
+            "id": 1,
+            "name": "token",
+            "list_type": 0,
+            "created_at": self.now,
+            "updated_at": self.now,
+            "settings": {},
+            "filters": [self._filter_data(id_, content) for id_, content in filters]
+        }
+
+    def loaded_filters(self) -> dict[int, str]:
+        """Return the content of each loaded token filter by its ID."""
+        filters = self.cog.filter_lists["token"][ListType.DENY].filters
+        return {filter_id: filter_.content for filter_id, filter_ in filters.items()}
+
+    async def test_warm_start_loads_the_snapshot(self):
+        """The lists should be loaded from the snapshot, and reconciled with the database in the background."""
+        await self.cog.cog_load()
+
+        self.assertEqual(self.loaded_filters(), {1: "lemon"})
+        self.bot.api_client.get.assert_not_called()
+        self.cog._schedule_reconcile.assert_called_once()
+
+    async def test_unusable_snapshot_falls_back_to_the_database(self):
+        """The lists should be loaded from the database if the snapshot can't be read or loaded."""
+        test_cases = (
+            ("unreadable", {"side_effect": ConnectionError}),
+            ("not JSON", {"return_value": {"token:0": "{"}}),
+            ("malformed", {"return_value": {"token:0": json.dumps({"name": "token"})}}),
+        )
+        database_payload = [self._list_data([(2, "kiwi")])]
+
+        for description, snapshot_get in test_cases:
+            with self.subTest(description=description):
+                self.cog.filter_lists.clear()
+                self.cog._schedule_reconcile.reset_mock()
+                self.snapshot.to_dict = AsyncMock(**snapshot_get)
+                self.bot.api_client.get = AsyncMock(return_value=database_payload)
+
+                await self.cog.cog_load()
+
+                self.assertEqual(self.loaded_filters(), {2: "kiwi"})
+                self.snapshot.clear.assert_awaited()
+                self.snapshot.update.assert_awaited_with({"token:0": json.dumps(database_payload[0])})
+                self.cog._schedule_reconcile.assert_not_called()
+
+    async def test_unsaved_snapshot_doesnt_fail_the_load(self):
+        """The lists should be loaded from the database even if the snapshot of them can't be saved."""
+        self.snapshot.to_dict = AsyncMock(return_value={})
+        self.snapshot.update = AsyncMock(side_effect=ConnectionError)
+        self.bot.api_client.get = AsyncMock(return_value=self.payload)
+
+        await self.cog.cog_load()
+
+        self.assertEqual(self.loaded_filters(), {1: "lemon"})
+
+    async def test_reconcile_applies_changes_and_refreshes_the_snapshot(self):
+        """Reconciling should apply the lists which changed in the database, and save them as the new snapshot."""
+        await self.cog.cog_load()
+        database_payload = [self._list_data([(1, "lemon"), (2, "kiwi")])]
+        self.bot.api_client.get = AsyncMock(return_value=database_payload)
+
+        await self.cog._reconcile_filter_lists()
+
+        self.assertEqual(self.loaded_filters(), {1: "lemon", 2: "kiwi"})
+        self.snapshot.update.assert_awaited_with({"token:0": json.dumps(database_payload[0])})
+
+    async def test_edits_are_saved_without_reloading(self):
+        """Changes made through the bot should be saved to the snapshot without fetching the lists again."""
+        await self.cog.cog_load()
+        filter_list = self.cog.filter_lists["token"]
+        kiwi = self._filter_data(2, "kiwi")
+
+        await self.cog._snapshot_filter(filter_list, ListType.DENY, 2, kiwi)
+        self.snapshot.update.assert_awaited_with({"token:0": json.dumps(self._list_data([(1, "lemon"), (2, "kiwi")]))})
+
+        await self.cog._snapshot_filter(filter_list, ListType.DENY, 1, None)
+        self.snapshot.update.assert_awaited_with({"token:0": json.dumps(self._list_data([(2, "kiwi")]))})
+
+        await self.cog._forget_snapshot_list(("token", 0))
+        self.snapshot.delete.assert_awaited_with("token:0")
+        self.bot.api_client.get.assert_not_called()
+
+        # Nothing changed in the database since, so reconciling shouldn't apply anything.
+        self.bot.api_client.get = AsyncMock(return_value=[])
+        await self.cog._reconcile_filter_lists()
+        self.assertEqual(self.loaded_filters(), {1: "lemon"})
+
+    @patch("bot.exts.filtering.filtering.RECONCILE_MIN_DELAY", 0)
+    async def test_failed_reconcile_is_retried(self):
+        """A reconciliation which failed should be retried after a delay, until it succeeds."""
+        await self.cog.cog_load()
+        database_payload = [self._list_data([(2, "kiwi")])]
+        self.bot.api_client.get = AsyncMock(side_effect=[ConnectionError, ConnectionError, database_payload])
+
+        await self.cog._reconcile_filter_lists()
+
+        self.assertEqual(self.loaded_filters(), {2: "kiwi"})
+        self.assertEqual(self.bot.api_client.get.await_count, 3)
+
+
+class NameVerdictTests(unittest.IsolatedAsyncioTestCase):
+    """Test remembering the display names which came out clean."""
+
+    async def asyncSetUp(self):
+        """Sets up a cog whose name check finds nothing, and a nickname context."""
+        self.cog = Filtering(MockBot())
+        self.cog._recently_alerted_name = AsyncMock(return_value=False)
+        self.cog._check_bad_name = AsyncMock(return_value=(MagicMock(send_alert=False), {}))
+        self.filter_list = MagicMock(revision=0)
+        self.filter_list.name = "token"
+        self.filter_list.__len__.return_value = 1
+        self.cog._subscriptions[Event.NICKNAME] = [self.filter_list]
+
+        self.member = MockMember(id=123, roles=[MockRole(id=1)])
+        self.ctx = FilterContext(Event.NICKNAME, self.member, MockTextChannel(id=345), "a name", None)
+
+    async def test_clean_name_is_checked_once(self):
+        """A clean name shouldn't be checked again, even in another channel."""
+        await self.cog._check_bad_display_name(self.ctx)
+        await self.cog._check_bad_display_name(self.ctx.replace(channel=MockTextChannel(id=346)))
+
+        self.cog._check_bad_name.assert_awaited_once()
+
+    async def test_name_is_checked_again_on_changes(self):
+        """The name should be checked again if it or the member's roles changed."""
+        test_cases = (
+            ("name", self.ctx.replace(content="another name")),
+            ("roles", self.ctx.replace(author=MockMember(id=123, roles=[MockRole(id=2)]))),
+        )
+
+        for description, changed_ctx in test_cases:
+            with self.subTest(changed=description):
+                self.cog.name_verdicts.clear()
+                self.cog._check_bad_name.reset_mock()
+
+                await self.cog._check_bad_display_name(self.ctx)
+                await self.cog._check_bad_display_name(changed_ctx)
+
+                self.assertEqual(self.cog._check_bad_name.await_count, 2)
+
+    async def test_name_is_checked_again_when_the_filters_change(self):
+        """The name should be checked again once the revision of a filter list changes."""
+        await self.cog._check_bad_display_name(self.ctx)
+        self.filter_list.revision = 1
+        await self.cog._check_bad_display_name(self.ctx)
+
+        self.assertEqual(self.cog._check_bad_name.await_count, 2)
+
+    def test_verdict_key_has_no_list_objects(self):
+        """The key should only hold the list versions, so that it doesn't keep replaced lists alive."""
+        _, _, _, filters_version = self.cog._name_verdict_key(self.ctx)
+
+        self.assertEqual(filters_version, (("token", 0, 1),))
+
+
+class ContentOnlyDispatchTests(unittest.IsolatedAsyncioTestCase):
+    """Test skipping lists which only look at the content, on edits which didn't change it."""
+
+    async def asyncSetUp(self):
+        """Sets up a cog with a content only list and another list, and the context of an edit."""
+        self.cog = Filtering(MockBot())
+        self.content_list = FakeFilterList("content")
+        self.content_list.content_only = True
+        self.other_list = FakeFilterList("other")
+        self.cog._subscriptions[Event.MESSAGE_EDIT] = [self.content_list, self.other_list]
+
+        member = MockMember(id=123)
+        channel = MockTextChannel(id=345)
+        self.before = MockMessage(id=1, author=member, channel=channel, content="some content")
+        self.after = MockMessage(id=1, author=member, channel=channel, content="some content")
+        self.message_cache = MagicMock()
+        self.message_cache.get_message_metadata.return_value = {}
+
+    def make_ctx(self) -> FilterContext:
+        """Return the context of the edit."""
+        return FilterContext(
+            Event.MESSAGE_EDIT, self.after.author, self.after.channel, self.after.content, self.after,
+            before_message=self.before, message_cache=self.message_cache
+        )
+
+    async def test_content_only_list_is_skipped_if_the_content_is_unchanged(self):
+        """A content only list shouldn't run again on an edit which kept the filtered content."""
+        results = await self.cog._dispatch_to_lists(self.make_ctx())
+
+        self.assertEqual([filter_list for filter_list, _ in results], [self.other_list])
+
+    async def test_content_only_list_runs_if_the_content_changed(self):
+        """A content only list should run on an edit which changed the content."""
+        self.after.content = "other content"
+
+        results = await self.cog._dispatch_to_lists(self.make_ctx())
+
+        self.assertEqual([filter_list for filter_list, _ in results], [self.content_list, self.other_list])
+
+    async def test_content_only_list_runs_if_the_message_wasnt_filtered(self):
+        """A content only list should run if the version before the edit isn't known to have been filtered."""
+        self.message_cache.get_message_metadata.return_value = None
+
+        results = await self.cog._dispatch_to_lists(self.make_ctx())
+
+        self.assertEqual([filter_list for filter_list, _ in results], [self.content_list, self.other_list])
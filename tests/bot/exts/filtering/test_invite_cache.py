@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from discord import NotFound
+
+from bot.exts.filtering._invite_cache import InviteCache
+from tests.helpers import MockBot
+
+
+class InviteCacheTests(unittest.IsolatedAsyncioTestCase):
+    """Test the InviteCache class."""
+
+    def setUp(self):
+        """Sets up fresh objects for each test."""
+        self.bot = MockBot()
+        self.cache = InviteCache(self.bot, maxsize=2)
+
+    async def test_found_invites_are_cached(self):
+        """A resolved invite should only be fetched once."""
+        invite = MagicMock()
+        self.bot.fetch_invite = AsyncMock(return_value=invite)
+
+        self.assertIs(await self.cache.fetch("python"), invite)
+        self.assertIs(await self.cache.fetch("python"), invite)
+
+        self.bot.fetch_invite.assert_awaited_once_with("python")
+        self.bot.stats.incr.assert_any_call("filters.invite_cache.miss")
+        self.bot.stats.incr.assert_any_call("filters.invite_cache.hit")
+
+    async def test_not_found_invites_are_cached(self):
+        """An invite which wasn't found should be cached as None."""
+        self.bot.fetch_invite = AsyncMock(side_effect=NotFound(MagicMock(), "Unknown Invite"))
+
+        self.assertIsNone(await self.cache.fetch("nope"))
+        self.assertIsNone(await self.cache.fetch("nope"))
+
+        self.bot.fetch_invite.assert_awaited_once_with("nope")
+
+    async def test_concurrent_lookups_share_a_request(self):
+        """Concurrent lookups of the same code should result in a single request."""
+        invite = MagicMock()
+
+        async def fetch_invite(_code: str) -> MagicMock:
+            await asyncio.sleep(0)
+            return invite
+
+        self.bot.fetch_invite = AsyncMock(side_effect=fetch_invite)
+        results = await asyncio.gather(self.cache.fetch("python"), self.cache.fetch("python"))
+
+        self.assertEqual(results, [invite, invite])
+        self.bot.fetch_invite.assert_awaited_once_with("python")
+
+    async def test_expired_and_evicted_entries_are_refetched(self):
+        """Entries past their TTL, or evicted due to the size limit, should be fetched again."""
+        self.bot.fetch_invite = AsyncMock(side_effect=lambda code: code)
+
+        with patch("bot.exts.filtering._invite_cache.time.monotonic", return_value=0):
+            await self.cache.fetch_many(["a", "b", "c"])  # "a" is evicted.
+        self.assertEqual(self.bot.fetch_invite.await_count, 3)
+
+        with patch("bot.exts.filtering._invite_cache.time.monotonic", return_value=0):
+            self.assertEqual(await self.cache.fetch_many(["a", "c"]), {"a": "a", "c": "c"})
+        self.assertEqual(self.bot.fetch_invite.await_count, 4)
+
+        with patch("bot.exts.filtering._invite_cache.time.monotonic", return_value=self.cache.ttl + 1):
+            await self.cache.fetch("a")
+        self.assertEqual(self.bot.fetch_invite.await_count, 5)
@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import MagicMock, call, patch
+
+from bot.exts.filtering._filter_context import Event
+from bot.exts.filtering._filter_lists.filter_list import ListType
+from bot.exts.filtering._latency import LatencyTracker
+from tests.helpers import MockBot
+
+
+class LatencyTrackerTests(unittest.TestCase):
+    """Test the filter latency tracker."""
+
+    def setUp(self):
+        """Sets up fresh objects for each test."""
+        self.bot = MockBot()
+        patcher = patch("bot.instance", self.bot)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.tracker = LatencyTracker()
+        self.atomic_list = MagicMock(list_type=ListType.DENY, label="denied token")
+        self.atomic_list.name = "token"
+
+    @staticmethod
+    def make_filter(id_: int) -> MagicMock:
+        filter_ = MagicMock(id=id_)
+        filter_.__str__.return_value = f"filter {id_}"
+        return filter_
+
+    @patch("bot.exts.filtering._latency.FilteringSettings.filter_timing_sample_rate", 0.1)
+    def test_timings_are_sent_to_statsd(self):
+        """List timings should be sent in milliseconds, and filter timings should be sampled and kept in memory."""
+        self.tracker.record_filter(self.atomic_list, self.make_filter(7), Event.MESSAGE, 0.002)
+        self.tracker.record_list("token", Event.NICKNAME, 0.5)
+
+        self.assertEqual(
+            self.bot.stats.timing.call_args_list,
+            [
+                call("filters.latency.filter.token.deny.message.7", 2.0, 0.1),
+                call("filters.latency.list.token.nickname", 500.0, 1),
+            ]
+        )
+        self.assertEqual(len(self.tracker.slowest(5)), 1)
+
+    def test_removed_filters_are_forgotten(self):
+        """Filters which were removed from their list, or whose list was removed, shouldn't be reported as slow."""
+        kept, removed = self.make_filter(1), self.make_filter(2)
+        for filter_ in (kept, removed):
+            self.tracker.record_filter(self.atomic_list, filter_, Event.MESSAGE, 0.01)
+
+        self.atomic_list.filters = {1: kept}
+        self.tracker.prune(self.atomic_list)
+        self.assertEqual([timings.filter for timings in self.tracker.slowest(5)], [kept])
+
+        self.tracker.forget_list("token", ListType.DENY)
+        self.assertEqual(self.tracker.slowest(5), [])
+
+    def test_slowest_filters(self):
+        """The filters should be ordered by the average of their recent timings."""
+        fast, slow = self.make_filter(1), self.make_filter(2)
+        for seconds in (0.001, 0.003):
+            self.tracker.record_filter(self.atomic_list, fast, Event.MESSAGE, seconds)
+        self.tracker.record_filter(self.atomic_list, slow, Event.MESSAGE, 0.01)
+
+        slowest = self.tracker.slowest(5)
+
+        self.assertEqual([timings.filter for timings in slowest], [slow, fast])
+        self.assertAlmostEqual(slowest[1].mean, 0.002)
+
+    @patch("bot.exts.filtering._latency.scheduling.create_task")
+    @patch("bot.exts.filtering._latency.FilteringSettings")
+    def test_repeatedly_slow_filters_are_alerted_once(self, settings, create_task):
+        """A filter should be alerted about once it goes over the budget enough times, and not again for a while."""
+        settings.filter_latency_budget = 0.01
+        settings.slow_filter_strikes = 3
+        settings.slow_filter_cooldown = 60
+        filter_ = self.make_filter(1)
+
+        for _ in range(2):
+            self.tracker.record_filter(self.atomic_list, filter_, Event.MESSAGE, 0.1)
+        create_task.assert_not_called()
+
+        for _ in range(3):
+            self.tracker.record_filter(self.atomic_list, filter_, Event.MESSAGE, 0.1)
+        create_task.assert_called_once()
+        create_task.call_args.args[0].close()
@@ -0,0 +1,88 @@
+import unittest
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import arrow
+from discord import MessageType
+
+from bot.exts.filtering._antispam_window import AntispamWindow
+from bot.exts.filtering._filter_context import Event, FilterContext
+from bot.exts.filtering._filters.antispam.mentions import MentionsFilter
+from bot.utils.message_cache import MessageCache
+from tests.helpers import MockBot, MockMember, MockMessage, MockMessageReference, MockTextChannel
+
+
+class MentionsFilterTests(unittest.IsolatedAsyncioTestCase):
+    """Test resolving the authors of the messages replied to by the mentions filter."""
+
+    def setUp(self):
+        """Sets up a window of replies whose reference isn't resolved, and a bot to fetch the message replied to."""
+        now = arrow.utcnow().timestamp()
+        self.filter = MentionsFilter({
+            "id": 1,
+            "content": "mentions",
+            "description": None,
+            "settings": {},
+            "additional_settings": {"interval": 10, "threshold": 0},
+            "created_at": now,
+            "updated_at": now
+        })
+        self.window = AntispamWindow(MessageCache(maxlen=10))
+        self.alice, self.bob = MockMember(id=1), MockMember(id=2)
+        self.channel = MockTextChannel(id=3)
+        self.reference = MockMessageReference(message_id=50, channel_id=self.channel.id)
+        self.reference.resolved = None
+
+        self.bot = MockBot()
+        self.fetch_message = AsyncMock(return_value=MockMessage(id=50, author=self.bob))
+        self.bot.get_partial_messageable = MagicMock(return_value=MagicMock(fetch_message=self.fetch_message))
+        patcher = patch("bot.instance", self.bot)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def reply(self, msg_id: int) -> MockMessage:
+        """Record a reply by Alice to Bob's message, mentioning him."""
+        msg = MockMessage(
+            id=msg_id,
+            author=self.alice,
+            channel=self.channel,
+            created_at=arrow.utcnow().datetime - timedelta(seconds=1),
+            content="",
+            mentions=[self.bob],
+            role_mentions=[],
+            type=MessageType.reply,
+            reference=self.reference,
+        )
+        self.window.cache.append(msg)
+        self.window.add(msg)
+        return msg
+
+    async def run_filter(self, msg: MockMessage) -> bool:
+        """Run the filter on Alice's window."""
+        ctx = FilterContext(Event.MESSAGE, self.alice, self.channel, self.window.for_author(self.alice.id), msg)
+        return await self.filter.triggered_on(ctx)
+
+    async def test_known_reply_author_is_not_fetched(self):
+        """A message replied to whose author is already known shouldn't be fetched."""
+        msg = self.reply(1)
+        self.window.reply_authors.resolve(self.reference.message_id, self.bob.id)
+
+        self.assertFalse(await self.run_filter(msg))
+        self.fetch_message.assert_not_awaited()
+
+    async def test_fetched_reply_author_is_not_counted(self):
+        """Once the message replied to is fetched, the mention of its author shouldn't be counted."""
+        msg = self.reply(1)
+
+        self.assertFalse(await self.run_filter(msg))
+        self.fetch_message.assert_awaited_once()
+
+    async def test_failed_fetch_is_not_retried(self):
+        """A message replied to which couldn't be fetched shouldn't be fetched again while it's replied to."""
+        self.fetch_message.side_effect = TimeoutError
+        msg = self.reply(1)
+        self.assertTrue(await self.run_filter(msg))
+
+        msg = self.reply(2)
+        self.assertTrue(await self.run_filter(msg))
+        self.fetch_message.assert_awaited_once()
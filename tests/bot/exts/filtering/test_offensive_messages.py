@@ -0,0 +1,140 @@
+import asyncio
+import datetime
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import arrow
+from discord import HTTPException
+from discord.utils import time_snowflake, utcnow
+
+from bot.exts.filtering._offensive_messages import OffensiveMessageDeleter
+from tests.helpers import MockBot, MockMessage, MockTextChannel
+
+
+class OffensiveMessageDeleterTests(unittest.IsolatedAsyncioTestCase):
+    """Test posting offensive messages to the API and deleting them when they're due."""
+
+    async def asyncSetUp(self):
+        """Sets up a deleter whose background tasks run on the test's event loop."""
+        self.bot = MockBot()
+        self.bot.api_client.post = AsyncMock()
+        self.bot.api_client.delete = AsyncMock()
+        self.deleter = OffensiveMessageDeleter(self.bot)
+
+        patcher = patch(
+            "bot.exts.filtering._offensive_messages.scheduling.create_task",
+            side_effect=lambda coro, **_: asyncio.create_task(coro),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await self.deleter.stop()
+
+    def add_message(self, msg_id: int) -> None:
+        """Queue a message to be deleted in a week."""
+        message = MockMessage(id=msg_id, channel=MockTextChannel(id=1))
+        self.deleter.add(message, arrow.utcnow().shift(days=7).datetime)
+
+    @patch("bot.exts.filtering._offensive_messages.POST_BATCH_DELAY", 0.01)
+    async def test_posts_are_batched_until_the_delay(self):
+        """New messages should be posted together once the batch delay has passed."""
+        self.add_message(1)
+        self.add_message(2)
+        self.bot.api_client.post.assert_not_awaited()
+
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(self.bot.api_client.post.await_count, 2)
+        self.assertEqual(sorted(msg_id for _, msg_id, _ in self.deleter._queue), [1, 2])
+
+    @patch("bot.exts.filtering._offensive_messages.POST_BATCH_SIZE", 2)
+    @patch("bot.exts.filtering._offensive_messages.POST_BATCH_DELAY", 60)
+    async def test_full_batch_is_posted_right_away(self):
+        """A batch which reached its size should be posted without waiting for the delay."""
+        self.add_message(1)
+        self.add_message(2)
+
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(self.bot.api_client.post.await_count, 2)
+
+    @patch("bot.exts.filtering._offensive_messages.POST_BATCH_DELAY", 0.01)
+    async def test_failed_posts_are_retried(self):
+        """A message which failed to post should be posted again with the next batch."""
+        self.bot.api_client.post.side_effect = [ConnectionError, None]
+
+        self.add_message(1)
+        await asyncio.sleep(0.1)
+
+        self.assertEqual(self.bot.api_client.post.await_count, 2)
+        self.assertEqual([msg_id for _, msg_id, _ in self.deleter._queue], [1])
+
+    @patch("bot.exts.filtering._offensive_messages.POST_BATCH_DELAY", 60)
+    async def test_stop_posts_pending_messages(self):
+        """Stopping should post the messages which are waiting for the batch delay."""
+        self.add_message(1)
+
+        await self.deleter.stop()
+
+        self.bot.api_client.post.assert_awaited_once()
+
+    async def test_due_messages_are_deleted_in_order(self):
+        """Messages should be deleted in the order of their deletion dates, once they're due."""
+        now = time.time()
+        for delay, msg_id in ((60, 1), (-2, 2), (-1, 3)):
+            self.deleter._schedule({"id": msg_id, "channel_id": 1, "delete_date": now + delay})
+        self.deleter._delete = AsyncMock()
+
+        self.deleter._worker = asyncio.create_task(self.deleter._delete_forever())
+        await asyncio.sleep(0.01)
+
+        self.deleter._delete.assert_awaited_once()
+        self.assertEqual([msg_id for _, msg_id, _ in self.deleter._delete.await_args.args[0]], [2, 3])
+
+    async def test_sooner_message_wakes_the_worker(self):
+        """Queueing a message which is due sooner than the earliest one should wake the worker up early."""
+        now = time.time()
+        self.deleter._schedule({"id": 1, "channel_id": 1, "delete_date": now + 60})
+        self.deleter._delete = AsyncMock()
+        self.deleter._worker = asyncio.create_task(self.deleter._delete_forever())
+        await asyncio.sleep(0.01)
+        self.deleter._delete.assert_not_awaited()
+
+        self.deleter._schedule({"id": 2, "channel_id": 1, "delete_date": now})
+        await asyncio.sleep(0.01)
+
+        self.deleter._delete.assert_awaited_once()
+        self.assertEqual([msg_id for _, msg_id, _ in self.deleter._delete.await_args.args[0]], [2])
+
+    def make_channel(self) -> MockTextChannel:
+        """Create a channel whose messages can be deleted in bulk and separately."""
+        channel = MockTextChannel(id=1)
+        channel.delete_messages = AsyncMock()
+        self.partial_message = MagicMock(delete=AsyncMock())
+        channel.get_partial_message = MagicMock(return_value=self.partial_message)
+        return channel
+
+    async def test_recent_messages_are_deleted_in_bulk(self):
+        """Messages younger than 14 days should be deleted in bulk, and older ones separately."""
+        channel = self.make_channel()
+        recent = time_snowflake(utcnow() - datetime.timedelta(days=1))
+        old = time_snowflake(utcnow() - datetime.timedelta(days=20))
+
+        await self.deleter._delete_from_channel(channel, [recent, old])
+
+        self.assertEqual([obj.id for obj in channel.delete_messages.await_args.args[0]], [recent])
+        channel.get_partial_message.assert_called_once_with(old)
+        self.partial_message.delete.assert_awaited_once()
+
+    async def test_failed_bulk_delete_falls_back_to_single_deletes(self):
+        """Messages which failed to be deleted in bulk should be deleted separately."""
+        channel = self.make_channel()
+        channel.delete_messages.side_effect = HTTPException(MagicMock(status=400), "Bad request")
+        recent = [time_snowflake(utcnow() - datetime.timedelta(days=1)) + i for i in range(2)]
+
+        await self.deleter._delete_from_channel(channel, recent)
+
+        self.assertEqual([call.args[0] for call in channel.get_partial_message.call_args_list], recent)
+        self.assertEqual(self.partial_message.delete.await_count, 2)
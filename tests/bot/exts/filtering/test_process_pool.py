@@ -0,0 +1,127 @@
+import unittest
+from concurrent.futures import Executor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import MagicMock, patch
+
+import arrow
+
+from bot.exts.filtering import _process_pool
+from bot.exts.filtering._filter_context import Event, FilterContext
+from bot.exts.filtering._filter_lists.filter_list import ListType
+from bot.exts.filtering._filter_lists.token import TokensList
+from bot.exts.filtering._process_pool import FilterProcessPool
+from tests.helpers import MockMember, MockMessage, MockTextChannel
+
+
+class BrokenPoolExecutor(Executor):
+    """An executor whose worker processes died."""
+
+    def submit(self, *_args, **_kwargs):
+        raise BrokenProcessPool("A worker process terminated abruptly.")
+
+
+class FilterProcessPoolTests(unittest.IsolatedAsyncioTestCase):
+    """Test matching content through the filtering process pool."""
+
+    def setUp(self):
+        """Sets up a token list and a pool running in threads, so that the worker state can be inspected."""
+        _process_pool._worker_matcher = None
+        # The first analysis builds the worker's matcher, which can be slow on a busy machine.
+        patcher = patch("bot.exts.filtering._process_pool.FilteringSettings.process_pool_timeout", 30)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pool = FilterProcessPool(self.executor)
+        self.now = arrow.utcnow().timestamp()
+        self.filter_list = TokensList(MagicMock())
+        self.filter_list.add_list({
+            "id": 1,
+            "list_type": 0,
+            "created_at": self.now,
+            "updated_at": self.now,
+            "settings": {},
+            "filters": [self._filter_data(1, r"lemon"), self._filter_data(2, r"bla\d{2,4}")]
+        })
+
+        member = MockMember(id=123)
+        channel = MockTextChannel(id=345)
+        self.ctx = FilterContext(Event.MESSAGE, member, channel, "", MockMessage(author=member, channel=channel))
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def _filter_data(self, id_: int, content: str) -> dict:
+        return {
+            "id": id_, "content": content, "description": None, "settings": {},
+            "additional_settings": {}, "created_at": self.now, "updated_at": self.now
+        }
+
+    async def test_analysis_matches_tokens_and_urls(self):
+        """The analysis should contain the triggered token filters and the extracted URLs."""
+        content = "LEMON at https://www.Example.com/path/"
+        analysis = await self.pool.analyze(content, self.filter_list)
+
+        self.assertEqual(analysis.token_triggers, {1})
+        self.assertEqual(list(analysis.extracted_urls), ["www.example.com/path"])
+        self.assertIs(analysis.content, content)
+
+    async def test_filter_list_uses_analysis(self):
+        """The token list should trigger the same filters whether or not the content was analyzed in the pool."""
+        for content in ("nothing here", "lemon and bla123"):
+            with self.subTest(content=content):
+                ctx = self.ctx.replace(content=content, matches=[])
+                _, _, expected = await self.filter_list.actions_for(ctx)
+
+                ctx = self.ctx.replace(content=content, matches=[])
+                ctx.analysis = await self.pool.analyze(content, self.filter_list)
+                _, _, triggers = await self.filter_list.actions_for(ctx)
+
+                self.assertEqual(triggers, expected)
+
+    async def test_snapshot_is_updated_on_filter_changes(self):
+        """Editing the filters should send a new snapshot to the workers."""
+        first = self.pool.snapshot(self.filter_list)
+        await self.pool.analyze("bla", self.filter_list)
+
+        self.filter_list.add_filter(ListType.DENY, self._filter_data(3, r"bla"))
+        second = self.pool.snapshot(self.filter_list)
+        analysis = await self.pool.analyze("bla", self.filter_list)
+
+        self.assertNotEqual(first.version, second.version)
+        self.assertEqual(analysis.token_version, second.version)
+        self.assertEqual(analysis.token_triggers, {3})
+
+    async def test_stale_analysis_is_ignored(self):
+        """An analysis of different content shouldn't be used by the filter lists."""
+        ctx = self.ctx.replace(content="lemon")
+        ctx.analysis = await self.pool.analyze("something else", self.filter_list)
+
+        self.assertIsNone(ctx.content_analysis())
+
+    async def test_broken_pool_is_replaced(self):
+        """A pool whose workers died should be replaced with a new one."""
+        with patch.object(FilterProcessPool, "_create_executor", side_effect=[BrokenPoolExecutor(), self.executor]):
+            pool = FilterProcessPool()
+            self.assertIsNone(await pool.analyze("lemon", self.filter_list))
+
+            analysis = await pool.analyze("lemon", self.filter_list)
+
+        self.assertIs(pool.executor, self.executor)
+        self.assertEqual(analysis.token_triggers, {1})
+
+    async def test_broken_pool_is_disabled_if_it_cant_be_replaced(self):
+        """A broken pool which was passed in, or which broke too many times, should be disabled."""
+        pool = FilterProcessPool(BrokenPoolExecutor())
+
+        self.assertIsNone(await pool.analyze("lemon", self.filter_list))
+        self.assertIsNone(pool.executor)
+        self.assertIsNone(await pool.analyze("lemon", self.filter_list))
+
+    @patch("bot.exts.filtering._process_pool.FilteringSettings")
+    async def test_backed_up_pool_is_skipped(self, settings):
+        """Content shouldn't be sent to the pool while too many tasks are waiting on it."""
+        settings.process_pool_max_pending = 0
+        self.pool.executor = MagicMock()
+
+        self.assertIsNone(await self.pool.analyze("lemon", self.filter_list))
+        self.pool.executor.submit.assert_not_called()
@@ -0,0 +1,70 @@
+import unittest
+
+from bot.exts.filtering._search_index import FilterSearchIndex
+
+
+class FakeFilter:
+    """A filter with just the attributes the search index uses."""
+
+    def __init__(self, id_: int, content: str, description: str | None = None, **overrides):
+        self.id = id_
+        self.content = content
+        self.description = description
+        self.overrides = overrides, {}
+        self.extra_fields = None
+
+
+class OtherFakeFilter(FakeFilter):
+    """A filter of a different type."""
+
+
+class FilterSearchIndexTests(unittest.TestCase):
+    """Test searching filters through the index."""
+
+    def setUp(self):
+        """Sets up an index of a few filters."""
+        self.filters = [
+            FakeFilter(1, "lemon", "A sour fruit", send_alert=False),
+            FakeFilter(2, "melon", None, send_alert=True, channel_scope=["1", "2"]),
+            OtherFakeFilter(3, "lemonade", "A drink"),
+        ]
+        self.index = FilterSearchIndex()
+        self.index.build(self.filters)
+
+    def search(self, filter_type=None, settings=None, differ_by_default=(), text_query=None) -> list[int]:
+        results = self.index.search(filter_type, settings or {}, {}, set(differ_by_default), text_query or {})
+        return [filter_.id for filter_ in results]
+
+    def test_search_by_setting(self):
+        """Filters should match if they override the setting with the value, or the default matches."""
+        test_cases = (
+            ({"send_alert": False}, (), [1, 3]),
+            ({"send_alert": False}, ("send_alert",), [1]),
+            ({"send_alert": True}, (), [2, 3]),
+            ({"channel_scope": ["2", "1"]}, ("channel_scope",), [2]),
+        )
+
+        for settings, differ_by_default, expected_ids in test_cases:
+            with self.subTest(settings=settings, differ_by_default=differ_by_default):
+                self.assertEqual(self.search(settings=settings, differ_by_default=differ_by_default), expected_ids)
+
+    def test_search_by_type(self):
+        """Only filters of the given type should be returned."""
+        self.assertEqual(self.search(filter_type=OtherFakeFilter), [3])
+        self.assertEqual(self.search(filter_type=FakeFilter), [1, 2, 3])
+
+    def test_search_by_substring(self):
+        """The content and description should be searched by substring, ignoring case."""
+        self.assertEqual(self.search(text_query={"content": "LEMO"}), [1, 3])
+        self.assertEqual(self.search(text_query={"content": "emonad"}), [3])
+        self.assertEqual(self.search(text_query={"description": "fruit"}), [1])
+        self.assertEqual(self.search(text_query={"content": "on"}), [1, 2, 3])
+
+    def test_index_is_updated(self):
+        """Edited and removed filters should be reflected in the results, and edited filters keep their position."""
+        self.index.add(FakeFilter(1, "lime", send_alert=True))
+        self.index.remove(2)
+
+        self.assertEqual(self.search(settings={"send_alert": True}, differ_by_default=("send_alert",)), [1])
+        self.assertEqual(self.search(text_query={"content": "lemon"}), [3])
+        self.assertEqual(self.search(), [1, 3])
@@ -0,0 +1,49 @@
+import unittest
+
+from bot.exts.filtering._snapshot import changed_lists, payload_versions
+
+
+class FilterListsSnapshotTests(unittest.TestCase):
+    """Test comparing a filter lists payload with the versions of the loaded lists."""
+
+    @staticmethod
+    def _list_data(name: str, list_type: int, updated_at: str, filters: dict[int, str]) -> dict:
+        return {
+            "name": name,
+            "list_type": list_type,
+            "updated_at": updated_at,
+            "filters": [{"id": id_, "updated_at": filter_updated_at} for id_, filter_updated_at in filters.items()],
+        }
+
+    def setUp(self):
+        """Sets up the versions of a loaded payload."""
+        self.token = self._list_data("token", 0, "2023-01-01", {1: "2023-01-01", 2: "2023-01-02"})
+        self.domain = self._list_data("domain", 0, "2023-01-01", {3: "2023-01-01"})
+        self.versions = payload_versions([self.token, self.domain])
+
+    def test_unchanged_payload(self):
+        """Nothing should be applied if the payload didn't change."""
+        self.assertEqual(changed_lists(self.versions, [self.token, self.domain]), ([], set()))
+
+    def test_changes_are_detected(self):
+        """Changing a list or any of its filters should only mark that list as changed."""
+        test_cases = (
+            ("list edited", {"updated_at": "2023-02-01"}),
+            ("filter edited", {"filters": [{"id": 1, "updated_at": "2023-02-01"}, self.token["filters"][1]]}),
+            ("filter added", {"filters": [*self.token["filters"], {"id": 4, "updated_at": "2023-01-01"}]}),
+            ("filter removed", {"filters": self.token["filters"][:1]}),
+        )
+
+        for description, changes in test_cases:
+            with self.subTest(description=description):
+                token = {**self.token, **changes}
+                self.assertEqual(changed_lists(self.versions, [token, self.domain]), ([token], set()))
+
+    def test_added_and_removed_lists(self):
+        """Lists missing from the versions should be applied, and lists missing from the payload removed."""
+        allowed_token = self._list_data("token", 1, "2023-01-01", {})
+
+        changed, removed = changed_lists(self.versions, [self.token, allowed_token])
+
+        self.assertEqual(changed, [allowed_token])
+        self.assertEqual(removed, {("domain", 0)})
@@ -1,6 +1,8 @@
 import unittest
+from unittest.mock import patch
 
 import arrow
+from discord.ext.commands import BadArgument
 
 from bot.exts.filtering._filter_context import Event, FilterContext
 from bot.exts.filtering._filters.token import TokenFilter
@@ -47,3 +49,36 @@ class TokenFilterTests(unittest.IsolatedAsyncioTestCase):
                 self.ctx.content = content
                 result = await filter_.triggered_on(self.ctx)
                 self.assertEqual(result, expected)
+
+    @patch("bot.exts.filtering._filters.token.FilteringSettings")
+    async def test_filter_is_quarantined_on_timeout(self, settings):
+        """A filter whose pattern times out should not trigger, and should be ignored from then on."""
+        settings.token_timeout = 0.01
+        filter_ = TokenFilter({
+            "id": 1,
+            "content": r"(a|aa)+$",
+            "description": None,
+            "settings": {},
+            "additional_settings": {},
+            "created_at": arrow.utcnow().timestamp(),
+            "updated_at": arrow.utcnow().timestamp()
+        })
+        self.ctx.content = "a" * 50 + "!"
+
+        self.assertFalse(await filter_.triggered_on(self.ctx))
+        self.assertTrue(filter_.quarantined)
+
+        self.ctx.content = "aaa"
+        self.assertFalse(await filter_.triggered_on(self.ctx))
+
+    async def test_pathological_patterns_are_rejected(self):
+        """Patterns with nested repeats, or which are slow to search, should be rejected."""
+        for pattern in (r"(a+)+", r"(\w+\s?)+$", r"(a|aa)+$"):
+            with self.subTest(pattern=pattern), self.assertRaises(BadArgument):
+                await TokenFilter.process_input(pattern, "")
+
+    async def test_safe_patterns_are_accepted(self):
+        """Patterns which don't backtrack excessively should be accepted as-is."""
+        for pattern in (r"discord\.gg/\w+", r"(?:[a-z0-9]+\.)+com", r"([a-z0-9]+\.)+com", r"(?>a+)+b"):
+            with self.subTest(pattern=pattern):
+                self.assertEqual(await TokenFilter.process_input(pattern, "desc"), (pattern, "desc"))
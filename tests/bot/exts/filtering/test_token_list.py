@@ -0,0 +1,216 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import arrow
+
+from bot.exts.filtering._filter_context import Event, FilterContext
+from bot.exts.filtering._filter_lists.filter_list import ListType, validation_key
+from bot.exts.filtering._filter_lists.token import TokensList
+from bot.utils.message_cache import MessageCache
+from tests.helpers import MockMember, MockMessage, MockRole, MockTextChannel
+
+
+class TokensListTests(unittest.IsolatedAsyncioTestCase):
+    """Test the TokensList class."""
+
+    def setUp(self):
+        """Sets up fresh objects for each test."""
+        self.filter_list = TokensList(MagicMock())
+        self.now = arrow.utcnow().timestamp()
+        patterns = [r"lemon", r"bla\d{2,4}", r"(\w)\1{5}", r"(?P<fruit>apple)s?", r"(?i)pear"]
+        self.filter_list.add_list({
+            "id": 1,
+            "list_type": 0,
+            "created_at": self.now,
+            "updated_at": self.now,
+            "settings": {},
+            "filters": [self._filter_data(i, pattern) for i, pattern in enumerate(patterns, start=1)]
+        })
+
+        member = MockMember(id=123)
+        channel = MockTextChannel(id=345)
+        self.ctx = FilterContext(Event.MESSAGE, member, channel, "", MockMessage(author=member, channel=channel))
+
+    def _filter_data(self, id_: int, content: str) -> dict:
+        return {
+            "id": id_, "content": content, "description": None, "settings": {},
+            "additional_settings": {}, "created_at": self.now, "updated_at": self.now
+        }
+
+    async def test_triggers_match_individual_filters(self):
+        """The triggered filters and matches should be the same as evaluating each filter separately."""
+        test_cases = (
+            ("nothing to see here", []),
+            ("LEMON and bla123", [1, 2]),
+            ("aaaaaa", [3]),
+            ("some apples and a pear", [4, 5]),
+        )
+
+        for content, expected_ids in test_cases:
+            with self.subTest(content=content, expected_ids=expected_ids):
+                ctx = self.ctx.replace(content=content, matches=[])
+                _, _, triggers = await self.filter_list.actions_for(ctx)
+
+                self.assertEqual([filter_.id for filter_ in triggers[ListType.DENY]], expected_ids)
+                expected_ctx = self.ctx.replace(content=content, matches=[])
+                for filter_ in self.filter_list[ListType.DENY].filters.values():
+                    await filter_.triggered_on(expected_ctx)
+                self.assertEqual(ctx.matches, expected_ctx.matches)
+
+    async def test_matcher_is_rebuilt_on_filter_changes(self):
+        """Adding and removing filters should be reflected in the results."""
+        ctx = self.ctx.replace(content="a kiwi")
+        _, _, triggers = await self.filter_list.actions_for(ctx)
+        self.assertEqual(triggers[ListType.DENY], [])
+
+        self.filter_list.add_filter(ListType.DENY, self._filter_data(6, "kiwi"))
+        _, _, triggers = await self.filter_list.actions_for(ctx.replace(matches=[]))
+        self.assertEqual([filter_.id for filter_ in triggers[ListType.DENY]], [6])
+
+        self.filter_list.remove_filter(ListType.DENY, 6)
+        _, _, triggers = await self.filter_list.actions_for(ctx.replace(matches=[]))
+        self.assertEqual(triggers[ListType.DENY], [])
+
+    @patch("bot.exts.filtering._filter_lists.token.FilteringSettings")
+    @patch("bot.exts.filtering._filters.token.FilteringSettings")
+    async def test_timed_out_filters_are_quarantined(self, filter_settings, list_settings):
+        """A filter timing out should be left out of the matcher, without affecting the other filters."""
+        filter_settings.token_timeout = list_settings.token_timeout = 0.01
+        self.filter_list.add_filter(ListType.DENY, self._filter_data(6, r"(a|aa)+$"))
+
+        ctx = self.ctx.replace(content="lemon " + "a" * 50 + "!")
+        _, _, triggers = await self.filter_list.actions_for(ctx)
+        self.assertEqual([filter_.id for filter_ in triggers[ListType.DENY]], [1, 3])
+        self.assertTrue(self.filter_list[ListType.DENY].filters[6].quarantined)
+        self.assertNotIn(6, [filter_.id for filter_ in self.filter_list._matchers[ListType.DENY].filters])
+
+    async def test_validations_are_cached_per_channel_and_roles(self):
+        """Default validations should be evaluated once per channel and set of roles, until the filters change."""
+        atomic_list = self.filter_list[ListType.DENY]
+        evaluate = atomic_list.defaults.validations.evaluate
+        with patch.object(atomic_list.defaults.validations, "evaluate", wraps=evaluate) as mock_evaluate:
+            await self.filter_list.actions_for(self.ctx.replace(content="lemon"))
+            await self.filter_list.actions_for(self.ctx.replace(content="lemon"))
+            self.assertEqual(mock_evaluate.call_count, 1)
+
+            other_member = MockMember(id=124, roles=[MockRole(id=5)])
+            await self.filter_list.actions_for(self.ctx.replace(content="lemon", author=other_member))
+            self.assertEqual(mock_evaluate.call_count, 2)
+
+            self.filter_list.add_filter(ListType.DENY, self._filter_data(6, "kiwi"))
+            await self.filter_list.actions_for(self.ctx.replace(content="lemon"))
+            self.assertEqual(mock_evaluate.call_count, 3)
+
+    async def test_only_filters_with_overrides_are_cached(self):
+        """Filters without validation overrides follow the default answer, and shouldn't take up space in the cache."""
+        atomic_list = self.filter_list.add_list({
+            "id": 1,
+            "list_type": 0,
+            "created_at": self.now,
+            "updated_at": self.now,
+            "settings": {"filter_dm": True},
+            "filters": [
+                self._filter_data(1, "lemon") | {"settings": {"filter_dm": False}},
+                self._filter_data(2, "kiwi"),
+            ]
+        })
+
+        await self.filter_list.actions_for(self.ctx.replace(content="lemon"))
+
+        _, filter_verdicts = atomic_list._validation_cache.get(validation_key(self.ctx))
+        self.assertEqual([filter_.id for filter_ in filter_verdicts], [1])
+
+    async def test_update_only_rebuilds_changed_filters(self):
+        """Updating the list should only recreate edited filters and those overriding a changed default."""
+        old_list = self.filter_list.add_list({
+            "id": 1,
+            "list_type": 0,
+            "created_at": self.now,
+            "updated_at": self.now,
+            "settings": {"filter_dm": True, "enabled": True},
+            "filters": [
+                self._filter_data(1, "lemon") | {"settings": {"filter_dm": True}},
+                self._filter_data(2, "kiwi"),
+                self._filter_data(3, "pear"),
+            ]
+        })
+        later = self.now + 60
+        new_list = self.filter_list.update_list({
+            "id": 1,
+            "list_type": 0,
+            "created_at": self.now,
+            "updated_at": later,
+            "settings": {"filter_dm": False, "enabled": True},
+            "filters": [
+                self._filter_data(1, "lemon") | {"settings": {"filter_dm": True}},
+                self._filter_data(2, "melon") | {"updated_at": later},
+                self._filter_data(3, "pear"),
+            ]
+        })
+
+        self.assertIsNot(new_list, old_list)
+        self.assertIs(self.filter_list[ListType.DENY], new_list)
+        self.assertIsNot(new_list.filters[1], old_list.filters[1])
+        self.assertIsNot(new_list.filters[2], old_list.filters[2])
+        self.assertIs(new_list.filters[3], old_list.filters[3])
+        self.assertFalse(new_list.defaults.validations["filter_dm"].filter_dm)
+
+        _, _, triggers = await self.filter_list.actions_for(self.ctx.replace(content="kiwi melon"))
+        self.assertEqual([filter_.id for filter_ in triggers[ListType.DENY]], [2])
+
+    async def test_edit_only_searches_around_the_edited_part(self):
+        """On an edit, filters which didn't trigger before should only be searched for around the edited part."""
+        atomic_list = self.filter_list[ListType.DENY]
+        lemon = atomic_list.filters[1]
+        before = MockMessage(id=1, content="lemon " + "some words " * 100)
+        after = MockMessage(id=1, content=before.content + "and more")
+        cache = MessageCache(10)
+        cache.append(after)
+        ctx = self.ctx.replace(
+            event=Event.MESSAGE_EDIT, content=after.content, message=after, before_message=before, message_cache=cache
+        )
+
+        # The lemon is far from the edit, and it didn't trigger before, so it isn't looked for.
+        cache.update(after, metadata={atomic_list: []})
+        _, _, triggers = await self.filter_list.actions_for(ctx.replace(matches=[]))
+        self.assertEqual(triggers[ListType.DENY], [])
+
+        # It triggered before, so it's evaluated again to remain in the cached triggers, but isn't reported again.
+        cache.update(after, metadata={atomic_list: [lemon]})
+        _, _, triggers = await self.filter_list.actions_for(ctx.replace(matches=[]))
+        self.assertEqual(triggers[ListType.DENY], [])
+        self.assertEqual(cache.get_message_metadata(1)[atomic_list], [lemon])
+
+    async def test_edit_searches_long_patterns_everywhere(self):
+        """Patterns whose matches can be longer than the searched margin should trigger on edits far from them."""
+        self.filter_list.add_filter(ListType.DENY, self._filter_data(6, r"free.*nitro"))
+        atomic_list = self.filter_list[ListType.DENY]
+        before = MockMessage(id=1, content="free " + "word " * 80)
+        after = MockMessage(id=1, content=before.content + "nitro")
+        cache = MessageCache(10)
+        cache.append(after)
+        cache.update(after, metadata={atomic_list: []})
+        ctx = self.ctx.replace(
+            event=Event.MESSAGE_EDIT, content=after.content, message=after, before_message=before, message_cache=cache
+        )
+
+        _, _, triggers = await self.filter_list.actions_for(ctx)
+
+        self.assertEqual([filter_.id for filter_ in triggers[ListType.DENY]], [6])
+
+    async def test_edit_searches_context_dependent_patterns_everywhere(self):
+        """Patterns with anchors or lookarounds can trigger on edits far from their match, and should be searched."""
+        self.filter_list.add_filter(ListType.DENY, self._filter_data(6, r"^kiwi(?!.*just kidding)"))
+        atomic_list = self.filter_list[ListType.DENY]
+        before = MockMessage(id=1, content="kiwi " + "some words " * 100 + "just kidding")
+        after = MockMessage(id=1, content="kiwi " + "some words " * 100)
+        cache = MessageCache(10)
+        cache.append(after)
+        cache.update(after, metadata={atomic_list: []})
+        ctx = self.ctx.replace(
+            event=Event.MESSAGE_EDIT, content=after.content, message=after, before_message=before, message_cache=cache
+        )
+
+        _, _, triggers = await self.filter_list.actions_for(ctx)
+
+        self.assertEqual([filter_.id for filter_ in triggers[ListType.DENY]], [6])
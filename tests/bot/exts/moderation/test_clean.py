@@ -1,10 +1,20 @@
 import unittest
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime
 from unittest.mock import AsyncMock, MagicMock, patch
 
-from bot.exts.moderation.clean import Clean
+from discord import errors
+
+from bot.exts.moderation.clean import Clean, DeletionScheduler
 from tests.helpers import MockBot, MockContext, MockGuild, MockMember, MockMessage, MockRole, MockTextChannel
 
 
+async def async_iter(items: list) -> AsyncIterator:
+    """Asynchronously iterate over the items, like a channel's history."""
+    for item in items:
+        yield item
+
+
 class CleanTests(unittest.IsolatedAsyncioTestCase):
     """Tests for clean cog functionality."""
 
@@ -22,6 +32,18 @@ class CleanTests(unittest.IsolatedAsyncioTestCase):
         self.cog._use_cache = MagicMock(return_value=True)
         self.cog._delete_found = AsyncMock(return_value=[42, 84])
 
+    def test_cache_is_used_once_messages_are_received(self):
+        """With an empty bot cache, the index should only be used for the messages received after it was created."""
+        cog = Clean(self.bot)
+        channel = MockTextChannel(id=1)
+        limit = datetime(2023, 1, 1, tzinfo=UTC)
+        self.assertFalse(cog._use_cache(channel, limit))
+
+        cog.message_index.add(MockMessage(channel=channel, created_at=datetime(2023, 1, 1, 1, tzinfo=UTC)))
+
+        self.assertFalse(cog._use_cache(channel, limit))
+        self.assertTrue(cog._use_cache(channel, datetime(2023, 1, 1, 2, tzinfo=UTC)))
+
     @patch("bot.exts.moderation.clean.is_mod_channel")
     async def test_clean_deletes_invocation_in_non_mod_channel(self, mod_channel_check):
         """Clean command should delete the invocation message if ran in a non mod channel."""
@@ -102,3 +124,119 @@ class CleanTests(unittest.IsolatedAsyncioTestCase):
         sent_message = mocked_mods.send.await_args[0][0]
         self.assertIn(self.log_url, sent_message)
         self.assertIn("2 messages", sent_message)
+
+    async def test_clean_searches_each_channel_in_cache_or_history(self):
+        """Only the channels which aren't fully in the cache should have their histories searched."""
+        cached, uncached = MockTextChannel(id=1), MockTextChannel(id=2)
+        cached_message = MockMessage(channel=cached)
+        self.cog._use_cache = MagicMock(side_effect=lambda channel, _: channel is cached)
+        self.cog._get_messages_from_cache = MagicMock(return_value=({cached: [cached_message]}, [cached_message.id]))
+        history_batches = async_iter([(uncached, [42])])
+        self.cog._get_messages_from_channels = MagicMock(return_value=history_batches)
+        self.bot.get_channel = MagicMock(return_value=False)
+
+        await self.cog._clean_messages(
+            self.ctx,
+            [cached, uncached],
+            first_limit=datetime(2023, 1, 1, tzinfo=UTC),
+            attempt_delete_invocation=False,
+        )
+
+        self.assertEqual(self.cog._get_messages_from_cache.call_args.kwargs["channels"], {cached})
+        self.assertEqual(self.cog._get_messages_from_channels.call_args.kwargs["channels"], {uncached})
+        self.cog._delete_found.assert_awaited_once_with(self.ctx, {cached: [cached_message]}, history_batches)
+
+    async def test_histories_are_scanned_in_batches(self):
+        """The messages found in each channel's history should be yielded in batches of up to 100, newest first."""
+        busy, quiet = MockTextChannel(id=1), MockTextChannel(id=2)
+        busy_messages = [MockMessage(id=id_) for id_ in range(250, 0, -1)]
+        busy.history = MagicMock(side_effect=lambda **_: async_iter(busy_messages))
+        quiet_message = MockMessage(id=1000)
+        quiet.history = MagicMock(side_effect=lambda **_: async_iter([quiet_message]))
+        self.cog.cleaning = True
+
+        scanning = self.cog._get_messages_from_channels([busy, quiet], lambda message: message.id > 5, None)
+        batches = [batch async for batch in scanning]
+
+        busy_batches = [messages for channel, messages in batches if channel is busy]
+        self.assertListEqual([len(messages) for messages in busy_batches], [100, 100, 45])
+        self.assertListEqual([message for messages in busy_batches for message in messages], busy_messages[:245])
+        self.assertIn((quiet, [quiet_message]), batches)
+
+    async def test_history_scanning_stops_when_canceled(self):
+        """No more batches should be yielded once cleaning is canceled."""
+        channel = MockTextChannel(id=1)
+        channel.history = MagicMock(side_effect=lambda **_: async_iter([MockMessage(id=id_) for id_ in range(300)]))
+        self.cog.cleaning = True
+
+        batches = []
+        async for batch in self.cog._get_messages_from_channels([channel], lambda _: True, None):
+            batches.append(batch)
+            self.cog.cleaning = False
+
+        self.assertEqual(len(batches), 1)
+
+    async def test_status_message_is_not_deleted_by_the_clean(self):
+        """The status message sent while the histories are still being scanned shouldn't be deleted."""
+        channel = MockTextChannel(id=1)
+        status, message = MockMessage(id=1000), MockMessage(id=999)
+        self.ctx.send = AsyncMock(return_value=status)
+        self.cog.cleaning = True
+        self.cog.is_older_than_14d = lambda _: False
+
+        deleted = await Clean._delete_found(self.cog, self.ctx, {}, async_iter([(channel, [status, message])]))
+
+        channel.delete_messages.assert_awaited_once_with([message])
+        self.assertListEqual(deleted, [message])
+
+
+class DeletionSchedulerTests(unittest.IsolatedAsyncioTestCase):
+    """Tests for the scheduler deleting the messages found by the clean cog."""
+
+    async def asyncSetUp(self):
+        self.cog = MagicMock(cleaning=True)
+        self.cog.is_older_than_14d = lambda message: message.id < 10
+        self.scheduler = DeletionScheduler(self.cog, MockMessage())
+
+    async def asyncTearDown(self):
+        self.scheduler.cancel()
+
+    async def test_recent_messages_are_deleted_in_bulk_per_channel(self):
+        """Messages less than 14d old should be bulk deleted in batches of up to 100, and old ones one by one."""
+        first, second = MockTextChannel(id=1), MockTextChannel(id=2)
+        first_messages = [MockMessage(id=id_) for id_ in range(260, 10, -1)] + [MockMessage(id=5)]
+        second_messages = [MockMessage(id=1000)]
+
+        self.scheduler.submit(first, first_messages)
+        self.scheduler.submit(second, second_messages)
+        deleted = await self.scheduler.finish()
+
+        self.assertListEqual(
+            [len(call.args[0]) for call in first.delete_messages.await_args_list], [100, 100, 50]
+        )
+        second.delete_messages.assert_awaited_once_with(second_messages)
+        first_messages[-1].delete.assert_awaited_once()
+        self.assertListEqual(deleted, second_messages + first_messages)
+
+    @patch("bot.exts.moderation.clean.MIN_BACKOFF", 0.01)
+    async def test_single_deletions_back_off_and_retry_when_rate_limited(self):
+        """A single deletion failing due to rate limits should be retried after backing off."""
+        message = MockMessage(id=5)
+        message.delete = AsyncMock(side_effect=[errors.HTTPException(MagicMock(status=429), "rate limited"), None])
+
+        self.scheduler.submit(MockTextChannel(), [message])
+        deleted = await self.scheduler.finish()
+
+        self.assertEqual(message.delete.await_count, 2)
+        self.assertListEqual(deleted, [message])
+
+    async def test_canceled_clean_stops_deleting(self):
+        """Nothing should be deleted once cleaning is canceled."""
+        channel = MockTextChannel()
+        self.cog.cleaning = False
+
+        self.scheduler.submit(channel, [MockMessage(id=100), MockMessage(id=5)])
+        deleted = await self.scheduler.finish()
+
+        channel.delete_messages.assert_not_awaited()
+        self.assertListEqual(deleted, [])
@@ -0,0 +1,99 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+
+from bot.utils import attachments
+
+
+class FakeResponse:
+    """A minimal streamed aiohttp response."""
+
+    def __init__(self, data: bytes, chunk_size: int, delay: float = 0):
+        self.delay = delay
+        self.chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+        self.chunks_read = 0
+        self.content = MagicMock()
+        self.content.iter_chunked = self.iter_chunked
+
+    async def iter_chunked(self, _size: int):
+        for chunk in self.chunks:
+            self.chunks_read += 1
+            yield chunk
+            await asyncio.sleep(self.delay)
+
+    def raise_for_status(self) -> None:
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        return False
+
+
+class ReadTextPrefixTests(unittest.IsolatedAsyncioTestCase):
+    """Test the streaming download of attachment prefixes."""
+
+    def setUp(self):
+        attachments._prefixes.clear()
+        self.bot = MagicMock()
+        patcher = patch("bot.instance", self.bot, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_attachment(
+        self, data: bytes, content_type: str = "text/plain; charset=utf-8", delay: float = 0
+    ) -> MagicMock:
+        """Create an attachment whose download returns the data in small chunks, waiting `delay` after each chunk."""
+        attachment = MagicMock(id=1, size=len(data), content_type=content_type)
+        self.response = FakeResponse(data, chunk_size=4, delay=delay)
+        self.bot.http_session.get.return_value = self.response
+        return attachment
+
+    async def test_download_stops_at_line_budget(self):
+        """The download should stop once enough lines were read."""
+        attachment = self.make_attachment(b"a\nb\nc\nd\ne\nf\n" * 100)
+
+        prefix = await attachments.read_text_prefix(attachment, max_bytes=10_000, max_lines=3, timeout=1)
+
+        self.assertFalse(prefix.complete)
+        self.assertEqual(prefix.text, "a\nb\nc\nd\n")
+        self.assertEqual(self.response.chunks_read, 2)
+
+    async def test_bytes_are_capped(self):
+        """No more than `max_bytes` bytes should be kept."""
+        attachment = self.make_attachment(b"x" * 100)
+
+        prefix = await attachments.read_text_prefix(attachment, max_bytes=10, timeout=1)
+
+        self.assertEqual(prefix.data, b"x" * 10)
+
+    async def test_bad_bytes_and_unknown_charsets_are_tolerated(self):
+        """Undecodable bytes should be replaced, and unknown charsets should fall back to UTF-8."""
+        attachment = self.make_attachment("é\xff".encode() + b"\xff", content_type="text/plain; charset=nope")
+
+        prefix = await attachments.read_text_prefix(attachment, max_bytes=100, timeout=1)
+
+        self.assertTrue(prefix.complete)
+        self.assertEqual(prefix.text, "é\xff�")
+
+    async def test_prefix_is_shared(self):
+        """A complete prefix should be reused by later reads of the same attachment."""
+        attachment = self.make_attachment(b"short")
+
+        first = await attachments.read_text_prefix(attachment, max_bytes=100, timeout=1)
+        second = await attachments.read_text_prefix(attachment, max_bytes=1_000, max_lines=30, timeout=1)
+
+        self.assertIs(first, second)
+        self.assertIs(attachments.get_cached_prefix(attachment), first)
+        self.bot.http_session.get.assert_called_once()
+
+    async def test_timed_out_prefix_is_not_shared(self):
+        """A prefix cut short by the timeout shouldn't be reused, as it doesn't have everything its limits allow."""
+        attachment = self.make_attachment(b"x" * 100, delay=0.05)
+
+        prefix = await attachments.read_text_prefix(attachment, max_bytes=100, timeout=0.01)
+
+        self.assertFalse(prefix.complete)
+        self.assertLess(len(prefix.data), 100)
+        self.assertIsNone(attachments.get_cached_prefix(attachment))
@@ -1,7 +1,11 @@
 import unittest
+from datetime import UTC, datetime, timedelta
+from unittest.mock import patch
 
-from bot.utils.message_cache import MessageCache
-from tests.helpers import MockMessage
+from discord.utils import time_snowflake
+
+from bot.utils.message_cache import CachedMessage, ChannelMessageIndex, MessageCache, resolve_messages
+from tests.helpers import MockBot, MockMember, MockMessage, MockTextChannel
 
 
 # noinspection SpellCheckingInspection
@@ -211,3 +215,116 @@ class TestMessageCache(unittest.TestCase):
             with self.subTest(current_loop=current_loop):
                 self.assertEqual(len(cache), min(current_loop, 5))
                 cache.append(MockMessage())
+
+    def test_compact_mode_stores_records(self):
+        """Test if a compact cache stores a record of each message, which resolves to the message in the bot's cache."""
+        cache = MessageCache(maxlen=5, compact=True)
+        author, mentioned = MockMember(id=1), MockMember(id=2)
+        message = MockMessage(id=10, author=author, content="hello", mentions=[mentioned], embeds=[], attachments=["a"])
+
+        cache.append(message)
+        record = cache.get_message(10)
+
+        self.assertIsInstance(record, CachedMessage)
+        self.assertEqual(
+            (record.id, record.author_id, record.channel_id, record.created_at),
+            (10, 1, message.channel.id, message.created_at)
+        )
+        self.assertEqual(record.content_hash, hash("hello"))
+        self.assertEqual(record.mention_ids, (2,))
+        self.assertEqual((record.attachments, record.embeds), (1, 0))
+
+        with patch("bot.instance", MockBot(cached_messages=[MockMessage(id=9), message])):
+            self.assertIs(record.resolve(), message)
+        with patch("bot.instance", MockBot(cached_messages=[])):
+            self.assertIsNone(record.resolve())
+
+    def test_resolve_messages_together(self):
+        """Test if several messages are resolved from the bot's cache at once, leaving out the ones not there."""
+        messages = [MockMessage(id=message_id) for message_id in range(1, 5)]
+
+        with patch("bot.instance", MockBot(cached_messages=messages)):
+            self.assertEqual(resolve_messages([2, 4, 10]), {2: messages[1], 4: messages[3]})
+            self.assertEqual(resolve_messages([]), {})
+
+    def test_compact_mode_updates_records(self):
+        """Test if updating a message in a compact cache replaces its record."""
+        cache = MessageCache(maxlen=5, compact=True)
+        message = MockMessage(id=10, content="before", mentions=[], embeds=[])
+        cache.append(message)
+
+        message.content = "after"
+        self.assertTrue(cache.update(message))
+        self.assertEqual(cache[0].content_hash, hash("after"))
+
+
+class TestChannelMessageIndex(unittest.TestCase):
+    """Tests for the ChannelMessageIndex class in the `bot.utils.message_cache` module."""
+
+    def setUp(self):
+        self.start = datetime(2023, 1, 1, tzinfo=UTC)
+        self.index = ChannelMessageIndex(maxlen=3, tracking_since=self.start)
+        self.general, self.offtopic = MockTextChannel(id=10), MockTextChannel(id=20)
+
+    def add(self, channel: MockTextChannel, seconds: int) -> MockMessage:
+        """Add a message sent in the channel the given number of seconds after the start."""
+        sent_at = self.start + timedelta(seconds=seconds)
+        message = MockMessage(id=time_snowflake(sent_at), channel=channel, created_at=sent_at)
+        self.index.add(message)
+        return message
+
+    def test_messages_since(self):
+        """Test if only the channel's messages created after the given time are returned, newest first."""
+        self.add(self.general, 1)
+        second = self.add(self.general, 2)
+        self.add(self.offtopic, 3)
+        fourth = self.add(self.general, 4)
+
+        self.assertListEqual(self.index.messages_since(10, self.start + timedelta(seconds=1)), [fourth, second])
+        self.assertListEqual(self.index.messages_since(30, self.start), [])
+
+    def test_eviction_moves_the_channel_coverage(self):
+        """Test if evicting a channel's message only moves the time since which that channel is complete."""
+        first = self.add(self.general, 1)
+        for seconds in range(2, 5):
+            self.add(self.offtopic, seconds)
+
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.complete_since(10), first.created_at)
+        self.assertEqual(self.index.complete_since(20), self.start)
+
+    def test_removed_messages(self):
+        """Test if removed messages are no longer returned, and don't count as evicted."""
+        first = self.add(self.general, 1)
+        second = self.add(self.general, 2)
+        self.index.remove(10, first.id)
+        self.index.remove(30, first.id)
+
+        self.assertListEqual(self.index.messages_since(10, self.start), [second])
+        for seconds in range(3, 5):
+            self.add(self.offtopic, seconds)
+        self.assertEqual(self.index.complete_since(10), self.start)
+
+    def test_tracking_starts_with_the_first_message(self):
+        """Test if an index without a time to start tracking from starts tracking with the first message added."""
+        self.index = ChannelMessageIndex(maxlen=3)
+        self.assertIsNone(self.index.complete_since(10))
+
+        first = self.add(self.general, 1)
+        self.add(self.general, 2)
+
+        self.assertEqual(self.index.complete_since(10), first.created_at)
+        self.assertEqual(self.index.complete_since(20), first.created_at)
+
+    @patch("bot.utils.message_cache.COMPACT_THRESHOLD", 2)
+    def test_evicted_messages_are_compacted(self):
+        """Test if a channel's messages are still found and removed correctly after its evicted messages are dropped."""
+        sent = [self.add(self.general, seconds) for seconds in range(1, 8)]
+
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.complete_since(10), sent[3].created_at)
+        self.assertListEqual(self.index.messages_since(10, self.start), sent[:3:-1])
+
+        self.index.remove(10, sent[5].id)
+        self.index.remove(10, sent[2].id)
+        self.assertListEqual(self.index.messages_since(10, self.start), [sent[6], sent[4]])